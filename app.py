@@ -1,7 +1,9 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_from_directory, send_file, Response, stream_with_context
 from flask_cors import CORS
+import json
 import os
 import sys
+import time
 from config import Config
 from svtplay_handler import SVTPlayDownloader
 from profile_manager import ProfileManager
@@ -60,6 +62,52 @@ def scrape_videos():
     result = downloader.scrape_videos_with_metadata(url, max_videos, token)
     return jsonify(result)
 
+@app.route('/api/scrape/stream', methods=['POST'])
+def stream_scrape():
+    """Scrape a URL and stream the results as newline-delimited JSON
+
+    The video list is sent as soon as the episodes are listed, followed by
+    one line per thumbnail as it is fetched (see iter_scrape_events).
+    """
+    data = request.get_json()
+    url = data.get('url')
+    max_videos = data.get('max_videos', 200)
+    token = data.get('token')
+
+    if not url:
+        return jsonify({'success': False, 'error': 'URL is required'}), 400
+
+    def generate():
+        for event in downloader.iter_scrape_events(url, max_videos, token):
+            yield json.dumps(event) + '\n'
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/thumbs/<video_id>')
+def get_thumbnail(video_id):
+    """Serve a cached thumbnail, optionally downscaled with ?w=<width>"""
+    width = request.args.get('w', type=int)
+    if width is not None:
+        width = min(width, Config.THUMBNAIL_MAX_WIDTH)
+
+    thumbnail = downloader.open_thumbnail(video_id, width)
+    if thumbnail is None:
+        return jsonify({'success': False, 'error': 'Thumbnail not found'}), 404
+
+    path, content_type, etag = thumbnail
+    response = send_file(path, mimetype=content_type, etag=etag,
+                         max_age=Config.THUMBNAIL_MAX_AGE, conditional=True)
+    response.cache_control.public = True
+    return response
+
+def get_idempotency_key(data):
+    """Client-supplied key (Idempotency-Key header or idempotency_key field) making a retried submission safe"""
+    return request.headers.get('Idempotency-Key') or data.get('idempotency_key') or None
+
 @app.route('/api/download', methods=['POST'])
 def start_download():
     """Start downloading a single video"""
@@ -74,7 +122,7 @@ def start_download():
     if options.get('download_dir'):
         profile_manager.save_last_download_folder(options['download_dir'])
 
-    result = downloader.start_download(url, options)
+    result = downloader.start_download(url, options, idempotency_key=get_idempotency_key(data))
     return jsonify(result)
 
 @app.route('/api/download/season', methods=['POST'])
@@ -91,7 +139,7 @@ def download_season():
     if options.get('download_dir'):
         profile_manager.save_last_download_folder(options['download_dir'])
 
-    result = downloader.download_season(url, options)
+    result = downloader.download_season(url, options, idempotency_key=get_idempotency_key(data))
     return jsonify(result)
 
 @app.route('/api/download/batch', methods=['POST'])
@@ -108,25 +156,93 @@ def download_batch():
     if options.get('download_dir'):
         profile_manager.save_last_download_folder(options['download_dir'])
 
-    # Start a download for each URL
-    download_ids = []
-    for url in urls:
-        result = downloader.start_download(url, options)
-        if result['success']:
-            download_ids.append(result['download_id'])
-
-    return jsonify({
-        'success': True,
-        'download_ids': download_ids,
-        'count': len(download_ids)
-    })
+    # One batch job with a child download per URL. URLs already queued,
+    # downloading or downloaded to the same folder get the existing download's id.
+    result = downloader.start_batch(urls, options, idempotency_key=get_idempotency_key(data))
+    return jsonify(result)
 
 @app.route('/api/downloads', methods=['GET'])
 def get_downloads():
-    """Get all downloads"""
-    result = downloader.get_all_downloads()
+    """Get downloads, newest first
+
+    Query parameters:
+        since: version cursor - only return downloads changed after it
+        status: comma-separated statuses to include (e.g. downloading,queued)
+        limit, offset: pagination
+    """
+    since = request.args.get('since', type=int)
+    limit = request.args.get('limit', type=int)
+    offset = max(0, request.args.get('offset', 0, type=int))
+    status = request.args.get('status')
+    statuses = [s.strip() for s in status.split(',') if s.strip()] if status else None
+
+    result = downloader.get_all_downloads(since=since, status=statuses, limit=limit, offset=offset)
     return jsonify(result)
 
+@app.route('/api/downloads/stream', methods=['GET'])
+def stream_downloads():
+    """Push download changes to the browser as Server-Sent Events
+
+    The first event is a full snapshot (reset: true). After that each event
+    only carries the fields that changed, at most one event per
+    Config.STREAM_COALESCE_INTERVAL seconds. Reconnecting clients resume from
+    the Last-Event-ID header.
+    """
+    try:
+        since = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0))
+    except ValueError:
+        since = 0
+
+    def generate():
+        version = since
+        last_positions = None
+        yield f"retry: {Config.STREAM_RETRY_MS}\n\n"
+
+        while True:
+            changes = downloader.wait_for_changes(version, timeout=Config.STREAM_KEEPALIVE_INTERVAL)
+            positions = downloader.get_queue_positions()
+
+            if changes['downloads'] or changes['removed'] or changes['reset'] or positions != last_positions:
+                changes['queue_positions'] = positions
+                last_positions = positions
+                yield f"id: {changes['version']}\nevent: downloads\ndata: {json.dumps(changes)}\n\n"
+            else:
+                yield ": keepalive\n\n"
+
+            version = changes['version']
+            time.sleep(Config.STREAM_COALESCE_INTERVAL)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/queue', methods=['GET'])
+def get_queue():
+    """Get download queue depth and number of active downloads"""
+    result = downloader.get_queue_status()
+    return jsonify(result)
+
+@app.route('/api/bandwidth', methods=['GET'])
+def get_bandwidth():
+    """Get the bandwidth limit, schedule and the share of each running download"""
+    return jsonify(downloader.get_bandwidth())
+
+@app.route('/api/bandwidth', methods=['POST'])
+def set_bandwidth():
+    """Change the bandwidth budget at runtime
+
+    Body (all optional): limit_kbps (0 = unlimited), schedule
+    ('HH:MM-HH:MM=kbps,...', '' to clear) and weights ({download_id: weight}).
+    """
+    data = request.get_json() or {}
+    result = downloader.set_bandwidth(data.get('limit_kbps'), data.get('schedule'), data.get('weights'))
+    if result['success']:
+        return jsonify(result)
+    else:
+        return jsonify(result), 400
+
 @app.route('/api/downloads/<download_id>', methods=['GET'])
 def get_download_status(download_id):
     """Get status of a specific download"""
@@ -136,6 +252,26 @@ def get_download_status(download_id):
     else:
         return jsonify(result), 404
 
+@app.route('/api/downloads/<download_id>', methods=['POST'])
+def control_download(download_id):
+    """Pause, resume or cancel a download, batch or season: {"action": "pause" | "resume" | "cancel"}"""
+    data = request.get_json() or {}
+    return control_download_response(download_id, data.get('action'))
+
+@app.route('/api/downloads/<download_id>', methods=['DELETE'])
+def cancel_download(download_id):
+    """Cancel a download (a running one is stopped, its partial files are kept)"""
+    return control_download_response(download_id, 'cancel')
+
+def control_download_response(download_id, action):
+    result = downloader.control_download(download_id, action)
+    if result['success']:
+        return jsonify(result)
+    elif download_id not in downloader.downloads:
+        return jsonify(result), 404
+    else:
+        return jsonify(result), 400
+
 @app.route('/api/downloads/files', methods=['GET'])
 def list_files():
     """List downloaded files"""
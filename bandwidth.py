@@ -0,0 +1,193 @@
+import re
+import threading
+import time
+from datetime import datetime
+
+SCHEDULE_ENTRY_PATTERN = re.compile(r'^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})=(\d+)$')
+
+
+def parse_schedule(text):
+    """Parse 'HH:MM-HH:MM=kbps,...' into [(start_minute, end_minute, kbps)]
+
+    A window may wrap midnight (22:00-07:00). 0 kbps means unlimited.
+    Raises ValueError for malformed entries.
+    """
+    schedule = []
+    for part in (text or '').split(','):
+        part = part.replace(' ', '')
+        if not part:
+            continue
+        match = SCHEDULE_ENTRY_PATTERN.match(part)
+        if not match:
+            raise ValueError(f'Invalid bandwidth schedule entry: {part!r} (expected HH:MM-HH:MM=kbps)')
+        start_h, start_m, end_h, end_m, kbps = map(int, match.groups())
+        if start_h > 23 or end_h > 24 or start_m > 59 or end_m > 59:
+            raise ValueError(f'Invalid time in bandwidth schedule entry: {part!r}')
+        schedule.append((start_h * 60 + start_m, end_h * 60 + end_m, kbps))
+    return schedule
+
+
+def format_schedule(schedule):
+    return ','.join(f'{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}={kbps}'
+                    for start, end, kbps in schedule)
+
+
+def bytes_per_second(kbps):
+    return kbps * 1000 / 8
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting a byte stream to `rate` bytes/s
+
+    consume(n) takes n tokens and sleeps while the bucket is in debt, so a
+    read larger than the burst (a whole HLS segment) is allowed and paid
+    for afterwards. A rate of 0 or None is unlimited.
+    """
+
+    def __init__(self, rate=None, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.consumed = 0
+        self._lock = threading.Lock()
+        self._updated = clock()
+        self._tokens = 0.0
+        self.burst = burst
+        self.rate = None
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self.rate = rate or None
+            self._tokens = min(self._tokens, self._capacity())
+
+    def consume(self, amount):
+        with self._lock:
+            self.consumed += amount
+            if not self.rate:
+                return 0.0
+            self._refill()
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            self.sleep(wait)
+        return wait
+
+    def _capacity(self):
+        return self.burst if self.burst is not None else (self.rate or 0)
+
+    def _refill(self):
+        now = self.clock()
+        if self.rate:
+            self._tokens = min(self._capacity(), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class JobThrottle:
+    """One download's share of a BandwidthLimiter"""
+
+    def __init__(self, limiter, job_id, weight):
+        self.limiter = limiter
+        self.job_id = job_id
+        self.weight = weight
+        self.bucket = TokenBucket(clock=limiter.clock, sleep=limiter.sleep)
+
+    def consume(self, amount):
+        """Account for amount bytes read, sleeping as needed to stay within this job's share"""
+        self.limiter.refresh()
+        return self.bucket.consume(amount)
+
+    def close(self):
+        self.limiter.unregister(self.job_id)
+
+
+class BandwidthLimiter:
+    """Global download bandwidth budget shared by the running downloads
+
+    The limit in kbit/s comes from the schedule window covering the time of
+    day, or limit_kbps outside all windows (0 = unlimited). Each registered
+    job gets limit * weight / sum of weights, enforced with its own token
+    bucket; shares are recomputed as jobs come and go, weights change or a
+    schedule window starts.
+    """
+
+    def __init__(self, limit_kbps=0, schedule=(), now=datetime.now, clock=time.monotonic, sleep=time.sleep):
+        self.limit_kbps = limit_kbps
+        self.schedule = list(schedule)
+        self.now = now
+        self.clock = clock
+        self.sleep = sleep
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._applied = None  # Limit the job buckets were last set for
+
+    def configure(self, limit_kbps=None, schedule=None):
+        """Change the limit and/or schedule; running jobs pick it up with their next read"""
+        with self._lock:
+            if limit_kbps is not None:
+                self.limit_kbps = max(0, int(limit_kbps))
+            if schedule is not None:
+                self.schedule = list(schedule)
+            self._rebalance()
+
+    def current_limit(self):
+        """Limit in kbit/s right now (0 = unlimited)"""
+        now = self.now()
+        minute = now.hour * 60 + now.minute
+        for start, end, kbps in self.schedule:
+            if (start <= minute < end) if start <= end else (minute >= start or minute < end):
+                return kbps
+        return self.limit_kbps
+
+    def register(self, job_id, weight=1):
+        with self._lock:
+            throttle = JobThrottle(self, job_id, max(float(weight or 1), 0.01))
+            self._jobs[job_id] = throttle
+            self._rebalance()
+            return throttle
+
+    def unregister(self, job_id):
+        with self._lock:
+            if self._jobs.pop(job_id, None) is not None:
+                self._rebalance()
+
+    def set_weight(self, job_id, weight):
+        """Change a running job's weight. Returns False if the job is not registered."""
+        with self._lock:
+            throttle = self._jobs.get(job_id)
+            if throttle is None:
+                return False
+            throttle.weight = max(float(weight), 0.01)
+            self._rebalance()
+            return True
+
+    def refresh(self):
+        """Re-apply the shares when a schedule window has started or ended"""
+        if self.current_limit() != self._applied:
+            with self._lock:
+                self._rebalance()
+
+    def status(self):
+        with self._lock:
+            jobs = {
+                job_id: {
+                    'weight': throttle.weight,
+                    'rate_kbps': round(throttle.bucket.rate * 8 / 1000) if throttle.bucket.rate else 0,
+                    'bytes': throttle.bucket.consumed
+                }
+                for job_id, throttle in self._jobs.items()
+            }
+        return {
+            'limit_kbps': self.limit_kbps,
+            'schedule': format_schedule(self.schedule),
+            'current_limit_kbps': self.current_limit(),
+            'jobs': jobs
+        }
+
+    def _rebalance(self):
+        """Split the current limit between jobs by weight. Must be called with the lock held."""
+        limit = self.current_limit()
+        self._applied = limit
+        total_weight = sum(throttle.weight for throttle in self._jobs.values())
+        for throttle in self._jobs.values():
+            throttle.bucket.set_rate(bytes_per_second(limit) * throttle.weight / total_weight if limit else None)
@@ -0,0 +1,72 @@
+"""Compare per-call latency of the in-process and subprocess metadata backends
+
+Usage:
+    python benchmarks/bench_metadata_backend.py [url ...]
+
+For each URL both backends list its episodes (as /api/episodes and the video
+browser do) a few times and the latency per call is reported. The first
+library call includes importing svtplay_dl; later calls show the steady state.
+Without arguments only the fixed cost is measured: starting the svtplay-dl
+command (--version) against setting up options in-process.
+
+Needs svtplay-dl installed (pip install svtplay-dl).
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import svtplay_backend  # noqa: E402
+from svtplay_backend import LibraryBackend, SubprocessBackend  # noqa: E402
+from svtplay_handler import SVTPLAY_DL_CMD, get_env_with_local_bin  # noqa: E402
+
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def report(label, times, note=''):
+    print(f"  {label:<11} first {times[0] * 1000:8.1f} ms   median {statistics.median(times) * 1000:8.1f} ms"
+          f"   ({len(times)} calls) {note}")
+
+
+def startup_only(repeat):
+    print("Fixed cost per call")
+    times, _ = timed(lambda: subprocess.run(SVTPLAY_DL_CMD + ['--version'], capture_output=True), repeat)
+    report('subprocess', times)
+    times, _ = timed(svtplay_backend.setup_defaults, repeat)
+    report('library', times)
+
+
+def main():
+    if not LibraryBackend.available():
+        print("svtplay_dl is not importable - install svtplay-dl to compare the backends")
+        return
+
+    repeat = 5
+    urls = sys.argv[1:]
+    if not urls:
+        startup_only(repeat)
+        return
+
+    subprocess_backend = SubprocessBackend(SVTPLAY_DL_CMD, get_env_with_local_bin)
+    library = LibraryBackend(fallback=None)
+    for url in urls:
+        print(url)
+        times, result = timed(lambda: subprocess_backend.fetch_episodes(url), repeat)
+        report('subprocess', times, f"{result.get('count', result.get('error'))} episodes")
+        times, result = timed(lambda: library.fetch_episodes(url), repeat)
+        report('library', times, f"{result.get('count', result.get('error'))} episodes")
+    library.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Compare full-page BeautifulSoup parsing with the streaming head scan for og:image
+
+Usage:
+    python benchmarks/bench_og_image.py [page.html ...]
+
+Pages can be saved SVT Play / TV4 Play video pages, e.g.
+    curl -s https://www.svtplay.se/video/<id>/<slug> > svt.html
+Without arguments a synthetic page shaped like an SVT Play video page is used
+(a long <head> of meta/link/script tags followed by a large body with
+embedded JSON state and image cards).
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from html_meta import parse_full_page, scan_head  # noqa: E402
+
+
+def synthetic_page():
+    head = ['<!DOCTYPE html><html lang="sv"><head><meta charset="utf-8"><title>Avsnitt 1 | SVT Play</title>']
+    for i in range(40):
+        head.append(f'<link rel="preload" href="/_next/static/chunks/{i:04d}.js" as="script">')
+        head.append(f'<meta name="x-meta-{i}" content="{"v" * 80}">')
+    head.append('<script>' + 'window.__config = {"a": 1};' * 200 + '</script>')
+    head.append('<meta property="og:image" content="https://www.svtstatic.se/image/wide/992/12345.jpg">')
+    head.append('</head>')
+
+    body = ['<body><div id="__next">']
+    for i in range(400):
+        body.append(f'<article><a href="/video/id{i}/avsnitt-{i}"><img src="https://www.svtstatic.se/image/small/224/{i}.jpg">'
+                    f'<h3>Avsnitt {i}</h3><p>{"Beskrivning " * 20}</p></a></article>')
+    body.append('<script id="__NEXT_DATA__" type="application/json">' + '{"k": "' + 'x' * 200000 + '"}</script>')
+    body.append('</div></body></html>')
+    return (''.join(head) + ''.join(body)).encode('utf-8')
+
+
+def chunks(data, size, counter):
+    for start in range(0, len(data), size):
+        chunk = data[start:start + size]
+        counter[0] += len(chunk)
+        yield chunk
+
+
+def full_parse(page):
+    read = [0]
+    data = b''.join(chunks(page, Config.HTML_CHUNK_SIZE, read))
+    return parse_full_page(data.decode('utf-8', errors='replace')), read[0]
+
+
+def streaming_scan(page):
+    read = [0]
+    stream = chunks(page, Config.HTML_CHUNK_SIZE, read)
+    image, head = scan_head(stream)
+    if image is None:
+        image = parse_full_page((head + b''.join(stream)).decode('utf-8', errors='replace'))
+    return image, read[0]
+
+
+def run(label, page, extractor, repeat=20):
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        image, read = extractor(page)
+        cpu = time.process_time() - start
+        if best is None or cpu < best[0]:
+            best = (cpu, read, image)
+    print(f"  {label:<10} cpu {best[0] * 1000:8.2f} ms/page   read {best[1] / 1024:8.1f} KiB   image {best[2]}")
+    return best
+
+
+def main():
+    pages = [(os.path.basename(path), open(path, 'rb').read()) for path in sys.argv[1:]]
+    if not pages:
+        pages = [('synthetic SVT Play page', synthetic_page())]
+
+    for name, page in pages:
+        print(f"{name} ({len(page) / 1024:.0f} KiB)")
+        full = run('full parse', page, full_parse, repeat=5)
+        stream = run('head scan', page, streaming_scan)
+        if full[2] != stream[2]:
+            print("  WARNING: extractors found different images")
+        print(f"  speedup: {full[0] / max(stream[0], 1e-9):.0f}x cpu, "
+              f"{full[1] / max(stream[1], 1):.1f}x fewer bytes read")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Compare the old char-by-char stderr parser with the block-buffered one
+
+Usage:
+    python benchmarks/bench_progress_parser.py [transcript ...]
+
+A transcript is raw svtplay-dl stderr, recorded with e.g.
+    svtplay-dl --force <url> 2> transcript.txt
+Without arguments a synthetic transcript in svtplay-dl's format is used
+(log lines plus one \\r-repainted progress line per HLS segment).
+"""
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from output_parser import PROGRESS, OutputParser, iter_output_lines  # noqa: E402
+
+
+def synthetic_transcript(segments=2000, episodes=10):
+    """Build svtplay-dl-like stderr for `episodes` downloads of `segments` segments each"""
+    parts = []
+    for episode in range(1, episodes + 1):
+        parts.append(f'INFO: Episode {episode} of {episodes}\n')
+        parts.append(f'INFO: Url: https://www.svtplay.se/video/abc{episode}/avsnitt-{episode}\n')
+        parts.append(f'INFO: Outfile: /downloads/Avsnitt {episode}.ts\n')
+        for pos in range(1, segments + 1):
+            done = int(pos / segments * 50)
+            bar = '=' * done + '.' * (50 - done)
+            parts.append(f'\r[{pos:03d}/{segments:03d}][{bar}] ETA: 0:{(segments - pos) // 60:02d}:{(segments - pos) % 60:02d}')
+        parts.append('\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def old_parser(stream):
+    """The previous implementation: one read(1) and one string copy per character"""
+    segment_pattern = re.compile(r'\[\d+/\d+\]')
+    pos_total_pattern = re.compile(r'\[(\d+)/(\d+)\]')
+    stderr_lines = []
+    updates = 0
+    line_buffer = ''
+
+    while True:
+        char = stream.read(1)
+        if not char:
+            break
+        if char in ('\r', '\n'):
+            if line_buffer.strip():
+                if segment_pattern.search(line_buffer):
+                    match = pos_total_pattern.search(line_buffer)
+                    if match and int(match.group(2)) > 0:
+                        updates += 1
+                else:
+                    stderr_lines.append(line_buffer)
+            line_buffer = ''
+        else:
+            line_buffer += char
+
+    return stderr_lines, updates
+
+
+def new_parser(stream):
+    parser = OutputParser()
+    stderr_lines = []
+    updates = 0
+    for line in iter_output_lines(stream):
+        events = parser.feed(line)
+        if not events or events[0].kind != PROGRESS:
+            stderr_lines.append(line)
+        elif events[0].data['total'] > 0:
+            updates += 1
+    return stderr_lines, updates
+
+
+def run(label, path, parser, binary, repeat=3):
+    best = None
+    for _ in range(repeat):
+        with open(path, 'rb' if binary else 'r', encoding=None if binary else 'utf-8', newline='' if not binary else None) as f:
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+            lines, updates = parser(f)
+            elapsed = time.perf_counter() - start
+            cpu = time.process_time() - cpu_start
+        if best is None or cpu < best[1]:
+            best = (elapsed, cpu, len(lines), updates)
+    print(f"  {label:<14} wall {best[0] * 1000:8.1f} ms   cpu {best[1] * 1000:8.1f} ms   "
+          f"log lines {best[2]:5d}   progress lines {best[3]:6d}")
+    return best
+
+
+def main():
+    paths = sys.argv[1:]
+    temp_path = None
+    if not paths:
+        fd, temp_path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(synthetic_transcript())
+        paths = [temp_path]
+
+    try:
+        for path in paths:
+            size = os.path.getsize(path)
+            print(f"{os.path.basename(path)} ({size / 1024:.0f} KiB)")
+            old = run('char-by-char', path, old_parser, binary=False)
+            new = run('block-buffered', path, new_parser, binary=True)
+            if old[2:] != new[2:]:
+                print("  WARNING: parsers disagree on the transcript")
+            print(f"  speedup: {old[1] / max(new[1], 1e-9):.1f}x cpu")
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -18,13 +18,112 @@ class Config:
     # FFmpeg path (will be set during init)
     FFMPEG_PATH = None
 
+    # FFprobe path (set during init, override with FFPROBE_PATH env var). Used to
+    # skip merges that are not needed and to report merge progress; optional.
+    FFPROBE_PATH = os.environ.get('FFPROBE_PATH', '')
+
     # Server configuration
     HOST = '0.0.0.0'  # Listen on all interfaces to be accessible from network
     PORT = 5000
     DEBUG = False
 
-    # Maximum concurrent downloads
-    MAX_CONCURRENT_DOWNLOADS = 3
+    # Maximum concurrent downloads (size of the download worker pool)
+    MAX_CONCURRENT_DOWNLOADS = int(os.environ.get('MAX_CONCURRENT_DOWNLOADS', 3))
+
+    # How downloads run svtplay-dl: 'workers' keeps warm worker processes with
+    # svtplay_dl already imported (falls back to the command if it is not
+    # importable), 'subprocess' starts the svtplay-dl command for every download
+    DOWNLOAD_BACKEND = os.environ.get('DOWNLOAD_BACKEND', 'workers')
+
+    # Optional engine for single videos: 'segments' fetches HLS segments over
+    # SEGMENT_CONNECTIONS parallel connections (streams it cannot handle, such
+    # as DASH or encrypted HLS, still go through svtplay-dl)
+    DOWNLOAD_ENGINE = os.environ.get('DOWNLOAD_ENGINE', 'svtplay-dl')
+    SEGMENT_CONNECTIONS = int(os.environ.get('SEGMENT_CONNECTIONS', 6))
+    SEGMENT_WINDOW = 32  # Segments buffered ahead of the file being written
+
+    # Global download bandwidth in kbit/s (0 = unlimited), shared between running
+    # downloads by their bandwidth_weight option. BANDWIDTH_SCHEDULE sets other
+    # limits by time of day, e.g. '08:00-17:00=4000,22:00-07:00=0'. Both can be
+    # changed at runtime through /api/bandwidth. Enforced for the segment engine.
+    BANDWIDTH_LIMIT_KBPS = int(os.environ.get('BANDWIDTH_LIMIT_KBPS', 0))
+    BANDWIDTH_SCHEDULE = os.environ.get('BANDWIDTH_SCHEDULE', '')
+
+    # Automatic retries of failed downloads (see retry_policy): network errors
+    # and HTTP 5xx are tried up to RETRY_MAX_ATTEMPTS times in total, with the
+    # delay doubling from RETRY_BASE_DELAY seconds. Token and DRM errors never retry.
+    RETRY_MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', 4))
+    RETRY_BASE_DELAY = float(os.environ.get('RETRY_BASE_DELAY', 30))
+    RETRY_MAX_DELAY = 30 * 60
+
+    # Seconds a cancelled download gets to exit after SIGTERM before it is killed
+    CANCEL_GRACE_PERIOD = 10
+
+    # How seasons are downloaded: 'parallel' lists the episodes first and
+    # downloads them as separate jobs, 'serial' runs one svtplay-dl --all-episodes
+    SEASON_DOWNLOAD_MODE = os.environ.get('SEASON_DOWNLOAD_MODE', 'parallel')
+
+    # Maximum episodes of one season downloading at the same time (parallel mode)
+    SEASON_EPISODE_CONCURRENCY = int(os.environ.get('SEASON_EPISODE_CONCURRENCY', 2))
+
+    # Merging separate audio/video files with ffmpeg runs on its own workers,
+    # so disk-bound merges do not hold download slots (and the other way round).
+    # A merge is stopped when ffmpeg reports no progress for MERGE_STALL_TIMEOUT seconds.
+    MERGE_WORKERS = int(os.environ.get('MERGE_WORKERS', 1))
+    MERGE_STALL_TIMEOUT = 120
+
+    # Cache for episode lists and video info (/api/episodes, /api/scrape, /api/info).
+    # Set METADATA_CACHE_FILE to keep the cache across restarts.
+    METADATA_CACHE_TTL = int(os.environ.get('METADATA_CACHE_TTL', 900))  # Seconds
+    METADATA_CACHE_SIZE = 256  # Entries
+    METADATA_CACHE_FILE = os.environ.get('METADATA_CACHE_FILE', '')
+
+    # How /api/info and episode lists call svtplay-dl: 'library' imports svtplay_dl
+    # and runs it in-process (falls back to the command if that fails),
+    # 'subprocess' starts the svtplay-dl command for every lookup
+    METADATA_BACKEND = os.environ.get('METADATA_BACKEND', 'library')
+    METADATA_BACKEND_WORKERS = 4  # Threads running in-process lookups
+
+    # Thumbnail cache served from /thumbs/<video_id> (override with THUMBNAIL_DIR env var)
+    THUMBNAIL_DIR = os.environ.get('THUMBNAIL_DIR', os.path.join(BASE_DIR, 'thumbnails'))
+    THUMBNAIL_CACHE_MAX_MB = int(os.environ.get('THUMBNAIL_CACHE_MAX_MB', 200))
+    THUMBNAIL_MAX_AGE = 7 * 24 * 3600  # Browser cache lifetime in seconds
+    THUMBNAIL_MAX_WIDTH = 1920  # Largest ?w= accepted by /thumbs
+
+    # Scraping HTTP client: one keep-alive pool shared by the thumbnail threads
+    THUMBNAIL_FETCH_WORKERS = int(os.environ.get('THUMBNAIL_FETCH_WORKERS', 10))  # Threads and pooled connections
+    HTTP_PER_HOST_LIMIT = int(os.environ.get('HTTP_PER_HOST_LIMIT', 8))  # Concurrent requests per host
+    HTTP_RETRIES = 2  # Retries on connection errors and 429/5xx responses
+    HTTP_RETRY_BACKOFF = 0.3  # Seconds, doubled for each retry
+    HTTP_USER_AGENT = 'Mozilla/5.0 (compatible; SVTPlay-dl-GUI)'
+    HTML_CHUNK_SIZE = 16 * 1024  # Video pages are streamed and scanned for og:image up to </head>
+    HTTP_DRAIN_LIMIT = 64 * 1024  # Unread bytes drained to keep a connection after stopping early
+
+    # Extractors that harvest all thumbnails from a category/series page in one
+    # request, tried in order (see thumbnail_extractors.EXTRACTORS)
+    THUMBNAIL_EXTRACTORS = os.environ.get('THUMBNAIL_EXTRACTORS', 'embedded_json,article_cards').split(',')
+    VIDEO_METADATA_MAX_AGE = 7 * 24 * 3600  # Seconds before a scraped video is scraped again
+    SVT_IMAGE_URL = 'https://www.svtstatic.se/image/wide/992/{id}/{changed}?format=auto&quality=70'
+
+    # SQLite database holding queued, running and finished download jobs
+    # (override with JOBS_DB env var, e.g. to keep it on a Docker volume)
+    JOBS_DB = os.environ.get('JOBS_DB', os.path.join(BASE_DIR, 'jobs.db'))
+
+    # Number of finished (completed/failed) downloads kept in the job history
+    JOB_HISTORY_LIMIT = int(os.environ.get('JOB_HISTORY_LIMIT', 500))
+
+    # Minimum seconds between progress updates written to a download's status
+    PROGRESS_UPDATE_INTERVAL = float(os.environ.get('PROGRESS_UPDATE_INTERVAL', 0.5))
+
+    # Page size for /api/downloads (clients may ask for up to DOWNLOADS_PAGE_MAX)
+    DOWNLOADS_PAGE_SIZE = 100
+    DOWNLOADS_PAGE_MAX = 1000
+
+    # Live download updates (/api/downloads/stream): changes are coalesced and
+    # pushed at most once per STREAM_COALESCE_INTERVAL seconds
+    STREAM_COALESCE_INTERVAL = float(os.environ.get('STREAM_COALESCE_INTERVAL', 1.0))
+    STREAM_KEEPALIVE_INTERVAL = 15  # Seconds between keepalive comments when idle
+    STREAM_RETRY_MS = 3000  # Browser reconnect delay after a dropped stream
 
     # Default svtplay-dl options
     DEFAULT_QUALITY = 'best'
@@ -32,9 +131,13 @@ class Config:
 
     @staticmethod
     def init_app():
-        """Initialize application directories and find ffmpeg"""
+        """Initialize application directories and find ffmpeg and ffprobe"""
         os.makedirs(Config.DOWNLOAD_DIR, exist_ok=True)
+        Config._find_ffmpeg()
+        Config._find_ffprobe()
 
+    @staticmethod
+    def _find_ffmpeg():
         # Try to use imageio-ffmpeg (installed via pip)
         try:
             from imageio_ffmpeg import get_ffmpeg_exe
@@ -68,3 +171,26 @@ class Config:
         print("  Install with: pip install imageio-ffmpeg")
         print("  Or download manually to bin/ folder")
         Config.FFMPEG_PATH = 'ffmpeg'  # Fallback, may not work
+
+    @staticmethod
+    def _find_ffprobe():
+        if Config.FFPROBE_PATH:
+            return
+
+        # ffprobe is not part of imageio-ffmpeg; look next to ffmpeg, in bin/ and on PATH
+        import shutil
+        name = 'ffprobe.exe' if os.name == 'nt' else 'ffprobe'
+        candidates = [os.path.join(Config.BASE_DIR, 'bin', name)]
+        if Config.FFMPEG_PATH and os.path.dirname(Config.FFMPEG_PATH):
+            candidates.insert(0, os.path.join(os.path.dirname(Config.FFMPEG_PATH), name))
+        for candidate in candidates:
+            if os.path.exists(candidate):
+                Config.FFPROBE_PATH = candidate
+                break
+        else:
+            Config.FFPROBE_PATH = shutil.which('ffprobe') or ''
+
+        if Config.FFPROBE_PATH:
+            print(f"[OK] Using ffprobe: {Config.FFPROBE_PATH}")
+        else:
+            print("INFO: ffprobe not found, audio and video files are merged without checking them first")
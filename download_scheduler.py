@@ -0,0 +1,167 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class DownloadScheduler:
+    """Runs download jobs on a fixed pool of worker threads
+
+    Jobs wait in a priority queue until a worker is free. Lower priority
+    values run first; jobs with equal priority run in submission order.
+    Jobs submitted with a delay (retries) wait in a timer heap and join the
+    queue when due, without holding a worker while they wait. A running job
+    may submit itself again with follow_up=True (a retry); that run is
+    queued once the current one returns.
+    """
+
+    def __init__(self, max_workers, name='download'):
+        self.max_workers = max(1, int(max_workers))
+        self._heap = []  # [priority, sequence, job_id, func, args]
+        self._entries = {}  # job_id -> heap entry (for position lookups and cancel)
+        self._delayed = []  # [due (monotonic), sequence, entry] of jobs not runnable yet
+        self._follow_ups = {}  # job_id -> delay of a run submitted while the job was running
+        self._running = set()
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._shutdown = False
+
+        self._workers = []
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._worker_loop, name=f'{name}-worker-{i + 1}')
+            thread.daemon = True
+            thread.start()
+            self._workers.append(thread)
+
+    def submit(self, job_id, func, *args, priority=0, delay=0, follow_up=False):
+        """Queue func(*args) to run on the next free worker, at the earliest after delay seconds
+
+        A job that is queued or running is not submitted again, unless a
+        running job submits its own next run with follow_up=True.
+        """
+        with self._cond:
+            if job_id in self._entries or (job_id in self._running and not follow_up):
+                return False
+            entry = [priority, next(self._sequence), job_id, func, args]
+            self._entries[job_id] = entry
+            if job_id in self._running:
+                self._follow_ups[job_id] = delay
+            else:
+                self._push(entry, delay)
+            return True
+
+    def submit_many(self, jobs):
+        """Queue [(job_id, func, args, priority), ...] at once. Returns the number of jobs queued.
+
+        Jobs already queued or running are skipped, like with submit().
+        """
+        with self._cond:
+            queued = 0
+            for job_id, func, args, priority in jobs:
+                if job_id in self._entries or job_id in self._running:
+                    continue
+                entry = [priority, next(self._sequence), job_id, func, tuple(args)]
+                self._entries[job_id] = entry
+                self._heap.append(entry)
+                queued += 1
+            if queued:
+                heapq.heapify(self._heap)
+                self._cond.notify_all()
+            return queued
+
+    def cancel(self, job_id):
+        """Remove a job that has not started yet. Returns True if it was queued."""
+        with self._cond:
+            entry = self._entries.pop(job_id, None)
+            if entry is None:
+                return False
+            # Lazy deletion - the worker loop skips entries without a function
+            entry[3] = None
+            return True
+
+    def is_queued(self, job_id):
+        with self._cond:
+            return job_id in self._entries
+
+    def is_running(self, job_id):
+        with self._cond:
+            return job_id in self._running
+
+    def positions(self):
+        """Return {job_id: position} for every queued job (1 = next to start)"""
+        with self._cond:
+            waiting = {item[2][2] for item in self._delayed} | set(self._follow_ups)
+            # Delayed jobs line up behind the ones that can run now
+            ordered = sorted(self._entries.values(), key=lambda entry: (entry[2] in waiting, entry[0], entry[1]))
+        return {entry[2]: index + 1 for index, entry in enumerate(ordered)}
+
+    def position(self, job_id):
+        """Return the queue position of a job, or None if it is not queued"""
+        return self.positions().get(job_id)
+
+    def stats(self):
+        """Return queue depth and worker usage"""
+        with self._cond:
+            return {
+                'queued': len(self._entries),
+                'running': len(self._running),
+                'max_concurrent': self.max_workers
+            }
+
+    def shutdown(self):
+        """Stop the workers after their current job. Queued jobs are dropped."""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                entry = self._next_entry()
+                if entry is None:
+                    return
+                job_id, func, args = entry[2], entry[3], entry[4]
+                self._running.add(job_id)
+
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Error in download job {job_id}: {e}")
+            finally:
+                with self._cond:
+                    self._running.discard(job_id)
+                    if job_id in self._follow_ups:
+                        delay = self._follow_ups.pop(job_id)
+                        follow_up = self._entries.get(job_id)
+                        if follow_up is not None:
+                            self._push(follow_up, delay)
+
+    def _push(self, entry, delay):
+        """Queue an entry now or after delay seconds. Must be called with the lock held."""
+        if delay > 0:
+            heapq.heappush(self._delayed, [time.monotonic() + delay, entry[1], entry])
+            # Idle workers recompute how long to wait
+            self._cond.notify_all()
+        else:
+            heapq.heappush(self._heap, entry)
+            self._cond.notify()
+
+    def _next_entry(self):
+        """Block until a live entry is available. Must be called with the lock held."""
+        while not self._shutdown:
+            self._release_due()
+            while self._heap:
+                entry = heapq.heappop(self._heap)
+                if entry[3] is not None:
+                    del self._entries[entry[2]]
+                    return entry
+            self._cond.wait(min(self._delayed[0][0] - time.monotonic(), 3600) if self._delayed else None)
+        return None
+
+    def _release_due(self):
+        """Move delayed jobs whose time has come to the run queue. Must be called with the lock held."""
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            entry = heapq.heappop(self._delayed)[2]
+            if entry[3] is not None:
+                heapq.heappush(self._heap, entry)
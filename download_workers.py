@@ -0,0 +1,268 @@
+import importlib.util
+import io
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from multiprocessing import connection
+
+import process_control
+
+# Messages a worker sends to the parent over its pipe: (job_id, kind, data)
+STARTED = 'started'    # data: {'pid': pid}
+LOG = 'log'            # data: {'message': 'INFO: ...'} - one svtplay_dl log record
+PROGRESS = 'progress'  # data: {'pos': pos, 'total': total} - a progress bar update
+EXIT = 'exit'          # data: {'returncode': code, 'stdout': text}
+
+# svtplay_dl modules imported before the first job, so a job starts without import cost
+PRELOAD_MODULES = ('svtplay_dl', 'svtplay_dl.service.services', 'svtplay_dl.utils.getmedia',
+                   'svtplay_dl.utils.output')
+
+_current_send = [None]  # Where the patched progressbar reports to (set per job in the worker)
+
+
+def svtplay_dl_available():
+    return importlib.util.find_spec('svtplay_dl') is not None
+
+
+def _warm_up():
+    """Import svtplay_dl and route its progress bar to the current job (runs in the worker)"""
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+
+    output = sys.modules.get('svtplay_dl.utils.output')
+    original = getattr(output, 'progressbar', None)
+    if original is None:
+        return
+
+    def progressbar(total, pos, msg=''):
+        send = _current_send[0]
+        if send is not None:
+            send(PROGRESS, {'pos': pos, 'total': total})
+
+    # The fetchers import progressbar by name, so patch every module's reference
+    for module in list(sys.modules.values()):
+        if getattr(module, '__name__', '').startswith('svtplay_dl') and getattr(module, 'progressbar', None) is original:
+            module.progressbar = progressbar
+
+
+class _PipeLogHandler(logging.Handler):
+    """Forwards svtplay_dl log records to the parent, formatted like its stderr output"""
+
+    def __init__(self, send):
+        super().__init__()
+        self.send = send
+        self.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+
+    def emit(self, record):
+        try:
+            self.send(LOG, {'message': self.format(record)})
+        except Exception:
+            self.handleError(record)
+
+
+def run_svtplay_dl(args, send):
+    """Run svtplay-dl with command line args in this process. Returns (returncode, stdout)"""
+    import svtplay_dl
+
+    log = logging.getLogger('svtplay_dl')
+    saved_handlers = list(log.handlers)
+    saved_argv, saved_stdout = sys.argv, sys.stdout
+    sys.argv = ['svtplay-dl'] + list(args)
+    sys.stdout = io.StringIO()
+    log.addHandler(_PipeLogHandler(send))
+    _current_send[0] = send
+    try:
+        svtplay_dl.main()
+        returncode = 0
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally:
+        _current_send[0] = None
+        stdout = sys.stdout.getvalue()
+        sys.argv, sys.stdout = saved_argv, saved_stdout
+        # main() sets up its own stderr handler on every run
+        log.handlers[:] = saved_handlers
+    return returncode, stdout
+
+
+def _worker_main(jobs, conn, runner, max_jobs):
+    """Worker process: run jobs from the shared queue, reporting over conn"""
+    # Its own process group, so a job (with svtplay-dl's ffmpeg) can be paused or stopped as a whole
+    process_control.become_group_leader()
+    _warm_up()
+    for _ in range(max_jobs):
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, args, env = job
+
+        def send(kind, data, job_id=job_id):
+            conn.send((job_id, kind, data))
+
+        send(STARTED, {'pid': os.getpid()})
+        saved_env = dict(os.environ)
+        if env:
+            os.environ.clear()
+            os.environ.update(env)
+        try:
+            returncode, stdout = runner(args, send)
+        except Exception as e:
+            send(LOG, {'message': f'ERROR: {e}'})
+            returncode, stdout = 1, ''
+        finally:
+            os.environ.clear()
+            os.environ.update(saved_env)
+        send(EXIT, {'returncode': returncode, 'stdout': stdout})
+    # Recycled after max_jobs so state leaking between jobs cannot pile up
+    conn.close()
+
+
+def _context():
+    """forkserver with svtplay_dl pre-imported where available (Unix), spawn otherwise (Windows)"""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(list(PRELOAD_MODULES) + [__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class DownloadWorkerPool:
+    """Warm worker processes that run svtplay-dl downloads in-process
+
+    Starting the svtplay-dl command costs an interpreter start and the
+    svtplay_dl imports for every download. The workers are started once
+    (forked from a server that already imported svtplay_dl) and take jobs
+    from a shared queue. Each worker reports structured log records,
+    progress and the exit code back over its own pipe; a dispatcher thread
+    routes them to the job's caller. A worker that dies is replaced, and
+    workers are recycled after max_jobs downloads.
+
+    runner(args, send) runs one job in the worker and returns
+    (returncode, stdout); it must be importable by the worker processes.
+    """
+
+    def __init__(self, size, max_jobs=50, runner=run_svtplay_dl):
+        self.size = max(1, int(size))
+        self.max_jobs = max_jobs
+        self.runner = runner
+        self._context = None
+        self._jobs = None
+        self._workers = {}    # pipe -> Process
+        self._running = {}    # pipe -> job_id
+        self._listeners = {}  # job_id -> queue.Queue of (kind, data)
+        self._lock = threading.Lock()
+        self._dispatcher = None
+        self._closed = False
+
+    def run(self, job_id, args, env=None):
+        """Run svtplay-dl args on a worker. Yields (kind, data) messages, ending with EXIT"""
+        self._start()
+        events = queue.Queue()
+        with self._lock:
+            self._listeners[job_id] = events
+        self._jobs.put((job_id, list(args), env))
+        try:
+            while True:
+                kind, data = events.get()
+                yield kind, data
+                if kind == EXIT:
+                    return
+        finally:
+            with self._lock:
+                self._listeners.pop(job_id, None)
+
+    def close(self):
+        """Stop the workers after their current job"""
+        with self._lock:
+            if self._closed or self._dispatcher is None:
+                self._closed = True
+                return
+            self._closed = True
+            processes = list(self._workers.values())
+        for _ in processes:
+            self._jobs.put(None)
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    def _start(self):
+        """Start the workers on first use"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Download worker pool is closed')
+            if self._dispatcher is not None:
+                return
+            self._context = _context()
+            self._jobs = self._context.Queue()
+            for _ in range(self.size):
+                self._spawn()
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name='download-worker-dispatch')
+            self._dispatcher.daemon = True
+            self._dispatcher.start()
+
+    def _spawn(self):
+        """Start one worker. Must be called with the lock held"""
+        reader, writer = self._context.Pipe(duplex=False)
+        process = self._context.Process(target=_worker_main, args=(self._jobs, writer, self.runner, self.max_jobs),
+                                        name='svtplay-dl-worker', daemon=True)
+        process.start()
+        writer.close()
+        self._workers[reader] = process
+
+    def _dispatch_loop(self):
+        while True:
+            with self._lock:
+                if self._closed and not self._workers:
+                    return
+                pipes = list(self._workers)
+            for pipe in connection.wait(pipes, timeout=0.5):
+                try:
+                    job_id, kind, data = pipe.recv()
+                except (EOFError, OSError):
+                    self._replace(pipe)
+                    continue
+                with self._lock:
+                    if kind == STARTED:
+                        self._running[pipe] = job_id
+                    elif kind == EXIT:
+                        self._running.pop(pipe, None)
+                self._deliver(job_id, kind, data)
+
+    def _replace(self, pipe):
+        """A worker exited (recycled or crashed) - fail its job and start a new one"""
+        with self._lock:
+            process = self._workers.pop(pipe)
+            job_id = self._running.pop(pipe, None)
+            if not self._closed:
+                self._spawn()
+        pipe.close()
+        process.join(timeout=5)
+        if job_id is not None:
+            print(f"Download worker {process.pid} exited with code {process.exitcode} during {job_id}")
+            self._deliver(job_id, LOG, {'message': f'ERROR: Download worker exited unexpectedly ({process.exitcode})'})
+            self._deliver(job_id, EXIT, {'returncode': -1, 'stdout': ''})
+
+    def _deliver(self, job_id, kind, data):
+        with self._lock:
+            listener = self._listeners.get(job_id)
+        if listener is not None:
+            listener.put((kind, data))
+
+
+def create_worker_pool(backend, size):
+    """The pool for Config.DOWNLOAD_BACKEND 'workers', or None to start the svtplay-dl command per download"""
+    if backend == 'subprocess':
+        return None
+    if backend != 'workers':
+        print(f"Unknown download backend: {backend}, using workers")
+    if not svtplay_dl_available():
+        print("INFO: svtplay_dl not importable, downloads use the svtplay-dl command")
+        return None
+    return DownloadWorkerPool(size)
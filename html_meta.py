@@ -0,0 +1,118 @@
+import html
+import re
+
+from bs4 import BeautifulSoup
+
+# <meta ...> tags and their attributes, scanned on raw bytes without building a tree
+META_TAG_PATTERN = re.compile(rb'<meta\b[^>]*>', re.IGNORECASE)
+ATTRIBUTE_PATTERN = re.compile(rb'''([a-zA-Z_:.-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))''')
+HEAD_END_PATTERN = re.compile(rb'</head\s*>|<body\b', re.IGNORECASE)
+
+# Meta tags holding a page's preview image, most preferred first
+IMAGE_META_KEYS = (b'og:image', b'twitter:image')
+
+# Give up on the streaming scan after this many bytes without seeing </head>
+MAX_HEAD_BYTES = 512 * 1024
+
+
+def _attributes(tag):
+    """{name: value} (lowercase bytes names) for the attributes of one raw tag"""
+    attributes = {}
+    for match in ATTRIBUTE_PATTERN.finditer(tag):
+        value = match.group(2) if match.group(2) is not None else match.group(3)
+        if value is None:
+            value = match.group(4)
+        attributes[match.group(1).lower()] = value
+    return attributes
+
+
+def _meta_image(tag):
+    """Return (key, url) if a <meta> tag is an og:image/twitter:image tag, else None"""
+    attributes = _attributes(tag)
+    key = (attributes.get(b'property') or attributes.get(b'name') or b'').lower()
+    content = attributes.get(b'content')
+    if key in IMAGE_META_KEYS and content:
+        return key, html.unescape(content.decode('utf-8', errors='replace')).strip()
+    return None
+
+
+def scan_head(chunks, max_bytes=MAX_HEAD_BYTES, full_head=False):
+    """Find the preview image in streamed HTML, reading no further than needed
+
+    Consumes byte chunks from the iterator until an og:image tag is found
+    (unless full_head is set), the end of <head> is seen or max_bytes have
+    been read. Returns (image_url, data) where data is everything read so
+    far, so a caller can look for more in it or fall back to
+    parse_full_page(data + rest of the stream).
+    """
+    data = bytearray()
+    scanned = 0  # Tags before this offset have been checked
+    found = {}
+
+    def scan(limit):
+        nonlocal scanned
+        for match in META_TAG_PATTERN.finditer(data, scanned, limit):
+            image = _meta_image(match.group(0))
+            if image:
+                found.setdefault(image[0], image[1])
+        scanned = max(scanned, limit)
+
+    head_end = None
+    for chunk in chunks:
+        data += chunk
+
+        head_end = HEAD_END_PATTERN.search(data, max(0, scanned - 16))
+        if head_end:
+            scan(head_end.start())
+        else:
+            # Only scan complete tags; the last '<' may start a tag split across chunks
+            last_open = data.rfind(b'<', scanned)
+            scan(last_open if last_open >= 0 else len(data))
+
+        if b'og:image' in found and not full_head:
+            return found[b'og:image'], bytes(data)
+        if head_end or len(data) >= max_bytes:
+            break
+
+    if head_end is None:
+        scan(len(data))
+    return found.get(b'og:image') or found.get(b'twitter:image'), bytes(data)
+
+
+def meta_properties(data):
+    """{property or name: content} for every <meta> tag in raw HTML bytes, first one wins"""
+    properties = {}
+    for match in META_TAG_PATTERN.finditer(data):
+        attributes = _attributes(match.group(0))
+        key = attributes.get(b'property') or attributes.get(b'name')
+        content = attributes.get(b'content')
+        if key and content is not None:
+            properties.setdefault(key.decode('utf-8', errors='replace').lower(),
+                                  html.unescape(content.decode('utf-8', errors='replace')).strip())
+    return properties
+
+
+def parse_full_page(page):
+    """Find a preview image with a full BeautifulSoup parse (the slow fallback)"""
+    soup = BeautifulSoup(page, 'html.parser')
+
+    # Try to find og:image meta tag (Open Graph image - used for social sharing)
+    og_image = soup.find('meta', property='og:image')
+    if og_image and og_image.get('content'):
+        return og_image.get('content')
+
+    # Try to find Twitter card image
+    twitter_image = soup.find('meta', attrs={'name': 'twitter:image'})
+    if twitter_image and twitter_image.get('content'):
+        return twitter_image.get('content')
+
+    # Try to find any img tag with relevant class or data attributes
+    # SVT Play often uses specific patterns
+    for img in soup.find_all('img'):
+        src = img.get('src', '')
+        # Look for image URLs that seem to be thumbnails/posters
+        if 'image' in src or 'thumb' in src or 'svtstatic' in src:
+            if src.startswith('http'):
+                return src
+
+    return None
@@ -0,0 +1,121 @@
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import Config
+
+
+class HttpClient:
+    """Shared HTTP client for scraping SVT Play pages and images
+
+    One requests.Session with a keep-alive connection pool, so the thumbnail
+    threads reuse TCP/TLS connections instead of opening one per request.
+    Idempotent requests are retried with exponential backoff on connection
+    errors and 429/5xx responses, and at most per_host_limit requests run
+    against one host at a time.
+
+    host_overrides maps a host name to a base URL that requests for that
+    host are sent to instead, e.g. {'www.svtplay.se': 'http://127.0.0.1:8000'}
+    to point the scraper at a local stub server.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, pool_size=10, per_host_limit=6, retries=2, backoff=0.3,
+                 timeout=10, host_overrides=None):
+        self.timeout = timeout
+        self.per_host_limit = per_host_limit
+        self.host_overrides = dict(host_overrides or {})
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False  # Hand the last response back instead of raising
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=retry, pool_block=True)
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = Config.HTTP_USER_AGENT
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, timeout=None, **kwargs):
+        """GET a URL through the shared pool. Same arguments as requests.get"""
+        url = self._resolve(url)
+        with self._host_slot(urlsplit(url).netloc):
+            return self.session.get(url, timeout=timeout or self.timeout, **kwargs)
+
+    def release(self, response):
+        """Hand a stream=True response's connection back to the pool
+
+        A keep-alive connection can only be reused once the body has been
+        read, so a short unread remainder (up to Config.HTTP_DRAIN_LIMIT
+        bytes) is drained. Longer bodies close the connection instead.
+        """
+        raw = response.raw
+        try:
+            length = response.headers.get('Content-Length', '')
+            remaining = int(length) - raw.tell() if length.isdigit() else None
+            if remaining is not None and remaining <= Config.HTTP_DRAIN_LIMIT:
+                raw.drain_conn()
+                raw.release_conn()
+                return
+        except Exception:
+            pass
+        response.close()
+
+    def close(self):
+        self.session.close()
+
+    def _resolve(self, url):
+        parts = urlsplit(url)
+        base = self.host_overrides.get(parts.hostname)
+        if not base:
+            return url
+        target = urlsplit(base)
+        return urlunsplit((target.scheme, target.netloc, parts.path, parts.query, ''))
+
+    @contextmanager
+    def _host_slot(self, host):
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+        with slot:
+            yield
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Return the process-wide HttpClient, creating it from Config on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient(
+                pool_size=Config.THUMBNAIL_FETCH_WORKERS,
+                per_host_limit=Config.HTTP_PER_HOST_LIMIT,
+                retries=Config.HTTP_RETRIES,
+                backoff=Config.HTTP_RETRY_BACKOFF
+            )
+        return _client
+
+
+def set_http_client(client):
+    """Replace the process-wide HttpClient (e.g. with one using host_overrides
+    in tests). Returns the previous client."""
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+        return previous
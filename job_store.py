@@ -0,0 +1,101 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+
+class JobStore:
+    """Durable download job store backed by SQLite (WAL mode)
+
+    Each job is stored as one row holding its public status dict and the
+    options it was started with, so queued and interrupted jobs can be
+    re-enqueued after a restart.
+    """
+
+    FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        if db_path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                data TEXT NOT NULL,
+                options TEXT
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at)')
+        self._conn.commit()
+
+    UPSERT = '''
+        INSERT INTO jobs (id, status, created_at, updated_at, data, options)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            status = excluded.status,
+            updated_at = excluded.updated_at,
+            data = excluded.data,
+            options = COALESCE(excluded.options, jobs.options)
+    '''
+
+    def save(self, job, options=None):
+        """Insert or update a job. Stored options are kept when options is None."""
+        self.save_many([(job, options)])
+
+    def save_many(self, jobs):
+        """Insert or update [(job, options), ...] in one transaction"""
+        now = datetime.now().isoformat()
+        rows = [(job['id'], job['status'], job.get('started_at') or now, now, json.dumps(job),
+                 json.dumps(options) if options is not None else None)
+                for job, options in jobs]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(self.UPSERT, rows)
+
+    def load_all(self):
+        """Return [(job, options), ...] ordered oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT data, options FROM jobs ORDER BY created_at, rowid'
+            ).fetchall()
+
+        jobs = []
+        for data, options in rows:
+            try:
+                jobs.append((json.loads(data), json.loads(options) if options else {}))
+            except json.JSONDecodeError as e:
+                print(f"Skipping corrupt job row: {e}")
+        return jobs
+
+    def prune(self, keep):
+        """Delete all but the newest `keep` finished jobs. Returns the deleted IDs.
+
+        Finished items of a batch or season that is still running are kept,
+        since its counts are rolled up from them.
+        """
+        placeholders = ','.join('?' for _ in self.FINISHED_STATUSES)
+        with self._lock:
+            rows = self._conn.execute(f'''
+                SELECT id FROM jobs WHERE status IN ({placeholders})
+                AND NOT EXISTS (
+                    SELECT 1 FROM jobs AS parent
+                    WHERE parent.id = json_extract(jobs.data, '$.parent_id')
+                    AND parent.status NOT IN ({placeholders})
+                )
+                ORDER BY created_at DESC, rowid DESC LIMIT -1 OFFSET ?
+            ''', (*self.FINISHED_STATUSES, *self.FINISHED_STATUSES, max(0, keep))).fetchall()
+            deleted = [row[0] for row in rows]
+            if deleted:
+                self._conn.executemany('DELETE FROM jobs WHERE id = ?', [(job_id,) for job_id in deleted])
+                self._conn.commit()
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,103 @@
+import json
+import subprocess
+import threading
+import time
+
+from config import Config
+
+
+class MergeError(Exception):
+    """ffmpeg could not merge a video file with its audio file"""
+
+
+def probe(path):
+    """Stream types and duration of a media file: {'streams': ['video', 'audio'], 'duration': seconds}
+
+    Returns None when ffprobe is not available or cannot read the file.
+    """
+    if not Config.FFPROBE_PATH:
+        return None
+    try:
+        result = subprocess.run(
+            [Config.FFPROBE_PATH, '-v', 'error', '-show_entries', 'stream=codec_type:format=duration',
+             '-of', 'json', path],
+            capture_output=True, text=True, timeout=30
+        )
+        if result.returncode != 0:
+            return None
+        data = json.loads(result.stdout or '{}')
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+    try:
+        duration = float(data.get('format', {}).get('duration'))
+    except (TypeError, ValueError):
+        duration = None
+    return {'streams': [stream.get('codec_type') for stream in data.get('streams', [])], 'duration': duration}
+
+
+def needs_merge(video_info, audio_info):
+    """False when probing shows the audio file adds nothing: the video already has audio, or it has none"""
+    if video_info is None or audio_info is None:
+        return True
+    return 'audio' not in video_info['streams'] and 'audio' in audio_info['streams']
+
+
+def merge(video_path, audio_path, output_path, duration=None, on_progress=None, stall_timeout=None):
+    """Copy the video and audio streams into output_path with ffmpeg, without re-encoding
+
+    on_progress(percent) is called as ffmpeg reports its position (percent
+    needs the duration, from probe()). There is no limit on the total time,
+    which depends on the file size and the disk; ffmpeg is only stopped when
+    it has not reported progress for stall_timeout seconds.
+    """
+    stall_timeout = stall_timeout or Config.MERGE_STALL_TIMEOUT
+    cmd = [
+        Config.FFMPEG_PATH,
+        '-i', video_path,
+        '-i', audio_path,
+        '-map', '0:v',  # Explicitly map video from first input
+        '-map', '1:a',  # Explicitly map audio from second input
+        '-c', 'copy',  # Copy streams without re-encoding
+        '-progress', 'pipe:1',  # key=value progress blocks on stdout
+        '-nostats',
+        '-y',  # Overwrite output file
+        output_path
+    ]
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, encoding='utf-8', errors='replace')
+
+    # stderr is drained on its own thread so a chatty ffmpeg never blocks on a full pipe
+    stderr_lines = []
+    stderr_thread = threading.Thread(target=lambda: stderr_lines.extend(process.stderr), daemon=True)
+    stderr_thread.start()
+
+    last_output = [time.monotonic()]
+    stalled = threading.Event()
+    finished = threading.Event()
+
+    def watchdog():
+        while not finished.wait(min(1.0, stall_timeout / 4)):
+            if time.monotonic() - last_output[0] > stall_timeout:
+                stalled.set()
+                process.kill()
+                return
+
+    threading.Thread(target=watchdog, daemon=True).start()
+    try:
+        for line in process.stdout:
+            last_output[0] = time.monotonic()
+            key, _, value = line.strip().partition('=')
+            if key == 'out_time_us' and duration and on_progress and value.isdigit():
+                on_progress(min(99.0, round(int(value) / 1e6 / duration * 100, 1)))
+        returncode = process.wait()
+    finally:
+        finished.set()
+    stderr_thread.join(5)
+
+    if stalled.is_set():
+        raise MergeError(f'ffmpeg made no progress for {stall_timeout} s')
+    if returncode != 0:
+        raise MergeError(''.join(stderr_lines[-20:]).strip() or f'ffmpeg exited with code {returncode}')
+    if on_progress:
+        on_progress(100.0)
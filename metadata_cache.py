@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+def normalize_url(url):
+    """Normalize a video/series URL so equivalent spellings share a cache key"""
+    parts = urlsplit(url.strip())
+    scheme = 'https' if parts.scheme in ('http', 'https', '') else parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def make_key(kind, url, token=None):
+    """Cache key for one kind of lookup ('episodes', 'info') of a URL.
+    The token is only stored as a fingerprint."""
+    fingerprint = hashlib.sha256(token.encode('utf-8')).hexdigest()[:16] if token else ''
+    return f'{kind}|{normalize_url(url)}|{fingerprint}'
+
+
+class _Flight:
+    """A load in progress that other callers for the same key wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MetadataCache:
+    """In-memory TTL cache with LRU eviction and single-flight loading
+
+    Concurrent get_or_load calls for the same key share one loader call.
+    Only results accepted by `cacheable` are stored. When `path` is set the
+    cache is saved to a JSON file and reloaded on startup.
+    """
+
+    def __init__(self, ttl, max_entries, path=None, cacheable=None, clock=time.time):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.cacheable = cacheable or (lambda result: True)
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._load()
+
+    def get(self, key):
+        """Return a fresh cached value, or None"""
+        with self._lock:
+            return self._get_fresh(key)
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() once on a miss"""
+        with self._lock:
+            value = self._get_fresh(key)
+            if value is not None:
+                return value
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = loader()
+            if self.cacheable(flight.result):
+                self.put(key, flight.result)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            snapshot = list(self._entries.items()) if self.path else None
+
+        if snapshot is not None:
+            self._save(snapshot)
+
+    def _get_fresh(self, key):
+        """Must be called with the lock held"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except Exception as e:
+            print(f"Error loading metadata cache: {e}")
+            return
+
+        now = self.clock()
+        for key, expires_at, value in saved[-self.max_entries:]:
+            if expires_at > now:
+                self._entries[key] = (expires_at, value)
+
+    def _save(self, entries):
+        try:
+            with self._save_lock:
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump([[key, expires_at, value] for key, (expires_at, value) in entries], f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error saving metadata cache: {e}")
@@ -0,0 +1,113 @@
+import os
+import re
+from collections import namedtuple
+
+
+def iter_output_lines(stream, chunk_size=65536):
+    """Yield non-empty lines from a binary pipe as they arrive
+
+    svtplay-dl repaints its progress bar with \\r instead of \\n, so lines are
+    split on both. Data is read in blocks with os.read and split on bytes,
+    which is safe for UTF-8 because \\r and \\n never occur inside a
+    multi-byte character.
+    """
+    fd = stream.fileno()
+    buffer = bytearray()
+
+    while True:
+        chunk = os.read(fd, chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+
+        end = max(buffer.rfind(b'\n'), buffer.rfind(b'\r'))
+        if end < 0:
+            continue
+
+        complete = bytes(buffer[:end])
+        del buffer[:end + 1]
+        for line in complete.replace(b'\r', b'\n').split(b'\n'):
+            if line.strip():
+                yield line.decode('utf-8', errors='replace')
+
+    if buffer.strip():
+        yield buffer.decode('utf-8', errors='replace')
+
+
+# Event kinds emitted by OutputParser
+EPISODE_START = 'episode_start'  # data: {'number': n, 'total': total}
+URL = 'url'                      # data: {'url': url}
+OUTFILE = 'outfile'              # data: {'filename': path}
+SKIPPED = 'skipped'              # data: {} - output file already existed
+DOWNLOADING = 'downloading'      # data: {}
+PROGRESS = 'progress'            # data: {'pos': pos, 'total': total, 'percent': float}
+ERROR = 'error'                  # data: {'message': line}
+LOG = 'log'                      # data: {'message': line} - any other non-progress line
+
+OutputEvent = namedtuple('OutputEvent', ['kind', 'episode', 'data'])
+
+
+class OutputParser:
+    """Streaming parser for svtplay-dl output, shared by single and season downloads
+
+    Each line is matched once against one precompiled pattern. The parser
+    remembers which episode is being processed so events from season
+    downloads carry their episode number (None for single downloads).
+    """
+
+    # Progress lines look like: [pos/total][====....] ETA: H:MM:SS
+    LINE_PATTERN = re.compile(
+        r'(?P<episode_start>Episode\s+(?P<number>\d+)\s+of\s+(?P<episodes>\d+))'
+        r'|\[(?P<pos>\d+)/(?P<total>\d+)\]'
+        r'|Url:\s+(?P<url>https?://\S+)'
+        r'|Outfile:\s+(?P<outfile>.+)'
+        r'|(?P<exists>already exists)'
+        r'|(?P<downloading>downloading)',
+        re.IGNORECASE
+    )
+    ERROR_PREFIX = 'ERROR'
+
+    def __init__(self):
+        self.current_episode = None
+
+    def feed(self, line):
+        """Parse one line and return a list of OutputEvents"""
+        line = line.strip()
+        if not line:
+            return []
+
+        match = self.LINE_PATTERN.search(line)
+        if match is None:
+            kind = ERROR if line.upper().startswith(self.ERROR_PREFIX) else LOG
+            return [OutputEvent(kind, self.current_episode, {'message': line})]
+
+        group = match.lastgroup
+        if group == 'episode_start':
+            self.current_episode = int(match.group('number'))
+            total = int(match.group('episodes'))
+            return [
+                OutputEvent(EPISODE_START, self.current_episode, {'number': self.current_episode, 'total': total}),
+                OutputEvent(LOG, self.current_episode, {'message': line})
+            ]
+
+        if match.group('pos') is not None:
+            return [self.progress(int(match.group('pos')), int(match.group('total')))]
+
+        events = []
+        if group == 'url':
+            events.append(OutputEvent(URL, self.current_episode, {'url': match.group('url')}))
+        elif group == 'outfile':
+            events.append(OutputEvent(OUTFILE, self.current_episode, {'filename': match.group('outfile').strip()}))
+        elif group == 'exists':
+            events.append(OutputEvent(SKIPPED, self.current_episode, {}))
+        elif group == 'downloading':
+            events.append(OutputEvent(DOWNLOADING, self.current_episode, {}))
+
+        kind = ERROR if line.upper().startswith(self.ERROR_PREFIX) else LOG
+        events.append(OutputEvent(kind, self.current_episode, {'message': line}))
+        return events
+
+    def progress(self, pos, total):
+        """A PROGRESS event for the current episode, e.g. from a worker's structured progress report"""
+        percent = round(pos / total * 100, 1) if total > 0 else 0.0
+        return OutputEvent(PROGRESS, self.current_episode, {'pos': pos, 'total': total, 'percent': percent})
@@ -0,0 +1,77 @@
+import os
+import signal
+import subprocess
+import time
+
+POSIX = os.name == 'posix'
+
+
+def popen_kwargs():
+    """Popen arguments starting the command in its own process group
+
+    Everything the command starts (svtplay-dl's ffmpeg) joins the group, so
+    it can be signalled as a whole without touching the app itself.
+    """
+    if POSIX:
+        return {'start_new_session': True}
+    return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+
+
+def become_group_leader():
+    """Move the calling process (a download worker) into a process group of its own"""
+    if POSIX:
+        os.setpgid(0, 0)
+
+
+def can_suspend():
+    return POSIX
+
+
+def group_alive(pid):
+    try:
+        os.killpg(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def suspend(pid):
+    """Stop the process group with SIGSTOP. Returns False if it is gone or this is not POSIX."""
+    return _signal_group(pid, signal.SIGSTOP) if POSIX else False
+
+
+def resume(pid):
+    """Continue a process group stopped by suspend()"""
+    return _signal_group(pid, signal.SIGCONT) if POSIX else False
+
+
+def terminate(pid, grace_period):
+    """Ask the process group to exit (SIGTERM), and SIGKILL whatever is left after grace_period seconds
+
+    A suspended group is continued first so it can act on SIGTERM. Blocks
+    until the group is gone or killed. On Windows the process tree is
+    killed right away with taskkill.
+    """
+    if not POSIX:
+        subprocess.run(['taskkill', '/T', '/F', '/PID', str(pid)], capture_output=True)
+        return
+
+    if not (_signal_group(pid, signal.SIGCONT) and _signal_group(pid, signal.SIGTERM)):
+        return
+    deadline = time.monotonic() + grace_period
+    while time.monotonic() < deadline:
+        if not group_alive(pid):
+            return
+        time.sleep(0.1)
+    print(f"Process group {pid} did not exit within {grace_period} s, killing it")
+    _signal_group(pid, signal.SIGKILL)
+
+
+def _signal_group(pid, sig):
+    try:
+        os.killpg(pid, sig)
+        return True
+    except ProcessLookupError:
+        return False
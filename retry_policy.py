@@ -0,0 +1,76 @@
+import random
+import re
+from collections import namedtuple
+
+from config import Config
+
+# Failure classes of a download attempt
+TOKEN_REQUIRED = 'token_required'
+DRM_PROTECTED = 'drm_protected'
+NO_VIDEOS_FOUND = 'no_videos_found'
+NETWORK = 'network'          # Timeouts, dropped connections, DNS, HTTP 429/5xx
+INTERRUPTED = 'interrupted'  # svtplay-dl or its worker was killed
+GENERIC = 'generic'
+
+NETWORK_PATTERN = re.compile(
+    r'timed? ?out|connection ?(reset|refused|aborted|error)|remote ?end ?closed|max retries exceeded'
+    r'|temporary failure|name resolution|network is unreachable|incompleteread|broken pipe'
+    r'|http ?(error )?(429|5\d\d)\b|too many requests|service unavailable|bad gateway|internal server error',
+    re.IGNORECASE
+)
+
+# How often a failure class is tried in total, and the backoff between attempts
+RetryRule = namedtuple('RetryRule', ['max_attempts', 'base_delay', 'max_delay'])
+
+
+def classify(output, returncode=None):
+    """Failure class for the output (stdout + log lines, or an exception message) of a failed attempt"""
+    lower = (output or '').lower()
+    if 'token' in lower and ('need' in lower or 'require' in lower):
+        return TOKEN_REQUIRED
+    if 'no videos found' in lower:
+        return NO_VIDEOS_FOUND
+    if 'drm' in lower and 'protected' in lower:
+        return DRM_PROTECTED
+    if NETWORK_PATTERN.search(lower):
+        return NETWORK
+    if returncode is not None and returncode < 0:
+        return INTERRUPTED
+    return GENERIC
+
+
+def default_rules():
+    """Per-class rules: transient failures back off and retry, token/DRM/missing videos never do"""
+    transient = RetryRule(Config.RETRY_MAX_ATTEMPTS, Config.RETRY_BASE_DELAY, Config.RETRY_MAX_DELAY)
+    return {
+        NETWORK: transient,
+        INTERRUPTED: transient,
+        GENERIC: RetryRule(min(2, Config.RETRY_MAX_ATTEMPTS), Config.RETRY_BASE_DELAY, Config.RETRY_MAX_DELAY),
+        TOKEN_REQUIRED: RetryRule(1, 0, 0),
+        DRM_PROTECTED: RetryRule(1, 0, 0),
+        NO_VIDEOS_FOUND: RetryRule(1, 0, 0),
+    }
+
+
+class RetryPolicy:
+    """Decides whether and when a failed download is tried again
+
+    The delay doubles with every attempt up to the rule's max_delay, with
+    "equal jitter" (half fixed, half random) so jobs that failed together,
+    e.g. a whole season during a network outage, do not retry in lockstep.
+    """
+
+    def __init__(self, rules=None, random_fraction=random.random):
+        self.rules = rules if rules is not None else default_rules()
+        self.random_fraction = random_fraction
+
+    def max_attempts(self, failure):
+        return self.rules.get(failure, self.rules.get(GENERIC, RetryRule(1, 0, 0))).max_attempts
+
+    def next_delay(self, failure, attempts):
+        """Seconds to wait before the next attempt after `attempts` failed ones, or None to give up"""
+        rule = self.rules.get(failure, self.rules.get(GENERIC))
+        if rule is None or attempts >= rule.max_attempts:
+            return None
+        delay = min(rule.max_delay, rule.base_delay * 2 ** (attempts - 1))
+        return round(delay / 2 + self.random_fraction() * delay / 2, 1)
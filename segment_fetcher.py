@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+from config import Config
+from http_client import HttpClient
+
+ATTRIBUTE_PATTERN = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+UNSAFE_FILENAME_PATTERN = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+# A parsed HLS playlist: a master playlist has variants, a media playlist segments
+Playlist = namedtuple('Playlist', ['variants', 'segments'])
+Variant = namedtuple('Variant', ['bandwidth', 'url'])
+
+
+class UnsupportedStream(Exception):
+    """The stream cannot be fetched segment by segment (DASH, encrypted, byte ranges...) - use svtplay-dl"""
+
+
+class SegmentError(Exception):
+    """A segment could not be downloaded"""
+
+
+class DownloadStopped(Exception):
+    """The download was stopped (cancelled or paused) through its stop event"""
+
+
+def _attributes(line):
+    return {key: value.strip('"') for key, value in ATTRIBUTE_PATTERN.findall(line.split(':', 1)[1])}
+
+
+def parse_playlist(text, base_url):
+    """Parse an HLS master or media playlist. URLs are made absolute."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines or lines[0] != '#EXTM3U':
+        raise UnsupportedStream('Not an HLS playlist')
+
+    variants, segments = [], []
+    bandwidth = None
+    for line in lines[1:]:
+        if line.startswith('#EXT-X-STREAM-INF'):
+            bandwidth = int(_attributes(line).get('BANDWIDTH', 0) or 0)
+        elif line.startswith('#EXT-X-KEY'):
+            if _attributes(line).get('METHOD', 'NONE') != 'NONE':
+                raise UnsupportedStream('Encrypted HLS stream')
+        elif line.startswith('#EXT-X-BYTERANGE'):
+            raise UnsupportedStream('HLS byte ranges')
+        elif line.startswith('#EXT-X-MAP'):
+            # fMP4 initialization section, written before the first segment
+            segments.append(urljoin(base_url, _attributes(line)['URI']))
+        elif line.startswith('#'):
+            continue
+        elif bandwidth is not None:
+            variants.append(Variant(bandwidth, urljoin(base_url, line)))
+            bandwidth = None
+        else:
+            segments.append(urljoin(base_url, line))
+    return Playlist(variants, segments)
+
+
+def select_variant(variants, quality=None):
+    """The variant closest to quality (a bitrate in kbps, like svtplay-dl -q), or the best one"""
+    if quality and str(quality).isdigit():
+        return min(variants, key=lambda v: abs(v.bandwidth / 1000 - int(quality)))
+    return max(variants, key=lambda v: v.bandwidth)
+
+
+def safe_filename(title):
+    return UNSAFE_FILENAME_PATTERN.sub('', title or '').strip(' .') or 'video'
+
+
+def resolve_stream(url, download_dir, quality=None, token=None, subtitle=False):
+    """Find an HLS stream for a video page with svtplay_dl's stream extraction
+
+    Returns {'title', 'video', 'audio', 'headers'} where video/audio are
+    playlist URLs (audio is None when the video playlist includes it).
+    Subtitles are written by svtplay_dl itself. Raises UnsupportedStream if
+    svtplay_dl is not available or finds no unencrypted HLS stream.
+    """
+    import svtplay_backend
+    if not svtplay_backend.LibraryBackend.available():
+        raise UnsupportedStream('svtplay_dl is not installed')
+
+    options = {'output': download_dir, 'filename': '{title}', 'subtitle': subtitle}
+    if quality:
+        options['quality'] = int(quality)
+    if token:
+        options['token'] = token
+    config = svtplay_backend.library_options(**options)
+    service = svtplay_backend.find_service(url, config)
+    if service is None:
+        raise UnsupportedStream(f'That site is not supported: {url}')
+
+    streams = []
+    for item in service.get():
+        if type(item).__name__ == 'ServiceError':
+            raise UnsupportedStream(str(item))
+        if hasattr(item, 'bitrate'):
+            if str(getattr(item, 'name', '')).lower() == 'hls':
+                streams.append(item)
+        elif subtitle and hasattr(item, 'download'):
+            try:
+                item.download()
+            except Exception as e:
+                print(f"Could not download subtitles for {url}: {e}")
+    if not streams:
+        raise UnsupportedStream('No HLS stream found')
+
+    if quality:
+        stream = min(streams, key=lambda s: abs(s.bitrate - int(quality)))
+    else:
+        stream = max(streams, key=lambda s: s.bitrate)
+    output = getattr(stream, 'output', None) or getattr(service, 'output', {})
+    headers = {}
+    if getattr(stream, 'authorization', None):
+        headers['Authorization'] = stream.authorization
+    return {'title': output.get('title'), 'video': stream.url, 'audio': getattr(stream, 'audio', None),
+            'headers': headers}
+
+
+class PartsManifest:
+    """Sidecar <path>.parts.json recording how much of <path>.part is complete
+
+    After each segment is appended the manifest records the number of
+    segments and bytes on disk. A later fetch of the same playlist truncates
+    the .part file to that byte count (dropping a half-written segment) and
+    continues with the next segment. The playlist is identified by its
+    segment paths, without query strings, as CDN tokens change between runs.
+    """
+
+    def __init__(self, path, urls):
+        self.path = f'{path}.parts.json'
+        digest = hashlib.sha1('\n'.join(urlsplit(url).path for url in urls).encode('utf-8'))
+        self.playlist = digest.hexdigest()
+        self.count = len(urls)
+
+    def resume_point(self, part_path):
+        """(segments, bytes) already in part_path, (0, 0) to start over"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved['playlist'] != self.playlist or saved['count'] != self.count:
+                return 0, 0
+            if os.path.getsize(part_path) < saved['bytes']:
+                return 0, 0
+            return saved['segments'], saved['bytes']
+        except (OSError, ValueError, KeyError):
+            return 0, 0
+
+    def record(self, segments, size):
+        data = json.dumps({'playlist': self.playlist, 'count': self.count, 'segments': segments, 'bytes': size})
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class SegmentFetcher:
+    """Download an HLS stream with several connections at once
+
+    svtplay-dl fetches one segment after the other over one connection, so
+    a single download is capped by the round trip time. Here up to
+    `connections` segments are in flight; finished segments wait in an
+    ordered write-behind buffer (at most `window` segments ahead of the
+    file) and are appended to the output in playlist order. Progress is
+    checkpointed in a PartsManifest, so an interrupted download resumes
+    with the first missing segment.
+    """
+
+    def __init__(self, connections=None, window=None, client=None, headers=None, throttle=None, stop_event=None):
+        self.connections = connections or Config.SEGMENT_CONNECTIONS
+        self.window = max(window or Config.SEGMENT_WINDOW, self.connections)
+        self._own_client = client is None
+        self.client = client or HttpClient(pool_size=self.connections, per_host_limit=self.connections,
+                                           retries=Config.HTTP_RETRIES, backoff=Config.HTTP_RETRY_BACKOFF,
+                                           timeout=30)
+        self.headers = dict(headers or {})
+        self.throttle = throttle  # bandwidth.JobThrottle limiting this download, or None
+        self.stop_event = stop_event  # threading.Event - set to stop after the segment being written
+
+    def close(self):
+        if self._own_client:
+            self.client.close()
+
+    def segments(self, playlist_url, quality=None):
+        """Segment URLs of a media playlist (a master playlist's best or chosen variant is followed)"""
+        playlist = parse_playlist(self._get(playlist_url).decode('utf-8', errors='replace'), playlist_url)
+        if playlist.variants:
+            variant = select_variant(playlist.variants, quality)
+            playlist = parse_playlist(self._get(variant.url).decode('utf-8', errors='replace'), variant.url)
+        if not playlist.segments:
+            raise UnsupportedStream('Empty HLS playlist')
+        return playlist.segments
+
+    def fetch(self, urls, path, on_segments=None):
+        """Download segments into path, in order. on_segments(n) is called as segments are written.
+
+        The file is written as path.part and renamed when complete. A .part
+        left by an earlier attempt is resumed from its manifest; segments
+        already on disk are reported to on_segments without downloading them.
+        """
+        if os.path.exists(path):
+            if on_segments:
+                on_segments(len(urls))
+            return
+
+        part_path = f'{path}.part'
+        manifest = PartsManifest(path, urls)
+        start, offset = manifest.resume_point(part_path)
+        if start and on_segments:
+            on_segments(start)
+
+        with ThreadPoolExecutor(max_workers=self.connections, thread_name_prefix='segment') as pool:
+            pending = {}
+            next_index = start
+            try:
+                with open(part_path, 'r+b' if start else 'wb') as out:
+                    out.seek(offset)
+                    out.truncate()
+                    for index in range(start, len(urls)):
+                        if self.stop_event is not None and self.stop_event.is_set():
+                            raise DownloadStopped(f'Stopped after {index} of {len(urls)} segments')
+                        # Keep the window ahead of the writer filled
+                        while next_index < len(urls) and next_index < index + self.window:
+                            pending[next_index] = pool.submit(self._get, urls[next_index])
+                            next_index += 1
+                        out.write(pending.pop(index).result())
+                        out.flush()
+                        manifest.record(index + 1, out.tell())
+                        if on_segments:
+                            on_segments(1)
+            except BaseException:
+                # The .part file and its manifest stay for the next attempt
+                for future in pending.values():
+                    future.cancel()
+                raise
+        os.replace(part_path, path)
+        manifest.remove()
+
+    def download(self, tracks, on_progress=None, quality=None):
+        """Download {path: playlist_url} tracks. on_progress(pos, total) counts segments of all tracks."""
+        playlists = {path: self.segments(url, quality) for path, url in tracks.items()}
+        total = sum(len(urls) for urls in playlists.values())
+        done = [0]
+
+        def on_segments(count):
+            done[0] += count
+            if on_progress:
+                on_progress(done[0], total)
+
+        for path, urls in playlists.items():
+            self.fetch(urls, path, on_segments)
+        return total
+
+    def _get(self, url):
+        response = self.client.get(url, headers=self.headers)
+        if response.status_code != 200:
+            raise SegmentError(f'HTTP {response.status_code} for {url}')
+        if self.throttle is not None:
+            self.throttle.consume(len(response.content))
+        return response.content
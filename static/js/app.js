@@ -1,6 +1,11 @@
 // API Base URL
 const API_BASE = window.location.origin;
 
+// Downloads as last reported by the server {id: download}
+let downloadsState = {};
+let downloadsVersion = 0;  // Change cursor of downloadsState
+let downloadsRenderPending = false;
+
 // Initialize
 document.addEventListener('DOMContentLoaded', function() {
     // Load initial data
@@ -35,8 +40,8 @@ document.addEventListener('DOMContentLoaded', function() {
     // Load system info
     loadSystemInfo();
 
-    // Auto-refresh downloads every 5 seconds
-    setInterval(loadDownloads, 5000);
+    // Live download updates pushed from the server
+    subscribeDownloads();
 });
 
 // Show notification
@@ -174,24 +179,85 @@ async function checkInfo() {
     }
 }
 
-// Load downloads
+// Load downloads changed since the last update
 async function loadDownloads() {
     try {
-        const response = await fetch(API_BASE + '/api/downloads');
-        const result = await response.json();
+        let hasMore = true;
+        while (hasMore) {
+            const response = await fetch(API_BASE + '/api/downloads?since=' + downloadsVersion);
+            const result = await response.json();
 
-        if (result.success) {
-            displayDownloads(result.downloads);
+            if (!result.success) {
+                break;
+            }
+            applyDownloadChanges(result);
+            hasMore = result.has_more;
         }
     } catch (error) {
         console.error('Error loading downloads:', error);
     }
 }
 
+// Subscribe to live download changes (Server-Sent Events)
+function subscribeDownloads() {
+    if (!window.EventSource) {
+        // Old browser - fall back to polling
+        setInterval(loadDownloads, 5000);
+        return;
+    }
+
+    const stream = new EventSource(API_BASE + '/api/downloads/stream');
+    stream.addEventListener('downloads', event => {
+        applyDownloadChanges(JSON.parse(event.data));
+    });
+    stream.onerror = () => {
+        console.warn('Download stream interrupted, reconnecting...');
+    };
+}
+
+// Merge a batch of changed fields from the stream into downloadsState
+function applyDownloadChanges(changes) {
+    if (changes.reset) {
+        downloadsState = {};
+    }
+    downloadsVersion = changes.version;
+
+    changes.removed.forEach(id => {
+        delete downloadsState[id];
+    });
+
+    changes.downloads.forEach(delta => {
+        const current = downloadsState[delta.id] || {};
+        // Episode deltas are merged, unless the server replaced the whole map
+        if (delta.episodes && current.episodes && !delta.episodes_reset) {
+            delta.episodes = Object.assign({}, current.episodes, delta.episodes);
+        }
+        delete delta.episodes_reset;
+        downloadsState[delta.id] = Object.assign(current, delta);
+    });
+
+    const positions = changes.queue_positions || {};
+    Object.values(downloadsState).forEach(download => {
+        download.queue_position = positions[download.id] || null;
+    });
+
+    // Render at most once per animation frame
+    if (!downloadsRenderPending) {
+        downloadsRenderPending = true;
+        requestAnimationFrame(() => {
+            downloadsRenderPending = false;
+            displayDownloads(Object.values(downloadsState));
+        });
+    }
+}
+
 // Display downloads
 function displayDownloads(downloads) {
     const downloadsList = document.getElementById('downloadsList');
 
+    // Episodes of a parallel season download are shown inside their season
+    downloads = downloads.filter(download => !download.parent_id);
+
     if (downloads.length === 0) {
         downloadsList.innerHTML = `
             <div class="text-center text-muted py-4">
@@ -209,15 +275,19 @@ function displayDownloads(downloads) {
     downloads.forEach(download => {
         const statusClass = `status-${download.status}`;
         const statusText = getStatusText(download.status);
-        const typeIcon = download.type === 'season'
+        const typeIcon = download.type === 'season' || download.type === 'batch'
             ? '<i class="bi bi-collection-play"></i>'
             : '<i class="bi bi-file-play"></i>';
+        const title = download.type === 'batch'
+            ? `${download.total_items} valda videoklipp`
+            : truncateUrl(download.url);
+        const canControl = ['queued', 'downloading', 'paused'].includes(download.status) && !download.cancel_requested;
 
         html += `
             <div class="download-item">
                 <div class="d-flex justify-content-between align-items-start mb-2">
                     <div>
-                        <strong>${typeIcon} ${truncateUrl(download.url)}</strong>
+                        <strong>${typeIcon} ${title}</strong>
                         <br>
                         <small class="text-muted">Startad: ${formatDate(download.started_at)}</small>
                     </div>
@@ -234,6 +304,16 @@ function displayDownloads(downloads) {
                     </div>
                 ` : ''}
 
+                ${download.status === 'merging' ? `
+                    <div class="progress mb-2">
+                        <div class="progress-bar progress-bar-striped progress-bar-animated bg-info"
+                             role="progressbar"
+                             style="width: ${download.merge_progress > 0 ? download.merge_progress : 100}%">
+                            ${download.merge_progress > 0 ? download.merge_progress.toFixed(0) + '%' : 'Slår ihop ljud och bild...'}
+                        </div>
+                    </div>
+                ` : ''}
+
                 ${download.error ? `
                     <div class="alert alert-danger mb-0 mt-2">
                         <small><strong>Fel:</strong> ${download.error}</small>
@@ -241,6 +321,17 @@ function displayDownloads(downloads) {
                 ` : ''}
 
                 <small class="text-muted">${download.message}</small>
+                ${canControl ? `
+                    <div class="mt-2">
+                        ${download.status === 'paused'
+                            ? `<button class="btn btn-sm btn-outline-primary" onclick="controlDownload('${download.id}', 'resume')"><i class="bi bi-play-fill"></i> Fortsätt</button>`
+                            : `<button class="btn btn-sm btn-outline-secondary" onclick="controlDownload('${download.id}', 'pause')"><i class="bi bi-pause-fill"></i> Pausa</button>`}
+                        <button class="btn btn-sm btn-outline-danger" onclick="controlDownload('${download.id}', 'cancel')"><i class="bi bi-x-lg"></i> Avbryt</button>
+                    </div>
+                ` : ''}
+                ${download.status === 'queued' && download.queue_position ? `
+                    <small class="text-muted">(plats ${download.queue_position} i kön)</small>
+                ` : ''}
 
                 ${download.episodes && Object.keys(download.episodes).length > 0 ? `
                     <div class="mt-3">
@@ -251,6 +342,7 @@ function displayDownloads(downloads) {
                                 ${download.total_episodes ? `
                                     - ${download.completed_episodes || 0} nedladdade,
                                     ${download.skipped_episodes || 0} hoppade över
+                                    ${download.failed_episodes ? `, ${download.failed_episodes} misslyckades` : ''}
                                 ` : ''}
                             </summary>
                             <div class="episode-list" style="max-height: 300px; overflow-y: auto;">
@@ -269,7 +361,17 @@ function displayDownloads(downloads) {
                                         } else if (ep.status === 'downloading') {
                                             icon = '⏳';
                                             className = 'text-warning';
-                                            statusText = 'Laddar ner...';
+                                            statusText = ep.progress > 0
+                                                ? `Laddar ner... ${ep.progress.toFixed(1)}%`
+                                                : 'Laddar ner...';
+                                        } else if (ep.status === 'merging') {
+                                            icon = '🔧';
+                                            className = 'text-info';
+                                            statusText = 'Slår ihop ljud och bild...';
+                                        } else if (ep.status === 'failed') {
+                                            icon = '❌';
+                                            className = 'text-danger';
+                                            statusText = 'Misslyckades';
                                         } else {
                                             icon = '⏸️';
                                             className = 'text-muted';
@@ -350,11 +452,38 @@ function displayFiles(files) {
     filesList.innerHTML = html;
 }
 
+// Pause, resume or cancel a download, batch or season
+async function controlDownload(downloadId, action) {
+    if (action === 'cancel' && !confirm('Avbryta nedladdningen? Påbörjade filer ligger kvar.')) {
+        return;
+    }
+
+    try {
+        const response = await fetch(API_BASE + '/api/downloads/' + downloadId, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ action })
+        });
+        const result = await response.json();
+
+        if (!result.success) {
+            showNotification('Fel: ' + result.error, 'danger');
+        }
+    } catch (error) {
+        showNotification('Fel vid kommunikation med servern: ' + error.message, 'danger');
+    }
+}
+
 // Helper functions
 function getStatusText(status) {
     const statusMap = {
         'queued': 'I kö',
         'downloading': 'Laddar ner',
+        'merging': 'Slår ihop',
+        'paused': 'Pausad',
+        'cancelled': 'Avbruten',
         'completed': 'Klar',
         'failed': 'Misslyckades'
     };
@@ -939,8 +1068,31 @@ async function browseVideos() {
     // Scroll to the browser
     browserCard.scrollIntoView({ behavior: 'smooth', block: 'start' });
 
+    const showError = (message) => {
+        loadingDiv.style.display = 'none';
+        errorDiv.style.display = 'block';
+        document.getElementById('videoBrowserErrorText').textContent = message;
+    };
+
+    const showVideos = (result) => {
+        scrapedVideos = result.videos;
+        displayVideos(result.videos);
+        loadingDiv.style.display = 'none';
+        contentDiv.style.display = 'block';
+
+        // Update count (both top and bottom)
+        document.getElementById('videoCount').textContent = `${result.count} videos funna`;
+        document.getElementById('videoCountBottom').textContent = `${result.count} videos funna`;
+
+        if (result.limited) {
+            showNotification(`Visar ${result.count} av ${result.total_available} tillgängliga videos`, 'info');
+        }
+    };
+
     try {
-        const response = await fetch(API_BASE + '/api/scrape', {
+        // Stream results: the grid is shown as soon as the episodes are listed
+        // and thumbnails fill in as they arrive
+        const response = await fetch(API_BASE + '/api/scrape/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -948,110 +1100,177 @@ async function browseVideos() {
             body: JSON.stringify({ url, max_videos: 200 })
         });
 
-        const result = await response.json();
-
-        if (result.success) {
-            scrapedVideos = result.videos;
-            displayVideos(result.videos);
-            loadingDiv.style.display = 'none';
-            contentDiv.style.display = 'block';
-
-            // Update count (both top and bottom)
-            document.getElementById('videoCount').textContent = `${result.count} videos funna`;
-            document.getElementById('videoCountBottom').textContent = `${result.count} videos funna`;
+        if (!response.ok || !response.body) {
+            // Older server or browser without streaming fetch
+            await browseVideosAtOnce(url, showVideos, showError);
+            return;
+        }
 
-            if (result.limited) {
-                showNotification(`Visar ${result.count} av ${result.total_available} tillgängliga videos`, 'info');
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const event = JSON.parse(line);
+
+                if (event.type === 'videos') {
+                    showVideos(event);
+                } else if (event.type === 'video') {
+                    updateVideo(event.url, event.video);
+                } else if (event.type === 'done') {
+                    reorderVideos(event.order);
+                } else if (event.type === 'error') {
+                    showError(event.error);
+                }
             }
-        } else {
-            loadingDiv.style.display = 'none';
-            errorDiv.style.display = 'block';
-            document.getElementById('videoBrowserErrorText').textContent = result.error;
         }
     } catch (error) {
-        loadingDiv.style.display = 'none';
-        errorDiv.style.display = 'block';
-        document.getElementById('videoBrowserErrorText').textContent = 'Fel vid kommunikation med servern: ' + error.message;
+        showError('Fel vid kommunikation med servern: ' + error.message);
+    }
+}
+
+// Browse videos with a single request that returns when all thumbnails are fetched
+async function browseVideosAtOnce(url, showVideos, showError) {
+    const response = await fetch(API_BASE + '/api/scrape', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ url, max_videos: 200 })
+    });
+
+    const result = await response.json();
+
+    if (result.success) {
+        showVideos(result);
+    } else {
+        showError(result.error);
+    }
+}
+
+// Swap in a video's thumbnail and metadata that arrived after the grid was rendered
+function updateVideo(url, video) {
+    const index = scrapedVideos.findIndex(v => v.url === url);
+    if (index < 0) return;
+
+    scrapedVideos[index] = video;
+    const oldCard = document.querySelector(`.video-card[data-index="${index}"]`);
+    if (oldCard) {
+        const checked = oldCard.querySelector('.video-checkbox').checked;
+        oldCard.replaceWith(renderVideoCard(video, index, checked));
     }
 }
 
+// Re-sort the grid once all metadata (season/episode) is known, keeping the selection
+function reorderVideos(order) {
+    if (!order || order.every((url, i) => scrapedVideos[i] && scrapedVideos[i].url === url)) return;
+
+    const selected = new Set(
+        Array.from(document.querySelectorAll('.video-checkbox:checked')).map(cb => scrapedVideos[parseInt(cb.dataset.index)].url)
+    );
+    const position = new Map(order.map((url, i) => [url, i]));
+    scrapedVideos.sort((a, b) => position.get(a.url) - position.get(b.url));
+    displayVideos(scrapedVideos, selected);
+}
+
+// Thumbnail - use SVG placeholder if no thumbnail available
+function getThumbnailSrc(video) {
+    let thumbnailUrl = video.thumbnail;
+    if (!thumbnailUrl) {
+        // Create an inline SVG data URL with the movie title
+        const shortTitle = video.title.substring(0, 25);
+        const svgPlaceholder = `data:image/svg+xml,${encodeURIComponent(`
+            <svg width="300" height="169" xmlns="http://www.w3.org/2000/svg">
+                <rect width="300" height="169" fill="#667eea"/>
+                <text x="50%" y="50%" text-anchor="middle" fill="white" font-family="Arial, sans-serif" font-size="16" font-weight="bold">
+                    ${shortTitle}
+                </text>
+            </svg>
+        `)}`;
+        thumbnailUrl = svgPlaceholder;
+    } else if (thumbnailUrl.startsWith('/thumbs/')) {
+        // Locally cached thumbnail - ask for a copy sized for the card
+        thumbnailUrl += '?w=480';
+    }
+    return thumbnailUrl;
+}
+
 // Display videos in grid
-function displayVideos(videos) {
+function displayVideos(videos, selectedUrls = new Set()) {
     const videoGrid = document.getElementById('videoGrid');
     videoGrid.innerHTML = '';
 
     videos.forEach((video, index) => {
         const col = document.createElement('div');
         col.className = 'col-md-4 col-lg-3';
+        col.appendChild(renderVideoCard(video, index, selectedUrls.has(video.url)));
+        videoGrid.appendChild(col);
+    });
 
-        const card = document.createElement('div');
-        card.className = 'card h-100 video-card';
-        card.dataset.index = index;
-
-        // Thumbnail - use SVG placeholder if no thumbnail available
-        let thumbnailUrl = video.thumbnail;
-        if (!thumbnailUrl) {
-            // Create an inline SVG data URL with the movie title
-            const shortTitle = video.title.substring(0, 25);
-            const svgPlaceholder = `data:image/svg+xml,${encodeURIComponent(`
-                <svg width="300" height="169" xmlns="http://www.w3.org/2000/svg">
-                    <rect width="300" height="169" fill="#667eea"/>
-                    <text x="50%" y="50%" text-anchor="middle" fill="white" font-family="Arial, sans-serif" font-size="16" font-weight="bold">
-                        ${shortTitle}
-                    </text>
-                </svg>
-            `)}`;
-            thumbnailUrl = svgPlaceholder;
-        }
+    updateSelectedCount();
+}
 
-        // Duration formatting (if available)
-        let durationText = '';
-        if (video.duration && video.duration > 0) {
-            const minutes = Math.floor(video.duration / 60);
-            const seconds = video.duration % 60;
-            durationText = `<span class="badge bg-dark position-absolute top-0 end-0 m-2">${minutes}:${seconds.toString().padStart(2, '0')}</span>`;
-        }
+// Build the card for one video in the grid
+function renderVideoCard(video, index, checked = false) {
+    const card = document.createElement('div');
+    card.className = 'card h-100 video-card';
+    card.dataset.index = index;
 
-        // Episode info
-        let episodeInfo = '';
-        if (video.season && video.episode) {
-            episodeInfo = `<small class="text-muted">S${video.season}E${video.episode}</small>`;
-        } else if (video.episode) {
-            episodeInfo = `<small class="text-muted">Avsnitt ${video.episode}</small>`;
-        }
+    const thumbnailUrl = getThumbnailSrc(video);
 
-        card.innerHTML = `
-            <div class="position-relative" style="background-color: #000;">
-                <img src="${thumbnailUrl}" class="card-img-top" alt="${video.title}" style="height: 169px; object-fit: contain;">
-                ${durationText}
-                <div class="position-absolute top-0 start-0 m-2">
-                    <input type="checkbox" class="form-check-input video-checkbox" data-index="${index}" style="width: 24px; height: 24px;">
-                </div>
-            </div>
-            <div class="card-body">
-                <h6 class="card-title" style="font-size: 0.9rem; line-height: 1.2;">${video.title}</h6>
-                ${episodeInfo}
-                ${video.description ? `<p class="card-text small text-muted mt-2" style="font-size: 0.75rem; overflow: hidden; text-overflow: ellipsis; display: -webkit-box; -webkit-line-clamp: 2; -webkit-box-orient: vertical;">${video.description}</p>` : ''}
-            </div>
-        `;
-
-        // Make card clickable to toggle checkbox
-        card.addEventListener('click', function(e) {
-            if (e.target.type !== 'checkbox') {
-                const checkbox = card.querySelector('.video-checkbox');
-                checkbox.checked = !checkbox.checked;
-                updateSelectedCount();
-            }
-        });
+    // Duration formatting (if available)
+    let durationText = '';
+    if (video.duration && video.duration > 0) {
+        const minutes = Math.floor(video.duration / 60);
+        const seconds = video.duration % 60;
+        durationText = `<span class="badge bg-dark position-absolute top-0 end-0 m-2">${minutes}:${seconds.toString().padStart(2, '0')}</span>`;
+    }
 
-        // Update count when checkbox changes
-        card.querySelector('.video-checkbox').addEventListener('change', updateSelectedCount);
+    // Episode info
+    let episodeInfo = '';
+    if (video.season && video.episode) {
+        episodeInfo = `<small class="text-muted">S${video.season}E${video.episode}</small>`;
+    } else if (video.episode) {
+        episodeInfo = `<small class="text-muted">Avsnitt ${video.episode}</small>`;
+    }
 
-        col.appendChild(card);
-        videoGrid.appendChild(col);
+    card.innerHTML = `
+        <div class="position-relative" style="background-color: #000;">
+            <img src="${thumbnailUrl}" class="card-img-top" alt="${video.title}" loading="lazy" style="height: 169px; object-fit: contain;">
+            ${durationText}
+            <div class="position-absolute top-0 start-0 m-2">
+                <input type="checkbox" class="form-check-input video-checkbox" data-index="${index}" style="width: 24px; height: 24px;" ${checked ? 'checked' : ''}>
+            </div>
+        </div>
+        <div class="card-body">
+            <h6 class="card-title" style="font-size: 0.9rem; line-height: 1.2;">${video.title}</h6>
+            ${episodeInfo}
+            ${video.description ? `<p class="card-text small text-muted mt-2" style="font-size: 0.75rem; overflow: hidden; text-overflow: ellipsis; display: -webkit-box; -webkit-line-clamp: 2; -webkit-box-orient: vertical;">${video.description}</p>` : ''}
+        </div>
+    `;
+
+    // Make card clickable to toggle checkbox
+    card.addEventListener('click', function(e) {
+        if (e.target.type !== 'checkbox') {
+            const checkbox = card.querySelector('.video-checkbox');
+            checkbox.checked = !checkbox.checked;
+            updateSelectedCount();
+        }
     });
 
-    updateSelectedCount();
+    // Update count when checkbox changes
+    card.querySelector('.video-checkbox').addEventListener('change', updateSelectedCount);
+
+    return card;
 }
 
 // Update selected count
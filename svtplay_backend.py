@@ -0,0 +1,221 @@
+import json
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+try:
+    from svtplay_dl.service import Generic, service_handler
+    from svtplay_dl.service.services import sites
+    from svtplay_dl.utils.parser import setup_defaults
+except ImportError:
+    sites = None  # Only the subprocess backend is available
+
+INFO_TIMEOUT = 30  # Seconds
+EPISODES_TIMEOUT = 60
+
+
+def library_options(**values):
+    """svtplay_dl options with its defaults, as parsed from the command line"""
+    config = setup_defaults()
+    for key, value in values.items():
+        config.set(key, value)
+    return config
+
+
+def find_service(url, config):
+    """The svtplay_dl service handling a URL, or None if no service supports it"""
+    stream = service_handler(sites, config, url)
+    if stream is None:
+        # Pages embedding a player from a supported site
+        url, stream = Generic(config, url).get(sites)
+    return stream
+
+
+def parse_episode_urls(output):
+    """Episode URLs from svtplay-dl --get-only-episode-url output, in order, without duplicates"""
+    episodes = []
+    for line in output.split('\n'):
+        line = line.strip()
+        # Look for URLs (both http and https) - extract just the URL part
+        if 'http://' in line or 'https://' in line:
+            # Extract URL from lines like "INFO: Url: http://..."
+            if 'Url:' in line:
+                url_part = line.split('Url:', 1)[1].strip()
+                if url_part and url_part not in episodes:
+                    episodes.append(url_part)
+            # Also handle plain URLs
+            elif line.startswith('http://') or line.startswith('https://'):
+                if line not in episodes:
+                    episodes.append(line)
+    return episodes
+
+
+class SubprocessBackend:
+    """Metadata lookups by running the svtplay-dl command line tool
+
+    Every call starts a new Python interpreter and imports svtplay_dl,
+    which costs 0.5-1.5 s before any network I/O.
+    """
+
+    name = 'subprocess'
+
+    def __init__(self, command, env_factory=None):
+        self.command = list(command)
+        self.env_factory = env_factory
+
+    def fetch_info(self, url):
+        """Run svtplay-dl --json-info for a URL"""
+        try:
+            cmd = self.command + ['--json-info', url]
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=INFO_TIMEOUT)
+
+            if result.returncode == 0:
+                # Parse the JSON output
+                info = json.loads(result.stdout)
+                return {
+                    'success': True,
+                    'info': info
+                }
+            else:
+                return {
+                    'success': False,
+                    'error': result.stderr or 'Failed to get video information'
+                }
+        except subprocess.TimeoutExpired:
+            return {'success': False, 'error': 'Request timed out'}
+        except json.JSONDecodeError:
+            return {'success': False, 'error': 'Failed to parse video information'}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def fetch_episodes(self, url, token=None):
+        """Run svtplay-dl --get-only-episode-url --all-episodes for a URL"""
+        try:
+            # Use --get-only-episode-url with --all-episodes to get episode URLs
+            cmd = self.command + ['--get-only-episode-url', '--all-episodes']
+
+            # Add token if provided (for TV4 Play)
+            if token:
+                cmd.extend(['--token', token])
+
+            cmd.append(url)
+
+            env = self.env_factory() if self.env_factory else None
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=EPISODES_TIMEOUT, env=env)
+
+            # Parse both stdout and stderr as svtplay-dl may output to either
+            output = (result.stdout or '') + '\n' + (result.stderr or '')
+
+            # Debug logging
+            print(f"DEBUG list_episodes: Return code: {result.returncode}")
+            print(f"DEBUG list_episodes: Output length: {len(output)}")
+
+            episodes = parse_episode_urls(output)
+            print(f"DEBUG list_episodes: Found {len(episodes)} episodes")
+
+            return {
+                'success': True,
+                'episodes': episodes,
+                'count': len(episodes)
+            }
+        except subprocess.TimeoutExpired:
+            return {'success': False, 'error': 'Request timed out while getting episodes'}
+        except Exception as e:
+            print(f"DEBUG list_episodes: Exception: {e}")
+            return {'success': False, 'error': str(e)}
+
+
+class LibraryBackend:
+    """Metadata lookups through svtplay_dl's service API, in this process
+
+    Calls run on a small thread pool (they are network bound), so a slow
+    site cannot hold up the request thread past the timeout. When svtplay_dl
+    cannot be imported, or its API raises something unexpected (e.g. after
+    an svtplay-dl upgrade), the call is handed to the fallback backend.
+    """
+
+    name = 'library'
+
+    def __init__(self, fallback=None, max_workers=4):
+        self.fallback = fallback
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='svtplay-meta')
+
+    @staticmethod
+    def available():
+        return sites is not None
+
+    def fetch_info(self, url):
+        """Service, title, season/episode and available streams for a URL"""
+        return self._call(self._info, (url,), INFO_TIMEOUT, 'Request timed out',
+                          lambda: self.fallback.fetch_info(url))
+
+    def fetch_episodes(self, url, token=None):
+        """All episode URLs of a series, like --get-only-episode-url --all-episodes"""
+        return self._call(self._episodes, (url, token), EPISODES_TIMEOUT,
+                          'Request timed out while getting episodes',
+                          lambda: self.fallback.fetch_episodes(url, token))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _call(self, func, args, timeout, timeout_error, fallback):
+        if not self.available():
+            if self.fallback is None:
+                return {'success': False, 'error': 'svtplay_dl is not installed'}
+            return fallback()
+
+        future = self._executor.submit(func, *args)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            return {'success': False, 'error': timeout_error}
+        except Exception as e:
+            if self.fallback is None:
+                return {'success': False, 'error': str(e)}
+            print(f"svtplay_dl library call failed ({e}), using {self.fallback.name}")
+            return fallback()
+
+    def _episodes(self, url, token):
+        config = library_options(all_episodes=True, get_only_episode_url=True, token=token)
+        stream = find_service(url, config)
+        if stream is None:
+            return {'success': False, 'error': f'That site is not supported: {url}'}
+
+        episodes = []
+        for episode in stream.find_all_episodes(config) or []:
+            if episode not in episodes:
+                episodes.append(episode)
+        return {'success': True, 'episodes': episodes, 'count': len(episodes)}
+
+    def _info(self, url):
+        config = library_options()
+        stream = find_service(url, config)
+        if stream is None:
+            return {'success': False, 'error': f'That site is not supported: {url}'}
+
+        streams, errors = [], []
+        for item in stream.get():
+            if type(item).__name__ == 'ServiceError':
+                errors.append(str(item))
+            elif hasattr(item, 'bitrate'):
+                streams.append({'name': getattr(item, 'name', None), 'format': getattr(item, 'format', None),
+                                'bitrate': item.bitrate, 'resolution': getattr(item, 'resolution', None)})
+        if not streams and errors:
+            return {'success': False, 'error': errors[0]}
+
+        output = {key: value for key, value in getattr(stream, 'output', {}).items()
+                  if isinstance(value, (str, int, float, bool, type(None)))}
+        info = {'url': url, 'service': type(stream).__name__.lower(), **output, 'streams': streams}
+        return {'success': True, 'info': info}
+
+
+def create_metadata_backend(name, command, env_factory=None, max_workers=4):
+    """The backend configured by Config.METADATA_BACKEND ('library' or 'subprocess')"""
+    subprocess_backend = SubprocessBackend(command, env_factory)
+    if name == 'subprocess':
+        return subprocess_backend
+    if name != 'library':
+        print(f"Unknown metadata backend: {name}, using library")
+    if not LibraryBackend.available():
+        print("INFO: svtplay_dl not importable, metadata lookups use the svtplay-dl command")
+        return subprocess_backend
+    return LibraryBackend(fallback=subprocess_backend, max_workers=max_workers)
@@ -1,14 +1,32 @@
 import subprocess
-import json
 import os
 import sys
 import threading
-import queue
+import time
 import re
-from datetime import datetime
+import weakref
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from bandwidth import BandwidthLimiter, parse_schedule
 from config import Config
-import requests
-from bs4 import BeautifulSoup
+from download_scheduler import DownloadScheduler
+from html_meta import scan_head, meta_properties, parse_full_page
+from http_client import get_http_client
+from job_store import JobStore
+from metadata_cache import MetadataCache, make_key, normalize_url
+from thumbnail_extractors import VIDEO_HREF_PATTERN, extract_video_metadata, parse_duration
+from thumbnail_store import ThumbnailStore
+import retry_policy
+from retry_policy import RetryPolicy, classify
+from segment_fetcher import SegmentFetcher, UnsupportedStream, resolve_stream, safe_filename
+from svtplay_backend import create_metadata_backend
+import download_workers
+import media_merge
+import process_control
+from output_parser import (
+    OutputParser, OutputEvent, iter_output_lines,
+    EPISODE_START, URL, OUTFILE, SKIPPED, DOWNLOADING, PROGRESS, ERROR, LOG
+)
 
 # Get the path to svtplay-dl in the virtual environment
 def get_svtplay_dl_command():
@@ -38,6 +56,9 @@ def get_svtplay_dl_command():
 
 SVTPLAY_DL_CMD = get_svtplay_dl_command()
 
+# " | SVT Play" style suffix on og:title
+TITLE_SUFFIX_PATTERN = re.compile(r'\s*[|–-]\s*(SVT|TV4) ?Play\s*$', re.IGNORECASE)
+
 def get_env_with_local_bin():
     """Get environment variables with bin/ folder and FFmpeg added to PATH"""
     env = os.environ.copy()
@@ -58,97 +79,107 @@ def get_env_with_local_bin():
 class SVTPlayDownloader:
     """Handles downloads using svtplay-dl"""
 
-    def __init__(self):
-        self.downloads = {}  # Store download status {id: {...}}
-        self.download_queue = queue.Queue()
-        self.active_downloads = 0
-        self.max_concurrent = Config.MAX_CONCURRENT_DOWNLOADS
+    # Fields that change many times per second while downloading. Changing only
+    # these does not write to the job store (they are saved with the next status change).
+    VOLATILE_FIELDS = {'progress', 'message', 'current_episode', 'merge_progress'}
 
-    def get_info(self, url):
-        """Get information about a video or series without downloading"""
-        try:
-            cmd = SVTPLAY_DL_CMD + ['--json-info', url]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-
-            if result.returncode == 0:
-                # Parse the JSON output
-                info = json.loads(result.stdout)
-                return {
-                    'success': True,
-                    'info': info
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': result.stderr or 'Failed to get video information'
-                }
-        except subprocess.TimeoutExpired:
-            return {'success': False, 'error': 'Request timed out'}
-        except json.JSONDecodeError:
-            return {'success': False, 'error': 'Failed to parse video information'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+    # Download states that will not change any more
+    FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
 
-    def list_episodes(self, url, token=None):
-        """List all episodes from a series URL
+    # Separate audio tracks, merged with the video file of the same name: (video, audio) suffixes
+    MERGE_PAIRS = (('.ts', '.audio.ts'), ('.mp4', '.m4a'))
+    AUDIO_SUFFIXES = tuple(audio for video, audio in MERGE_PAIRS)
 
-        Args:
-            url: The series/category URL to list episodes from
-            token: Optional TV4 Play token for authentication
-        """
+    def __init__(self, store=None, thumbnails=None, metadata_backend=None, worker_pool=None):
+        self.downloads = {}  # Store download status {id: {...}}
+        self._options = {}  # Options each download was started with {id: {...}}
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        # Output path -> lock, so one file is never merged twice at once; dropped when no merge holds it
+        self._merge_locks = weakref.WeakValueDictionary()
+        self._merge_locks_guard = threading.Lock()
+        self._dedup_index = {}  # (kind, normalized url, quality, directory) -> id of the latest such download
+        self._idempotency_keys = {}  # Client-supplied idempotency key -> download id
+        self._processes = {}  # Download id -> pid of the process group running it (svtplay-dl or a worker)
+        self._stop_events = {}  # Download id -> threading.Event stopping an in-process (segment engine) download
+
+        # Change tracking for delta updates: every change bumps self.version.
+        # Versions start at the current time in milliseconds so a cursor handed
+        # out before a restart is always older than anything changed after it.
+        self.version = int(time.time() * 1000)
+        self._change_index = OrderedDict()  # {id: version}, least recently changed first
+        self._field_versions = {}  # {id: {field: version}}; episode keys are ('episodes', number)
+        self._removed = deque(maxlen=1000)  # (version, id) of downloads pruned from history
+        self._removed_floor = self.version  # Deltas older than this cannot report every removal
+
+        self.max_concurrent = Config.MAX_CONCURRENT_DOWNLOADS
+        # Fixed worker pool - at most max_concurrent svtplay-dl processes run at once
+        self.scheduler = DownloadScheduler(self.max_concurrent)
+        # Global bandwidth budget, split between running downloads by weight
         try:
-            # Use --get-only-episode-url with --all-episodes to get episode URLs
-            cmd = SVTPLAY_DL_CMD + ['--get-only-episode-url', '--all-episodes']
+            schedule = parse_schedule(Config.BANDWIDTH_SCHEDULE)
+        except ValueError as e:
+            print(f"Ignoring BANDWIDTH_SCHEDULE: {e}")
+            schedule = []
+        self.bandwidth = BandwidthLimiter(Config.BANDWIDTH_LIMIT_KBPS, schedule)
+        # Audio/video merges run on their own workers, after the download slot is released
+        self.merge_scheduler = DownloadScheduler(Config.MERGE_WORKERS, name='merge')
+        # Failed attempts are classified and retried later through the scheduler
+        self.retry_policy = RetryPolicy()
+        # Warm svtplay-dl worker processes, one per scheduler slot (None: start svtplay-dl per download)
+        self.worker_pool = worker_pool if worker_pool is not None else download_workers.create_worker_pool(
+            Config.DOWNLOAD_BACKEND, self.max_concurrent)
+
+        # Cache for episode lists and video info - each miss costs a svtplay-dl run
+        self.metadata_cache = MetadataCache(
+            ttl=Config.METADATA_CACHE_TTL,
+            max_entries=Config.METADATA_CACHE_SIZE,
+            path=Config.METADATA_CACHE_FILE or None,
+            cacheable=lambda result: result.get('success', False)
+        )
 
-            # Add token if provided (for TV4 Play)
-            if token:
-                cmd.extend(['--token', token])
+        # svtplay_dl called in-process for info/episode lookups, or the svtplay-dl command
+        self.metadata_backend = metadata_backend if metadata_backend is not None else create_metadata_backend(
+            Config.METADATA_BACKEND, SVTPLAY_DL_CMD, get_env_with_local_bin, Config.METADATA_BACKEND_WORKERS)
 
-            cmd.append(url)
+        # Thumbnails are downloaded once and served locally from /thumbs/<video_id>
+        self.thumbnails = thumbnails if thumbnails is not None else ThumbnailStore(
+            Config.THUMBNAIL_DIR, Config.THUMBNAIL_CACHE_MAX_MB * 1024 * 1024)
 
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60, env=get_env_with_local_bin())
+        # Durable job store - restore history and resume interrupted jobs
+        self.store = store if store is not None else JobStore(Config.JOBS_DB)
+        self._restore_downloads()
 
-            episodes = []
-            # Parse both stdout and stderr as svtplay-dl may output to either
-            output = (result.stdout or '') + '\n' + (result.stderr or '')
+    def get_info(self, url):
+        """Get information about a video or series without downloading (cached)"""
+        return self.metadata_cache.get_or_load(make_key('info', url), lambda: self._fetch_info(url))
 
-            # Debug logging
-            print(f"DEBUG list_episodes: Return code: {result.returncode}")
-            print(f"DEBUG list_episodes: Output length: {len(output)}")
+    def _fetch_info(self, url):
+        return self.metadata_backend.fetch_info(url)
 
-            for line in output.split('\n'):
-                line = line.strip()
-                # Look for URLs (both http and https) - extract just the URL part
-                if 'http://' in line or 'https://' in line:
-                    # Extract URL from lines like "INFO: Url: http://..."
-                    if 'Url:' in line:
-                        url_part = line.split('Url:', 1)[1].strip()
-                        if url_part and url_part not in episodes:
-                            episodes.append(url_part)
-                    # Also handle plain URLs
-                    elif line.startswith('http://') or line.startswith('https://'):
-                        if line not in episodes:
-                            episodes.append(line)
+    def list_episodes(self, url, token=None):
+        """List all episodes from a series URL (cached)
 
-            print(f"DEBUG list_episodes: Found {len(episodes)} episodes")
+        Args:
+            url: The series/category URL to list episodes from
+            token: Optional TV4 Play token for authentication
+        """
+        return self.metadata_cache.get_or_load(make_key('episodes', url, token),
+                                               lambda: self._fetch_episodes(url, token))
 
-            return {
-                'success': True,
-                'episodes': episodes,
-                'count': len(episodes)
-            }
-        except subprocess.TimeoutExpired:
-            return {'success': False, 'error': 'Request timed out while getting episodes'}
-        except Exception as e:
-            print(f"DEBUG list_episodes: Exception: {e}")
-            return {'success': False, 'error': str(e)}
+    def _fetch_episodes(self, url, token=None):
+        return self.metadata_backend.fetch_episodes(url, token)
 
     def scrape_videos_with_metadata(self, url, max_videos=50, token=None):
         """
         Scrape a URL and return all videos with metadata.
         Strategy:
         1. Get all video URLs from svtplay-dl (authoritative source)
-        2. Fetch thumbnails from individual video pages in parallel (og:image)
+        2. Harvest thumbnails and metadata (title, duration, season, episode,
+           description) for all videos from the category page in one request
+        3. Fetch the rest from individual video pages in parallel (og:image, JSON-LD)
+
+        Videos scraped before are served from the thumbnail store without any request.
 
         Args:
             url: The category/series URL to scrape
@@ -170,55 +201,14 @@ class SVTPlayDownloader:
             # Limit the number of videos to avoid overwhelming the UI
             limited_urls = episode_urls[:max_videos]
 
-            # Fetch thumbnails in parallel for ALL videos
+            # Fetch thumbnails and metadata in parallel for ALL videos
             print(f"Fetching thumbnails for {len(limited_urls)} videos in parallel...")
-            thumbnail_map = self._fetch_thumbnails_parallel(limited_urls)
-            print(f"Successfully fetched {len(thumbnail_map)} thumbnails")
-
-            # Build video list matching URLs with thumbnails
-            videos = []
-            for idx, ep_url in enumerate(limited_urls):
-                try:
-                    title = self._extract_title_from_url(ep_url)
-                    thumbnail = thumbnail_map.get(ep_url)
-
-                    videos.append({
-                        'url': ep_url,
-                        'title': title,
-                        'thumbnail': thumbnail,
-                        'duration': None,  # Not available without --json-info
-                        'description': '',
-                        'season': None,
-                        'episode': None  # Don't show episode numbers for movies
-                    })
-                except Exception as e:
-                    print(f"Error parsing {ep_url}: {e}")
-                    videos.append({
-                        'url': ep_url,
-                        'title': f'Video {idx + 1}',
-                        'thumbnail': None,
-                        'duration': None,
-                        'description': '',
-                        'season': None,
-                        'episode': None  # Don't show episode numbers for movies
-                    })
+            video_map = self._collect_video_metadata(limited_urls, page_url=url)
+            print(f"Successfully fetched {sum(1 for v in video_map.values() if v.get('thumbnail'))} thumbnails")
 
+            videos = self._build_video_list(limited_urls, video_map)
             print(f"DEBUG scrape_videos_with_metadata: Returning {len(videos)} videos")
 
-            # Sort videos alphabetically by title (Swedish locale-aware)
-            # Swedish alphabet: A-Z, Å, Ä, Ö (Å, Ä, Ö come after Z)
-            def swedish_sort_key(title):
-                """Create a sort key that handles Swedish characters correctly"""
-                # Normalize to lowercase for case-insensitive sorting
-                s = title.lower()
-                # Replace Swedish characters with sortable equivalents that come after 'z'
-                s = s.replace('å', 'z{')  # After z
-                s = s.replace('ä', 'z|')  # After z and å
-                s = s.replace('ö', 'z}')  # After z, å, and ä
-                return s
-
-            videos.sort(key=lambda x: swedish_sort_key(x['title']))
-
             return {
                 'success': True,
                 'videos': videos,
@@ -231,6 +221,101 @@ class SVTPlayDownloader:
             print(f"DEBUG scrape_videos_with_metadata: Exception: {e}")
             return {'success': False, 'error': str(e)}
 
+    def iter_scrape_events(self, url, max_videos=50, token=None):
+        """Scrape like scrape_videos_with_metadata, but yield results as they are ready
+
+        Yields dicts with a 'type':
+            videos: the sorted video list as soon as the episodes are listed,
+                    with thumbnails and metadata only for videos scraped before
+            video:  {'url', 'video'} - the full entry for a video once its
+                    thumbnail/metadata is found, first those harvested from
+                    the page, then per-video fetches
+            done:   {'thumbnails', 'order'} - everything fetched; order is the
+                    video URLs sorted with the complete metadata
+            error:  {'error'} - nothing more follows
+        """
+        try:
+            episodes_result = self.list_episodes(url, token)
+            if not episodes_result['success']:
+                yield {'type': 'error', 'error': episodes_result.get('error', 'Could not list videos')}
+                return
+
+            episode_urls = episodes_result['episodes']
+            if not episode_urls:
+                yield {'type': 'error', 'error': 'No videos found at this URL'}
+                return
+
+            limited_urls = episode_urls[:max_videos]
+            video_map, missing = self._split_known_videos(limited_urls)
+            videos = self._build_video_list(limited_urls, video_map)
+            yield {
+                'type': 'videos',
+                'videos': videos,
+                'count': len(videos),
+                'total_available': len(episode_urls),
+                'limited': len(episode_urls) > max_videos
+            }
+
+            harvested = self._harvest_video_metadata(url, missing) if missing else {}
+            video_map.update(harvested)
+            for video_url in harvested:
+                yield {'type': 'video', 'url': video_url, 'video': self._build_video(video_url, harvested[video_url])}
+            missing = [video_url for video_url in missing if video_url not in harvested]
+
+            for video_url, record in self._iter_fetched_video_pages(missing):
+                if record:
+                    video_map[video_url] = record
+                    yield {'type': 'video', 'url': video_url, 'video': self._build_video(video_url, record)}
+
+            order = [video['url'] for video in self._build_video_list(limited_urls, video_map)]
+            yield {'type': 'done', 'thumbnails': sum(1 for v in video_map.values() if v.get('thumbnail')), 'order': order}
+
+        except Exception as e:
+            print(f"DEBUG iter_scrape_events: Exception: {e}")
+            yield {'type': 'error', 'error': str(e)}
+
+    def _build_video(self, video_url, record, idx=0):
+        """One entry of the video list from a scraped record (see _video_record)"""
+        try:
+            title = record.get('title') or self._extract_title_from_url(video_url)
+        except Exception as e:
+            print(f"Error parsing {video_url}: {e}")
+            title = f'Video {idx + 1}'
+
+        return {
+            'url': video_url,
+            'title': title,
+            'thumbnail': record.get('thumbnail'),
+            'duration': record.get('duration'),  # Seconds
+            'description': record.get('description') or '',
+            'season': record.get('season'),
+            'episode': record.get('episode')
+        }
+
+    def _build_video_list(self, video_urls, video_map):
+        """Build the video list for the browser grid, sorted by season and
+        episode when known and by title otherwise"""
+        videos = [self._build_video(ep_url, video_map.get(ep_url, {}), idx) for idx, ep_url in enumerate(video_urls)]
+
+        # Sort videos alphabetically by title (Swedish locale-aware)
+        # Swedish alphabet: A-Z, Å, Ä, Ö (Å, Ä, Ö come after Z)
+        def swedish_sort_key(title):
+            """Create a sort key that handles Swedish characters correctly"""
+            # Normalize to lowercase for case-insensitive sorting
+            s = title.lower()
+            # Replace Swedish characters with sortable equivalents that come after 'z'
+            s = s.replace('å', 'z{')  # After z
+            s = s.replace('ä', 'z|')  # After z and å
+            s = s.replace('ö', 'z}')  # After z, å, and ä
+            return s
+
+        def sort_key(video):
+            season, episode = video['season'], video['episode']
+            return (season is None, season or 0, episode is None, episode or 0, swedish_sort_key(video['title']))
+
+        videos.sort(key=sort_key)
+        return videos
+
     def _extract_title_from_url(self, url):
         """Extract a human-readable title from a SVT Play URL"""
         try:
@@ -249,7 +334,10 @@ class SVTPlayDownloader:
     def _extract_video_id(self, url):
         """Extract video ID from SVT Play URL"""
         try:
-            # URL format: http://www.svtplay.se/video/ID/title-slug
+            # URL format: http://www.svtplay.se/video/ID/title-slug (sometimes /video/ID/series/episode)
+            match = VIDEO_HREF_PATTERN.search(url)
+            if match:
+                return match.group(1)
             parts = url.rstrip('/').split('/')
             if len(parts) >= 5:
                 return parts[-2]  # The ID is second to last
@@ -257,305 +345,454 @@ class SVTPlayDownloader:
         except:
             return None
 
-    def _fetch_thumbnails_parallel(self, video_urls, max_workers=10):
+    def _collect_video_metadata(self, video_urls, max_workers=None, page_url=None):
         """
-        Fetch thumbnails for multiple videos in parallel using threading.
-        Returns a dict mapping video_url -> thumbnail_url
+        Find thumbnails and metadata for multiple videos, fetching in parallel.
+        Returns a dict mapping video_url -> record (see _video_record)
+
+        Videos scraped before are served from the thumbnail store without any
+        network request. Next, when page_url (the category or series page the
+        videos were listed from) is given, all videos on it are harvested in
+        one request. Only the videos still missing after that have their own
+        page fetched for its og:image and JSON-LD.
         """
+        video_map, missing = self._split_known_videos(video_urls)
+        if page_url and missing:
+            harvested = self._harvest_video_metadata(page_url, missing)
+            video_map.update(harvested)
+            missing = [url for url in missing if url not in harvested]
+
+        for url, record in self._iter_fetched_video_pages(missing, max_workers):
+            if record:
+                video_map[url] = record
+        return video_map
+
+    def _video_record(self, video_id, metadata, has_image):
+        """Scraped metadata plus the local thumbnail URL when there is an image"""
+        record = dict(metadata)
+        record['thumbnail'] = self._local_thumbnail_url(video_id) if has_image else None
+        return record
+
+    def _split_known_videos(self, video_urls):
+        """Returns ({video_url: record} for videos scraped within
+        Config.VIDEO_METADATA_MAX_AGE, [urls that need scraping])"""
+        video_map = {}
+        missing = []
+        now = time.time()
+        for url in video_urls:
+            video_id = self._extract_video_id(url)
+            entry = self.thumbnails.get(video_id) if video_id else None
+            if entry and entry['updated_at'] and now - entry['updated_at'] < Config.VIDEO_METADATA_MAX_AGE:
+                video_map[url] = self._video_record(video_id, entry['metadata'], entry['source'] or entry['sha'])
+            else:
+                missing.append(url)
+        return video_map, missing
+
+    def _store_video_records(self, records, save=True):
+        """Save scraped {video_url: metadata with 'image'} to the thumbnail store.
+        Returns {video_url: record}"""
+        by_id = {}
+        for url, record in records.items():
+            video_id = self._extract_video_id(url)
+            if video_id:
+                by_id[video_id] = (url, record)
+        if by_id:
+            # The images themselves are downloaded on the first /thumbs request
+            self.thumbnails.put_videos({video_id: record for video_id, (url, record) in by_id.items()}, save=save)
+
+        return {url: self._video_record(video_id, {k: v for k, v in record.items() if k != 'image'}, record.get('image'))
+                for video_id, (url, record) in by_id.items()}
+
+    def _iter_fetched_video_pages(self, video_urls, max_workers=None):
+        """Fetch video pages in parallel, yielding (video_url, record or None) as each finishes"""
         from concurrent.futures import ThreadPoolExecutor, as_completed
 
-        thumbnail_map = {}
+        if not video_urls:
+            return
 
         def fetch_single(url):
             try:
-                thumbnail = self._fetch_thumbnail_from_url(url)
-                return (url, thumbnail)
+                metadata = self._fetch_video_page(url)
+                if not metadata:
+                    return (url, None)
+                return (url, self._store_video_records({url: metadata}, save=False).get(url))
             except Exception as e:
                 print(f"Error fetching thumbnail for {url}: {e}")
                 return (url, None)
 
-        # Fetch thumbnails in parallel
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(fetch_single, url): url for url in video_urls}
-
+        # Pool size matches the HTTP client's connection pool (Config.THUMBNAIL_FETCH_WORKERS)
+        executor = ThreadPoolExecutor(max_workers=max_workers or Config.THUMBNAIL_FETCH_WORKERS)
+        try:
+            futures = [executor.submit(fetch_single, url) for url in video_urls]
             for future in as_completed(futures):
-                url, thumbnail = future.result()
-                if thumbnail:
-                    thumbnail_map[url] = thumbnail
+                yield future.result()
+        finally:
+            # Don't start fetches nobody is waiting for (e.g. the browser went away)
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.thumbnails.flush()
+
+    def _harvest_video_metadata(self, page_url, video_urls):
+        """Find thumbnails and metadata for many videos at once from the page they
+        are listed on. Returns {video_url: record} for the videos found."""
+        video_ids = {}
+        for url in video_urls:
+            video_id = self._extract_video_id(url)
+            if video_id:
+                video_ids[video_id] = url
+        if not video_ids:
+            return {}
+
+        found = self._fetch_category_page_metadata(page_url, wanted=set(video_ids))
+        records = {video_ids[video_id]: found[video_id] for video_id in video_ids
+                   if found.get(video_id, {}).get('image')}
+        print(f"Harvested {len(records)} of {len(video_ids)} videos from {page_url}")
+        return self._store_video_records(records)
+
+    def open_thumbnail(self, video_id, width=None):
+        """Return (path, content_type, etag) for a thumbnail, downloading it
+        into the store on first use. None if the video's thumbnail is unknown."""
+        thumbnail = self.thumbnails.open(video_id, width)
+        if thumbnail is not None:
+            return thumbnail
+
+        entry = self.thumbnails.get(video_id)
+        if entry is None or not entry['source'] or not self._store_thumbnail(video_id, entry['source']):
+            return None
+        return self.thumbnails.open(video_id, width)
+
+    def _local_thumbnail_url(self, video_id):
+        return f'/thumbs/{video_id}'
 
-        return thumbnail_map
+    def _store_thumbnail(self, video_id, image_url):
+        """Download an image into the thumbnail store. Returns True on success"""
+        try:
+            response = get_http_client().get(image_url, timeout=10)
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+            if response.status_code != 200 or not content_type.startswith('image/'):
+                return False
+            self.thumbnails.put(video_id, image_url, response.content, content_type)
+            return True
+        except Exception as e:
+            print(f"Error caching thumbnail {image_url}: {e}")
+            return False
 
-    def _fetch_thumbnails_from_category_page(self, category_url):
+    def _fetch_category_page_metadata(self, category_url, wanted=None):
         """
-        Fetch all thumbnails from a category page in one request.
-        Returns a dict mapping video_id -> thumbnail_url
+        Fetch thumbnails and metadata for all videos on a category page in one request.
+        Returns a dict mapping video_id -> {'image', 'title', 'duration', ...}
+
+        The page is run through the extractors in Config.THUMBNAIL_EXTRACTORS
+        (embedded JSON listing data first, then the rendered cards).
         """
         try:
             # Fetch the category page
-            response = requests.get(category_url, timeout=10)
+            response = get_http_client().get(category_url, timeout=10)
             if response.status_code != 200:
                 print(f"Failed to fetch category page: {response.status_code}")
                 return {}
 
-            # Parse HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            thumbnail_map = {}
-
-            # Find all article elements (each contains a video card)
-            articles = soup.find_all('article')
-            print(f"Found {len(articles)} article elements")
-
-            for article in articles:
-                try:
-                    # Find the video link
-                    link = article.find('a', href=re.compile(r'/video/'))
-                    if not link:
-                        continue
-
-                    href = link.get('href', '')
-                    # Extract video ID from href like "/video/KNwvrEX/nar-lammen-tystnar"
-                    match = re.search(r'/video/([^/]+)/', href)
-                    if not match:
-                        continue
-
-                    video_id = match.group(1)
-
-                    # Look for div with background-image style
-                    # SVT uses inline styles or CSS classes for thumbnails
-                    div_with_bg = article.find('div', class_=re.compile(r'c26183281'))
-                    if div_with_bg and div_with_bg.get('style'):
-                        style = div_with_bg.get('style', '')
-                        # Extract URL from background-image: url(...)
-                        bg_match = re.search(r'background-image:\s*url\(["\']?([^"\']+)["\']?\)', style)
-                        if bg_match:
-                            thumbnail_url = bg_match.group(1)
-                            thumbnail_map[video_id] = thumbnail_url
-                            continue
-
-                    # Alternative: look for img tags
-                    img = article.find('img')
-                    if img:
-                        src = img.get('src') or img.get('data-src')
-                        if src and ('svtstatic' in src or 'image' in src):
-                            thumbnail_map[video_id] = src
-
-                except Exception as e:
-                    print(f"Error parsing article: {e}")
-                    continue
-
-            return thumbnail_map
+            return extract_video_metadata(response.text, response.url or category_url, wanted=wanted)
 
         except Exception as e:
             print(f"Error fetching thumbnails from category page: {e}")
             return {}
 
-    def _fetch_thumbnail_from_url(self, video_url):
-        """Fetch thumbnail from a full SVT Play video URL"""
+    def _fetch_video_page(self, video_url):
+        """Fetch thumbnail and metadata from a full SVT Play video URL
+
+        The page is streamed and read only up to </head>: the thumbnail comes
+        from og:image, the metadata from JSON-LD / embedded JSON in <head>
+        with og:title/og:description as fallback. The full BeautifulSoup
+        parse is a fallback for pages without an image in <head>.
+        Returns {'image', 'title', ...} with the fields found, or None.
+        """
+        client = get_http_client()
         try:
             # Fetch the page with a timeout
-            response = requests.get(video_url, timeout=5)
+            response = client.get(video_url, timeout=5, stream=True)
+        except Exception as e:
+            print(f"Error fetching thumbnail from {video_url}: {e}")
+            return None
+
+        try:
             if response.status_code != 200:
                 return None
 
-            # Parse HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Try to find og:image meta tag (Open Graph image - used for social sharing)
-            og_image = soup.find('meta', property='og:image')
-            if og_image and og_image.get('content'):
-                return og_image.get('content')
-
-            # Try to find Twitter card image
-            twitter_image = soup.find('meta', attrs={'name': 'twitter:image'})
-            if twitter_image and twitter_image.get('content'):
-                return twitter_image.get('content')
-
-            # Try to find any img tag with relevant class or data attributes
-            # SVT Play often uses specific patterns
-            img_tags = soup.find_all('img')
-            for img in img_tags:
-                src = img.get('src', '')
-                # Look for image URLs that seem to be thumbnails/posters
-                if 'image' in src or 'thumb' in src or 'svtstatic' in src:
-                    if src.startswith('http'):
-                        return src
-
-            return None
+            encoding = response.encoding or 'utf-8'
+            chunks = response.iter_content(Config.HTML_CHUNK_SIZE)
+            image, head = scan_head(chunks, full_head=True)
+
+            head_text = head.decode(encoding, errors='replace')
+            records = extract_video_metadata(head_text, video_url, names=['embedded_json'])
+            metadata = dict(records.get(self._extract_video_id(video_url)) or {})
+
+            properties = meta_properties(head)
+            if properties.get('og:title'):
+                metadata.setdefault('title', TITLE_SUFFIX_PATTERN.sub('', properties['og:title']))
+            if properties.get('og:description'):
+                metadata.setdefault('description', properties['og:description'])
+            if parse_duration(properties.get('video:duration')):
+                metadata.setdefault('duration', parse_duration(properties['video:duration']))
+
+            image = image or metadata.get('image')
+            if not image:
+                # No preview image in <head> - read the rest and parse the whole page
+                page = head + b''.join(chunks)
+                image = parse_full_page(page.decode(encoding, errors='replace'))
+            if image:
+                metadata['image'] = image
+            return metadata or None
 
         except Exception as e:
             print(f"Error fetching thumbnail from {video_url}: {e}")
             return None
+        finally:
+            client.release(response)
+
+    def _run_svtplay_dl(self, args, download_id):
+        """Run svtplay-dl with args and update the download from its output in real-time.
+        Returns: (returncode, stdout, log_lines) where log_lines are the
+        non-progress stderr lines (actual log/error messages)."""
+        if self.worker_pool is not None:
+            return self._run_in_worker(args, download_id)
+
+        # Binary pipes - stderr is read in blocks by iter_output_lines
+        # In its own process group, so pause/cancel reach svtplay-dl's ffmpeg as well
+        process = subprocess.Popen(
+            SVTPLAY_DL_CMD + args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=get_env_with_local_bin(),
+            **process_control.popen_kwargs()
+        )
+        self._register_process(download_id, process.pid)
 
-    def _process_output_realtime(self, process, download_id):
-        """
-        Process svtplay-dl output in real-time and update download status.
-        Parses episode information and tracks progress.
-        Returns: (stdout_lines, stderr_lines, full_output)
+        # Drain stdout in a thread to prevent pipe deadlock
+        stdout_data = []
+        def drain_stdout():
+            data = process.stdout.read()
+            if data:
+                stdout_data.append(data.decode('utf-8', errors='replace'))
+
+        stdout_thread = threading.Thread(target=drain_stdout)
+        stdout_thread.daemon = True
+        stdout_thread.start()
+
+        try:
+            # svtplay-dl writes most info and the progress bar to stderr
+            log_lines = self._consume_output(process.stderr, download_id)
+
+            stdout_thread.join(timeout=10)
+            process.wait()
+        finally:
+            self._unregister_process(download_id)
+        return process.returncode, stdout_data[0] if stdout_data else '', log_lines
+
+    def _run_in_worker(self, args, download_id):
+        """Run svtplay-dl on a warm worker process. Returns like _run_svtplay_dl.
+
+        Progress arrives as numbers instead of a repainted progress bar; log
+        records still go through OutputParser for episodes, Url: and Outfile:.
         """
-        stdout_lines = []
-        stderr_lines = []
-
-        # Regular expressions for parsing
-        episode_pattern = re.compile(r'Episode\s+(\d+)\s+of\s+(\d+)', re.IGNORECASE)
-        url_pattern = re.compile(r'Url:\s+(https?://[^\s]+)', re.IGNORECASE)
-        outfile_pattern = re.compile(r'Outfile:\s+(.+)', re.IGNORECASE)
-        exists_pattern = re.compile(r'already exists', re.IGNORECASE)
-        downloading_pattern = re.compile(r'downloading', re.IGNORECASE)
-
-        current_episode = None
-        episodes = {}  # Store episode data
-
-        # Read stderr in real-time (svtplay-dl writes most info to stderr)
-        for line in iter(process.stderr.readline, ''):
-            if not line:
-                break
+        parser = OutputParser()
+        result = {'returncode': -1, 'stdout': ''}
+
+        def events():
+            for kind, data in self.worker_pool.run(download_id, args, get_env_with_local_bin()):
+                if kind == download_workers.STARTED:
+                    self._register_process(download_id, data['pid'])
+                elif kind == download_workers.LOG:
+                    yield from parser.feed(data['message'])
+                elif kind == download_workers.PROGRESS:
+                    yield parser.progress(data['pos'], data['total'])
+                elif kind == download_workers.EXIT:
+                    result.update(data)
 
-            line = line.strip()
-            stderr_lines.append(line)
-
-            # Parse episode number
-            episode_match = episode_pattern.search(line)
-            if episode_match:
-                ep_num = int(episode_match.group(1))
-                total = int(episode_match.group(2))
-                current_episode = ep_num
-
-                # Initialize episode entry
-                if ep_num not in episodes:
-                    episodes[ep_num] = {
-                        'number': ep_num,
-                        'total': total,
-                        'status': 'processing',
-                        'url': None,
-                        'filename': None,
-                        'skipped': False
-                    }
-
-                # Update download object with episodes list
-                if 'episodes' not in self.downloads[download_id]:
-                    self.downloads[download_id]['episodes'] = {}
-                    self.downloads[download_id]['total_episodes'] = total
-                    self.downloads[download_id]['completed_episodes'] = 0
-                    self.downloads[download_id]['skipped_episodes'] = 0
-
-                self.downloads[download_id]['episodes'][ep_num] = episodes[ep_num]
-                self.downloads[download_id]['current_episode'] = ep_num
-                self.downloads[download_id]['message'] = f'Processing episode {ep_num} of {total}'
-
-            # Parse URL
-            if current_episode and url_pattern.search(line):
-                url_match = url_pattern.search(line)
-                episodes[current_episode]['url'] = url_match.group(1)
-                self.downloads[download_id]['episodes'][current_episode] = episodes[current_episode]
-
-            # Parse outfile
-            if current_episode and outfile_pattern.search(line):
-                outfile_match = outfile_pattern.search(line)
-                episodes[current_episode]['filename'] = outfile_match.group(1)
-                self.downloads[download_id]['episodes'][current_episode] = episodes[current_episode]
-
-            # Check if file already exists
-            if current_episode and exists_pattern.search(line):
-                episodes[current_episode]['status'] = 'skipped'
-                episodes[current_episode]['skipped'] = True
-                self.downloads[download_id]['episodes'][current_episode] = episodes[current_episode]
-                self.downloads[download_id]['skipped_episodes'] = self.downloads[download_id].get('skipped_episodes', 0) + 1
-
-            # Check if downloading
-            if current_episode and downloading_pattern.search(line):
-                episodes[current_episode]['status'] = 'downloading'
-                self.downloads[download_id]['episodes'][current_episode] = episodes[current_episode]
-
-        # Mark episodes as completed if they were being downloaded
-        for ep_num, ep_data in episodes.items():
-            if ep_data['status'] == 'downloading':
-                ep_data['status'] = 'completed'
-                self.downloads[download_id]['episodes'][ep_num] = ep_data
-                self.downloads[download_id]['completed_episodes'] = self.downloads[download_id].get('completed_episodes', 0) + 1
-
-        # Read any remaining stdout
-        stdout_text = process.stdout.read()
-        if stdout_text:
-            stdout_lines = stdout_text.strip().split('\n')
-
-        # Wait for process to finish
-        process.wait()
-
-        # Combine outputs
-        full_output = '\n'.join(stdout_lines) + '\n' + '\n'.join(stderr_lines)
-
-        return stdout_lines, stderr_lines, full_output
-
-    def start_download(self, url, options=None):
-        """Start a download task"""
-        download_id = self._generate_id()
+        try:
+            log_lines = self._apply_output_events(download_id, parser, events())
+        finally:
+            self._unregister_process(download_id)
+        return result['returncode'], result['stdout'], log_lines
+
+    def _consume_output(self, stream, download_id):
+        """Parse svtplay-dl output lines and apply the events to the download.
+        Returns the log/error lines."""
+        parser = OutputParser()
+        events = (event for line in iter_output_lines(stream) for event in parser.feed(line))
+        return self._apply_output_events(download_id, parser, events)
+
+    def _apply_output_events(self, download_id, parser, events):
+        """Apply OutputParser events to the download. Returns the log/error lines."""
+        throttle = {'last_update': 0.0}
+        log_lines = []
+
+        for event in events:
+            if event.kind in (LOG, ERROR):
+                log_lines.append(event.data['message'])
+            else:
+                self._handle_output_event(download_id, event, throttle)
+
+        # The last episode has no following "Episode x of y" line to complete it
+        self._complete_episode(download_id, parser.current_episode)
+        return log_lines
+
+    def _handle_output_event(self, download_id, event, throttle):
+        """Apply one OutputParser event to a download"""
+        download = self.downloads[download_id]
+        ep_num = event.episode
+
+        if event.kind == EPISODE_START:
+            self._complete_episode(download_id, download.get('current_episode'))
+
+            total = event.data['total']
+            # Update download object with episodes list
+            if not download.get('episodes'):
+                self._update_download(download_id, episodes={}, total_episodes=total,
+                                      completed_episodes=0, skipped_episodes=0)
+
+            if str(ep_num) not in download['episodes']:
+                self._update_episode(download_id, ep_num, number=ep_num, total=total, status='processing',
+                                     url=None, filename=None, skipped=False, progress=0)
+            self._update_download(download_id, current_episode=ep_num,
+                                  message=f'Processing episode {ep_num} of {total}')
+
+        elif event.kind == URL:
+            if ep_num:
+                self._update_episode(download_id, ep_num, url=event.data['url'])
+
+        elif event.kind == OUTFILE:
+            filename = event.data['filename']
+            # Every file this job writes - only these are merged afterwards
+            if filename not in download.get('output_files', []):
+                self._update_download(download_id, output_files=download.get('output_files', []) + [filename])
+            if filename.endswith(self.AUDIO_SUFFIXES):
+                pass  # Separate audio track, merged into its video file
+            elif ep_num:
+                self._update_episode(download_id, ep_num, filename=filename)
+            else:
+                self._update_download(download_id, output_file=filename)
 
+        elif event.kind == SKIPPED:
+            # Output file already exists
+            if ep_num:
+                self._update_episode(download_id, ep_num, status='skipped', skipped=True)
+                self._update_download(download_id, skipped_episodes=download.get('skipped_episodes', 0) + 1)
+            else:
+                self._update_download(download_id, skipped=True)
+
+        elif event.kind == DOWNLOADING:
+            if ep_num:
+                self._update_episode(download_id, ep_num, status='downloading')
+
+        elif event.kind == PROGRESS:
+            pos, total, percent = event.data['pos'], event.data['total'], event.data['percent']
+            now = time.monotonic()
+            if total <= 0 or (now - throttle['last_update'] < Config.PROGRESS_UPDATE_INTERVAL and pos < total):
+                return
+            throttle['last_update'] = now
+
+            if ep_num:
+                self._update_episode(download_id, ep_num, status='downloading', progress=min(percent, 99))
+                # Overall progress: finished episodes plus the fraction of the current one
+                total_episodes = download.get('total_episodes') or 1
+                done = download.get('completed_episodes', 0) + download.get('skipped_episodes', 0)
+                overall = round(min((done + percent / 100) / total_episodes * 100, 99), 1)
+                self._update_download(download_id, progress=overall,
+                                      message=f'Processing episode {ep_num} of {total_episodes} ({percent}%)')
+            else:
+                self._update_download(download_id, progress=min(percent, 99),
+                                      message=f'Laddar ner... {percent}%')
+
+    def _complete_episode(self, download_id, ep_num):
+        """Mark an episode as completed if it was being downloaded"""
+        if not ep_num:
+            return
+        download = self.downloads[download_id]
+        episode = download.get('episodes', {}).get(str(ep_num))
+        if episode and episode.get('status') == 'downloading':
+            self._update_episode(download_id, ep_num, status='completed', progress=100)
+            self._update_download(download_id, completed_episodes=download.get('completed_episodes', 0) + 1)
+
+    def start_download(self, url, options=None, idempotency_key=None):
+        """Start a download task
+
+        A submission of the same video, quality and folder as a queued,
+        running or completed download (whose file is still on disk) returns
+        that download instead, with duplicate: True. So does a repeated
+        idempotency_key.
+        """
         # Get custom download directory if provided
         download_dir = options.get('download_dir', Config.DOWNLOAD_DIR) if options else Config.DOWNLOAD_DIR
 
-        self.downloads[download_id] = {
-            'id': download_id,
-            'url': url,
-            'status': 'queued',
-            'progress': 0,
-            'message': 'Queued for download',
-            'started_at': datetime.now().isoformat(),
-            'finished_at': None,
-            'error': None,
-            'output_file': None,
-            'download_dir': download_dir
-        }
-
-        # Start download in a separate thread
-        thread = threading.Thread(
-            target=self._download_worker,
-            args=(download_id, url, options)
-        )
-        thread.daemon = True
-        thread.start()
+        with self._lock:
+            existing = self._find_duplicate('video', url, options, download_dir, idempotency_key)
+            if existing:
+                return {'success': True, 'download_id': existing, 'duplicate': True}
+
+            download_id = self._generate_id()
+            self._create_download({
+                'id': download_id,
+                'url': url,
+                'status': 'queued',
+                'progress': 0,
+                'message': 'Queued for download',
+                'started_at': datetime.now().isoformat(),
+                'finished_at': None,
+                'error': None,
+                'output_file': None,
+                'download_dir': download_dir,
+                'idempotency_key': idempotency_key
+            }, options)
+
+        self._enqueue(download_id)
 
         return {'success': True, 'download_id': download_id}
 
-    def _read_stderr_with_progress(self, process, download_id):
-        """Read stderr char by char, parsing progress from \\r-delimited lines.
-        svtplay-dl uses \\r to update progress in-place, so readline() won't work.
-        Output format: \\r[pos/total][====....] ETA: H:MM:SS
-        Returns only non-progress lines (actual log/error messages)."""
-        # Match svtplay-dl's [pos/total] progress format
-        segment_pattern = re.compile(r'\[\d+/\d+\]')
-        pos_total_pattern = re.compile(r'\[(\d+)/(\d+)\]')
-        stderr_lines = []
-        line_buffer = ''
-
-        while True:
-            char = process.stderr.read(1)
-            if not char:
-                break
-            if char in ('\r', '\n'):
-                if line_buffer.strip():
-                    if segment_pattern.search(line_buffer):
-                        # Progress line — parse it but don't store it
-                        match = pos_total_pattern.search(line_buffer)
-                        if match:
-                            pos = int(match.group(1))
-                            total = int(match.group(2))
-                            if total > 0:
-                                progress = round(pos / total * 100, 1)
-                                self.downloads[download_id]['progress'] = min(progress, 99)
-                                self.downloads[download_id]['message'] = f'Laddar ner... {progress}%'
-                    else:
-                        # Actual log/error line — keep it
-                        stderr_lines.append(line_buffer)
-                line_buffer = ''
-            else:
-                line_buffer += char
+    def _dedup_key(self, kind, url, options, download_dir):
+        """Downloads with the same key would write the same files"""
+        quality = str((options or {}).get('quality') or Config.DEFAULT_QUALITY).lower().replace('p', '')
+        directory = os.path.normcase(os.path.abspath(download_dir or Config.DOWNLOAD_DIR))
+        return kind, normalize_url(url), quality, directory
+
+    def _download_dedup_key(self, download):
+        if download.get('type') == 'batch':
+            return None
+        kind = 'season' if download.get('type') == 'season' else 'video'
+        return self._dedup_key(kind, download['url'], self._options.get(download['id'], {}), download.get('download_dir'))
+
+    def _find_duplicate(self, kind, url, options, download_dir, idempotency_key=None):
+        """Id of an existing download a new submission should attach to, or None. Must be called with the lock held."""
+        if idempotency_key and idempotency_key in self._idempotency_keys:
+            return self._idempotency_keys[idempotency_key]
 
-        if line_buffer.strip():
-            if not segment_pattern.search(line_buffer):
-                stderr_lines.append(line_buffer)
+        existing = self.downloads.get(self._dedup_index.get(self._dedup_key(kind, url, options, download_dir)))
+        if existing is None or existing['status'] in ('failed', 'cancelled'):
+            return None
+        if existing['status'] == 'completed':
+            # Only while the output is still on disk; a deleted file is downloaded again
+            output_file = existing.get('output_file')
+            if not (output_file and os.path.exists(output_file)):
+                return None
 
-        return '\n'.join(stderr_lines)
+        if idempotency_key:
+            self._idempotency_keys[idempotency_key] = existing['id']
+        return existing['id']
+
+    def _index_download(self, download):
+        """Add a download to the dedup and idempotency indexes. Must be called with the lock held."""
+        key = self._download_dedup_key(download)
+        if key:
+            self._dedup_index[key] = download['id']
+        if download.get('idempotency_key'):
+            self._idempotency_keys[download['idempotency_key']] = download['id']
+
+    def _unindex_download(self, download):
+        """Drop a download removed from history from the indexes. Must be called with the lock held."""
+        key = self._download_dedup_key(download)
+        if key and self._dedup_index.get(key) == download['id']:
+            del self._dedup_index[key]
+        for key in [key for key, value in self._idempotency_keys.items() if value == download['id']]:
+            del self._idempotency_keys[key]
 
     def _get_service_name(self, url):
         """Detect streaming service from URL"""
@@ -569,8 +806,7 @@ class SVTPlayDownloader:
     def _download_worker(self, download_id, url, options):
         """Worker thread for downloading"""
         try:
-            self.downloads[download_id]['status'] = 'downloading'
-            self.downloads[download_id]['message'] = 'Downloading...'
+            self._update_download(download_id, status='downloading', message='Downloading...', retry_at=None)
 
             # Get custom download directory if provided
             download_dir = options.get('download_dir', Config.DOWNLOAD_DIR) if options else Config.DOWNLOAD_DIR
@@ -578,8 +814,12 @@ class SVTPlayDownloader:
             # Ensure download directory exists
             os.makedirs(download_dir, exist_ok=True)
 
-            # Build command
-            cmd = SVTPLAY_DL_CMD.copy()
+            if Config.DOWNLOAD_ENGINE == 'segments' and self._download_segments(download_id, url, options, download_dir):
+                self._complete_download(download_id, download_dir)
+                return
+
+            # Build svtplay-dl arguments
+            args = []
 
             # Add quality option - fix format for TV4 Play compatibility
             quality = options.get('quality', Config.DEFAULT_QUALITY) if options else Config.DEFAULT_QUALITY
@@ -591,153 +831,610 @@ class SVTPlayDownloader:
 
             # Only add quality parameter if not "best" - let svtplay-dl choose automatically for best
             if quality and quality != 'best':
-                cmd.extend(['-q', quality])
+                args.extend(['-q', quality])
 
             # Add subtitle option
             if options and options.get('subtitle', Config.DEFAULT_SUBTITLE):
-                cmd.append('--subtitle')
+                args.append('--subtitle')
 
             # Add token if provided (for TV4 Play and premium content)
             if options and options.get('token'):
-                cmd.extend(['--token', options.get('token')])
+                args.extend(['--token', options.get('token')])
 
             # Add output directory and custom filename template (just title, no hash or metadata)
             # Use -o for directory and --filename for template
-            cmd.extend(['-o', download_dir])
-            cmd.extend(['--filename', '{title}'])
+            args.extend(['-o', download_dir])
+            args.extend(['--filename', '{title}'])
 
             # Add URL
-            cmd.append(url)
+            args.append(url)
 
             # Debug: Print the command being run
             print("=" * 80)
             print("DEBUG: Running svtplay-dl command (single download):")
-            print(" ".join(cmd))
+            print(" ".join(SVTPLAY_DL_CMD + args))
             print("=" * 80)
 
             # Run download with local ffmpeg in PATH
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                env=get_env_with_local_bin()
-            )
-
-            # Drain stdout in a thread to prevent pipe deadlock
-            stdout_data = []
-            def drain_stdout():
-                data = process.stdout.read()
-                if data:
-                    stdout_data.append(data)
-
-            stdout_thread = threading.Thread(target=drain_stdout)
-            stdout_thread.daemon = True
-            stdout_thread.start()
-
-            # Read stderr in real-time for progress updates
-            stderr = self._read_stderr_with_progress(process, download_id)
-
-            stdout_thread.join(timeout=10)
-            stdout = stdout_data[0] if stdout_data else ''
-            process.wait()
+            returncode, stdout, stderr_lines = self._run_svtplay_dl(args, download_id)
+            if self._stopped(download_id):
+                return
+            stderr = '\n'.join(stderr_lines)
 
             # Debug: Print output
             print("=" * 80)
             print("DEBUG: svtplay-dl output (single download):")
             print("STDOUT:", stdout[:1000] if stdout else "(empty)")
             print("STDERR:", stderr[:1000] if stderr else "(empty)")
-            print("Return code:", process.returncode)
+            print("Return code:", returncode)
             print("=" * 80)
 
             # Combine stdout and stderr for better error detection
             full_output = (stdout or '') + '\n' + (stderr or '')
 
             # Check for specific error conditions
-            token_required = 'token' in full_output.lower() and ('need' in full_output.lower() or 'require' in full_output.lower())
-            no_videos_found = 'no videos found' in full_output.lower()
-            drm_protected = 'drm' in full_output.lower() and 'protected' in full_output.lower()
+            failure = classify(full_output, returncode)
+            token_required = failure == retry_policy.TOKEN_REQUIRED
+            no_videos_found = failure == retry_policy.NO_VIDEOS_FOUND
+            drm_protected = failure == retry_policy.DRM_PROTECTED
 
             # Determine if download actually succeeded
-            success = process.returncode == 0 and not token_required and not no_videos_found
+            success = returncode == 0 and not token_required and not no_videos_found
 
             if success:
                 # Post-process: merge audio and video if separate files exist
-                self._merge_audio_video_if_needed(download_dir)
-
-                self.downloads[download_id]['status'] = 'completed'
-                self.downloads[download_id]['message'] = 'Download completed'
-                self.downloads[download_id]['progress'] = 100
-                self.downloads[download_id]['finished_at'] = datetime.now().isoformat()
+                self._complete_download(download_id, download_dir)
             else:
-                self.downloads[download_id]['status'] = 'failed'
-
                 # Detect service name for appropriate error messages
                 service_name = self._get_service_name(url)
 
                 # Provide specific error messages
                 if token_required:
-                    self.downloads[download_id]['message'] = 'Token required or expired'
+                    message = 'Token required or expired'
                     if service_name == 'TV4 Play':
-                        self.downloads[download_id]['error'] = 'This content requires a valid TV4 Play token. Please check that you have entered a token and that it has not expired. Click the "?" button next to the Token field for instructions.'
+                        error = 'This content requires a valid TV4 Play token. Please check that you have entered a token and that it has not expired. Click the "?" button next to the Token field for instructions.'
                     else:
-                        self.downloads[download_id]['error'] = f'This content requires authentication. If this is premium content from {service_name}, you may need to provide a token.'
+                        error = f'This content requires authentication. If this is premium content from {service_name}, you may need to provide a token.'
                 elif no_videos_found:
-                    self.downloads[download_id]['message'] = 'No videos found'
+                    message = 'No videos found'
                     if service_name == 'TV4 Play':
-                        self.downloads[download_id]['error'] = 'No videos were found at this URL. Please check the URL or try logging in to TV4 Play and refreshing your token.'
+                        error = 'No videos were found at this URL. Please check the URL or try logging in to TV4 Play and refreshing your token.'
                     else:
-                        self.downloads[download_id]['error'] = f'No videos were found at this URL. The video may have been removed, may be geo-blocked, or the URL may be incorrect.'
+                        error = f'No videos were found at this URL. The video may have been removed, may be geo-blocked, or the URL may be incorrect.'
                 elif drm_protected:
-                    self.downloads[download_id]['message'] = 'DRM protected content'
-                    self.downloads[download_id]['error'] = 'This content is DRM protected and cannot be downloaded.'
+                    message = 'DRM protected content'
+                    error = 'This content is DRM protected and cannot be downloaded.'
                 else:
-                    self.downloads[download_id]['message'] = 'Download failed'
-                    self.downloads[download_id]['error'] = stderr or stdout or 'Unknown error'
+                    message = 'Download failed'
+                    error = stderr or stdout or 'Unknown error'
 
-                self.downloads[download_id]['finished_at'] = datetime.now().isoformat()
+                self._fail_attempt(download_id, failure, message, error)
 
         except Exception as e:
-            self.downloads[download_id]['status'] = 'failed'
-            self.downloads[download_id]['message'] = 'Download failed'
-            self.downloads[download_id]['error'] = str(e)
-            self.downloads[download_id]['finished_at'] = datetime.now().isoformat()
+            if self._stopped(download_id):
+                return
+            self._fail_attempt(download_id, classify(str(e)), 'Download failed', str(e))
 
-    def download_season(self, url, options=None):
-        """Download entire season/series"""
-        download_id = self._generate_id()
+    def _download_segments(self, download_id, url, options, download_dir):
+        """Download a video with the parallel segment engine (Config.DOWNLOAD_ENGINE = 'segments')
 
+        Updates the same status fields as svtplay-dl's output does. Returns
+        False, before anything is written, if the stream needs svtplay-dl
+        (DASH, encrypted, or svtplay_dl not importable).
+        """
+        options = options or {}
+        quality = str(options.get('quality') or Config.DEFAULT_QUALITY).replace('p', '')
+        quality = quality if quality.isdigit() else None
+        try:
+            stream = resolve_stream(url, download_dir, quality, options.get('token'),
+                                    options.get('subtitle', Config.DEFAULT_SUBTITLE))
+        except UnsupportedStream as e:
+            print(f"Segment engine cannot download {url} ({e}), using svtplay-dl")
+            return False
+
+        parser = OutputParser()
+        throttle = {'last_update': 0.0}
+        base = os.path.join(download_dir, safe_filename(stream['title']))
+        tracks = {f'{base}.ts': stream['video']}
+        if stream['audio']:
+            tracks[f'{base}.audio.ts'] = stream['audio']
+
+        # Tracks finished by an earlier attempt are kept, partial ones resumed
+        if any(os.path.exists(base + ext) for ext in ('.mkv', '.mp4')) or all(map(os.path.exists, tracks)):
+            self._handle_output_event(download_id, OutputEvent(SKIPPED, None, {}), throttle)
+            return True
+
+        bandwidth_share = self.bandwidth.register(download_id, self._get_bandwidth_weight(options))
+        stop_event = threading.Event()
+        fetcher = SegmentFetcher(headers=stream['headers'], throttle=bandwidth_share, stop_event=stop_event)
+        with self._lock:
+            self._stop_events[download_id] = stop_event
+            if self.downloads[download_id].get('cancel_requested'):
+                stop_event.set()
+        try:
+            for path in tracks:
+                self._handle_output_event(download_id, OutputEvent(OUTFILE, None, {'filename': path}), throttle)
+            fetcher.download(tracks, lambda pos, total: self._handle_output_event(
+                download_id, parser.progress(pos, total), throttle))
+        except UnsupportedStream as e:
+            print(f"Segment engine cannot download {url} ({e}), using svtplay-dl")
+            self._update_download(download_id, output_file=None)
+            return False
+        finally:
+            with self._lock:
+                self._stop_events.pop(download_id, None)
+            fetcher.close()
+            bandwidth_share.close()
+        return True
+
+    def download_season(self, url, options=None, idempotency_key=None):
+        """Download entire season/series (a season already queued or downloading is returned instead)"""
         # Get custom download directory if provided
         download_dir = options.get('download_dir', Config.DOWNLOAD_DIR) if options else Config.DOWNLOAD_DIR
 
-        self.downloads[download_id] = {
-            'id': download_id,
-            'url': url,
-            'status': 'queued',
-            'progress': 0,
-            'message': 'Queued for season download',
-            'started_at': datetime.now().isoformat(),
-            'finished_at': None,
-            'error': None,
-            'type': 'season',
-            'download_dir': download_dir
-        }
-
-        # Start download in a separate thread
-        thread = threading.Thread(
-            target=self._season_download_worker,
-            args=(download_id, url, options)
-        )
-        thread.daemon = True
-        thread.start()
+        with self._lock:
+            existing = self._find_duplicate('season', url, options, download_dir, idempotency_key)
+            if existing:
+                return {'success': True, 'download_id': existing, 'duplicate': True}
+
+            download_id = self._generate_id()
+            self._create_download({
+                'id': download_id,
+                'url': url,
+                'status': 'queued',
+                'progress': 0,
+                'message': 'Queued for season download',
+                'started_at': datetime.now().isoformat(),
+                'finished_at': None,
+                'error': None,
+                'type': 'season',
+                'download_dir': download_dir,
+                'idempotency_key': idempotency_key
+            }, options)
+
+        self._enqueue(download_id)
 
         return {'success': True, 'download_id': download_id}
 
     def _season_download_worker(self, download_id, url, options):
         """Worker thread for downloading entire season"""
+        if Config.SEASON_DOWNLOAD_MODE == 'parallel':
+            self._parallel_season_download(download_id, url, options)
+        else:
+            self._serial_season_download(download_id, url, options)
+
+    def _parallel_season_download(self, download_id, url, options):
+        """Resolve the episode list and download every episode as a child job.
+
+        Children go through the download scheduler, at most
+        Config.SEASON_EPISODE_CONCURRENCY at a time per season, and their
+        progress is rolled up into this download's episodes map. This worker
+        returns as soon as the children are created, freeing its slot.
+        """
         try:
-            self.downloads[download_id]['status'] = 'downloading'
-            self.downloads[download_id]['message'] = 'Downloading season...'
+            self._update_download(download_id, status='downloading', message='Listing episodes...')
+
+            token = options.get('token') if options else None
+            result = self.list_episodes(url, token)
+            if self._stopped(download_id):
+                return
+            if not result['success'] or not result['episodes']:
+                # Let svtplay-dl --all-episodes report what went wrong
+                print(f"Could not list episodes for {url}, falling back to a single season process")
+                return self._serial_season_download(download_id, url, options)
+
+            episode_urls = result['episodes']
+            download_dir = self.downloads[download_id]['download_dir']
+
+            child_ids = []
+            for number, episode_url in enumerate(episode_urls, 1):
+                child_id = self._generate_id()
+                child_ids.append(child_id)
+                self._create_download({
+                    'id': child_id,
+                    'url': episode_url,
+                    'status': 'queued',
+                    'progress': 0,
+                    'message': 'Queued for download',
+                    'started_at': datetime.now().isoformat(),
+                    'finished_at': None,
+                    'error': None,
+                    'output_file': None,
+                    'download_dir': download_dir,
+                    'type': 'episode',
+                    'parent_id': download_id,
+                    'episode_number': number
+                }, options)
+
+            episodes = {
+                str(number): {
+                    'number': number,
+                    'total': len(episode_urls),
+                    'status': 'queued',
+                    'url': episode_url,
+                    'filename': None,
+                    'skipped': False,
+                    'progress': 0,
+                    'download_id': child_id
+                }
+                for number, (episode_url, child_id) in enumerate(zip(episode_urls, child_ids), 1)
+            }
+            self._update_download(
+                download_id,
+                episodes=episodes,
+                child_ids=child_ids,
+                total_episodes=len(episode_urls),
+                completed_episodes=0,
+                skipped_episodes=0,
+                failed_episodes=0,
+                message=f'Downloading {len(episode_urls)} episodes'
+            )
+
+            self._admit_season_children(download_id)
+
+        except Exception as e:
+            self._finish_download(download_id, 'failed', message='Season download failed', error=str(e))
+
+    def _admit_season_children(self, parent_id):
+        """Submit queued episodes of a season until its concurrency cap is reached"""
+        with self._lock:
+            parent = self.downloads.get(parent_id)
+            if parent is None or parent['status'] == 'paused' or parent.get('cancel_requested'):
+                return
+
+            children = [self.downloads[child_id] for child_id in parent.get('child_ids', [])
+                        if child_id in self.downloads]
+            # A child that just finished is still "running" until its worker returns
+            # Episodes waiting to retry do not hold a slot while they wait
+            active = sum(1 for child in children
+                         if child['status'] not in self.FINISHED_STATUSES and not child.get('retry_at')
+                         and (child['status'] == 'downloading'
+                              or self.scheduler.is_queued(child['id'])
+                              or self.scheduler.is_running(child['id'])))
+
+            for child in children:
+                if active >= Config.SEASON_EPISODE_CONCURRENCY:
+                    break
+                if child['status'] == 'queued' and not self.scheduler.is_queued(child['id']):
+                    self._enqueue(child['id'])
+                    active += 1
+
+    def _rollup_child(self, child):
+        """Copy a child episode's state into its season. Must be called with the lock held."""
+        parent = self.downloads.get(child['parent_id'])
+        if parent is None:
+            return
+        if parent.get('type') == 'batch':
+            return self._rollup_batch(parent)
+
+        status = child['status']
+        if status == 'completed' and child.get('skipped'):
+            status = 'skipped'
+        episode = parent.get('episodes', {}).get(str(child['episode_number']), {})
+        fields = {'status': status, 'progress': child.get('progress', 0), 'filename': child.get('output_file'),
+                  'skipped': status == 'skipped'}
+        # Progress-only changes stay in memory; the season is saved when an episode's status or file changes
+        fields = {key: value for key, value in fields.items() if episode.get(key) != value}
+        if fields:
+            self._update_episode(parent['id'], child['episode_number'], **fields)
+
+        episodes = parent.get('episodes', {}).values()
+        counts = {
+            'completed_episodes': sum(1 for ep in episodes if ep['status'] == 'completed'),
+            'skipped_episodes': sum(1 for ep in episodes if ep['status'] == 'skipped'),
+            'failed_episodes': sum(1 for ep in episodes if ep['status'] == 'failed')
+        }
+        changed = {key: value for key, value in counts.items() if parent.get(key) != value}
+
+        total = len(parent.get('episodes', {})) or 1
+        done = sum(counts.values())
+        progress = sum(100 if ep['status'] in ('completed', 'skipped', 'failed', 'cancelled') else ep.get('progress', 0)
+                       for ep in episodes) / total
+        self._update_download(parent['id'], progress=round(min(progress, 99), 1),
+                              message=f'{done} of {total} episodes done', **changed)
+
+    def _on_child_finished(self, parent_id):
+        """Admit the next episodes of a season, and finish the season when all are done"""
+        if self.downloads.get(parent_id, {}).get('type') == 'batch':
+            return self._on_batch_child_finished(parent_id)
+        self._admit_season_children(parent_id)
+
+        with self._lock:
+            parent = self.downloads.get(parent_id)
+            if parent is None or parent['status'] != 'downloading':
+                return
+            episodes = parent.get('episodes', {}).values()
+            if any(ep['status'] not in ('completed', 'skipped', 'failed', 'cancelled') for ep in episodes):
+                return
+            completed = parent.get('completed_episodes', 0)
+            skipped = parent.get('skipped_episodes', 0)
+            failed = parent.get('failed_episodes', 0)
+
+        message = f'Season download completed: {completed} downloaded, {skipped} skipped (already existed)'
+        if parent.get('cancel_requested'):
+            self._finish_download(parent_id, 'cancelled', message=f'Season download cancelled: {completed} downloaded, '
+                                                                  f'{skipped} skipped (already existed)', progress=100)
+        elif failed:
+            self._finish_download(parent_id, 'failed', message=f'{message}, {failed} failed',
+                                  error=f'{failed} episode(s) failed to download', progress=100)
+        else:
+            self._finish_download(parent_id, 'completed', message=message, progress=100)
+
+    def start_batch(self, urls, options=None, idempotency_key=None):
+        """Download many videos as one batch job
+
+        The batch is a parent download whose items are child downloads.
+        They are written to the job store in one transaction and queued on
+        the scheduler in one step. The parent carries the aggregate progress
+        and can be paused, resumed or cancelled as a whole (control_download).
+        URLs that are already queued, downloading or downloaded to the same
+        folder are not added; their existing downloads are returned in
+        duplicate_ids. Returns batch_id None when every URL was a duplicate.
+        """
+        download_dir = options.get('download_dir', Config.DOWNLOAD_DIR) if options else Config.DOWNLOAD_DIR
+        now = datetime.now().isoformat()
+
+        with self._lock:
+            existing = self.downloads.get(self._idempotency_keys.get(idempotency_key)) if idempotency_key else None
+            if existing is not None and existing.get('type') == 'batch':
+                download_ids = existing.get('child_ids', []) + existing.get('duplicate_ids', [])
+                return {'success': True, 'batch_id': existing['id'], 'download_ids': download_ids,
+                        'duplicate_ids': download_ids, 'count': len(download_ids), 'duplicate': True}
+
+            batch_id = self._generate_id()
+            children = []
+            duplicate_ids = []
+            for url in urls:
+                duplicate = self._find_duplicate('video', url, options, download_dir)
+                if duplicate:
+                    duplicate_ids.append(duplicate)
+                    continue
+                child = {
+                    'id': self._generate_id(),
+                    'url': url,
+                    'status': 'queued',
+                    'progress': 0,
+                    'message': 'Queued for download',
+                    'started_at': now,
+                    'finished_at': None,
+                    'error': None,
+                    'output_file': None,
+                    'download_dir': download_dir,
+                    'parent_id': batch_id
+                }
+                # Registered one by one so a URL listed twice is found as a duplicate
+                self._create_download(child, options, save=False)
+                children.append(child)
+
+            if not children:
+                return {'success': True, 'batch_id': None, 'download_ids': duplicate_ids,
+                        'duplicate_ids': duplicate_ids, 'count': len(duplicate_ids)}
+
+            batch = {
+                'id': batch_id,
+                'url': '',
+                'type': 'batch',
+                'status': 'downloading',
+                'progress': 0,
+                'message': f'Downloading {len(children)} videos',
+                'started_at': now,
+                'finished_at': None,
+                'error': None,
+                'download_dir': download_dir,
+                'child_ids': [child['id'] for child in children],
+                'duplicate_ids': duplicate_ids,
+                'total_items': len(children),
+                'completed_items': 0,
+                'failed_items': 0,
+                'cancelled_items': 0,
+                'idempotency_key': idempotency_key
+            }
+            self._create_download(batch, options, save=False)
+            self.store.save_many([(batch, options)] + [(child, options) for child in children])
+
+        self._enqueue_many(batch['child_ids'])
+        download_ids = batch['child_ids'] + duplicate_ids
+        return {'success': True, 'batch_id': batch_id, 'download_ids': download_ids,
+                'duplicate_ids': duplicate_ids, 'count': len(download_ids)}
+
+    def _rollup_batch(self, batch):
+        """Aggregate a batch's items into its counts and progress. Must be called with the lock held."""
+        children = [self.downloads[child_id] for child_id in batch['child_ids'] if child_id in self.downloads]
+        counts = {
+            'completed_items': sum(1 for child in children if child['status'] == 'completed'),
+            'failed_items': sum(1 for child in children if child['status'] == 'failed'),
+            'cancelled_items': sum(1 for child in children if child['status'] == 'cancelled')
+        }
+        changed = {key: value for key, value in counts.items() if batch.get(key) != value}
+
+        total = len(batch['child_ids']) or 1
+        done = sum(counts.values())
+        progress = sum(100 if child['status'] in self.FINISHED_STATUSES else child.get('progress', 0)
+                       for child in children) / total
+        message = f'{done} of {total} videos done'
+        if batch['status'] == 'paused':
+            message = f'Paused - {message}'
+        elif batch.get('cancel_requested'):
+            message = f'Cancelling - {message}'
+        self._update_download(batch['id'], progress=round(min(progress, 99), 1), message=message, **changed)
+
+    def _on_batch_child_finished(self, batch_id):
+        """Finish a batch when all its items are finished"""
+        with self._lock:
+            batch = self.downloads.get(batch_id)
+            if batch is None or batch['status'] in self.FINISHED_STATUSES:
+                return
+            children = [self.downloads[child_id] for child_id in batch['child_ids'] if child_id in self.downloads]
+            if any(child['status'] not in self.FINISHED_STATUSES for child in children):
+                return
+            completed = batch.get('completed_items', 0)
+            failed = batch.get('failed_items', 0)
+            cancelled = batch.get('cancelled_items', 0)
+
+        message = f'Batch finished: {completed} downloaded, {failed} failed, {cancelled} cancelled'
+        if batch.get('cancel_requested'):
+            self._finish_download(batch_id, 'cancelled', message=message, progress=100)
+        elif failed:
+            self._finish_download(batch_id, 'failed', message=message,
+                                  error=f'{failed} video(s) failed to download', progress=100)
+        else:
+            self._finish_download(batch_id, 'completed', message=message, progress=100)
+
+    def control_download(self, download_id, action):
+        """Pause, resume or cancel a download, or all items of a batch or season
+
+        Queued items leave the scheduler queue. A running svtplay-dl (or
+        worker) is paused with SIGSTOP and continued with SIGCONT, keeping
+        its slot; the segment engine stops instead and resumes from its
+        parts manifest when queued again. Cancelling a running download
+        terminates its process group (svtplay-dl and its ffmpeg) with a
+        grace period before it is killed, which releases its slot.
+        """
+        if action not in ('pause', 'resume', 'cancel'):
+            return {'success': False, 'error': f'Unknown action: {action}'}
+
+        with self._lock:
+            download = self.downloads.get(download_id)
+            if download is None:
+                return {'success': False, 'error': 'Download not found'}
+            if download['status'] in self.FINISHED_STATUSES:
+                return {'success': False, 'error': f'Download is already {download["status"]}'}
+
+            is_parent = bool(download.get('child_ids'))
+            items = ([self.downloads[child_id] for child_id in download['child_ids'] if child_id in self.downloads]
+                     if is_parent else [download])
+            if action == 'pause':
+                affected = [item['id'] for item in items if self._pause_item(item)]
+                if is_parent and download['status'] != 'paused':
+                    self._update_download(download_id, status='paused', message='Paused')
+            elif action == 'resume':
+                affected = [item['id'] for item in items if self._resume_item(item)]
+                if is_parent and download['status'] == 'paused':
+                    self._update_download(download_id, status='downloading', message='Resumed')
+            else:
+                affected = [item['id'] for item in items if self._cancel_item(item)]
+                if is_parent:
+                    self._update_download(download_id, status='downloading', cancel_requested=True,
+                                          message='Cancelling...')
+
+        if action == 'resume':
+            requeue = [item_id for item_id in affected if self.downloads[item_id]['status'] == 'queued']
+            if download.get('type') == 'season' and is_parent:
+                self._admit_season_children(download_id)
+            else:
+                self._enqueue_many(requeue)
+        elif action == 'cancel':
+            for item_id in affected:
+                if self.downloads[item_id]['status'] in ('queued', 'paused'):
+                    self._finish_download(item_id, 'cancelled', message='Cancelled', retry_at=None)
+        if is_parent:
+            self._on_child_finished(download_id)
+            if download.get('type') == 'batch':
+                with self._lock:
+                    self._rollup_batch(download)
+        elif not affected:
+            errors = {
+                'pause': 'Only queued or downloading downloads can be paused',
+                'resume': 'Download is not paused',
+                'cancel': 'Download cannot be cancelled now (it is being merged)'
+            }
+            return {'success': False, 'error': errors[action]}
+
+        return {'success': True, 'download_id': download_id, 'status': self.downloads[download_id]['status'],
+                'affected': len(affected)}
+
+    def _pause_item(self, item):
+        """Pause one download. Returns True if it was paused. Must be called with the lock held."""
+        if item['status'] == 'queued':
+            # Episodes waiting for a season slot are not in the scheduler yet; only a picked up one is missed
+            if not self.scheduler.cancel(item['id']) and self.scheduler.is_running(item['id']):
+                return False
+            self._update_download(item['id'], status='paused', message='Paused', retry_at=None)
+            return True
+        if item['status'] != 'downloading' or item.get('cancel_requested'):
+            return False
+
+        pid = self._processes.get(item['id'])
+        if pid is not None and process_control.can_suspend():
+            if not process_control.suspend(pid):
+                return False
+            self._update_download(item['id'], status='paused', suspended=True, message='Paused')
+            return True
+        if item['id'] in self._stop_events:
+            # Stopped after the current segment; resumed from the parts manifest
+            self._stop_events[item['id']].set()
+            self._update_download(item['id'], status='paused', pause_requested=True, message='Paused')
+            return True
+        return False
+
+    def _resume_item(self, item):
+        """Resume one paused download. Returns True if it was resumed. Must be called with the lock held."""
+        if item['status'] != 'paused':
+            return False
+        if item.get('suspended'):
+            pid = self._processes.get(item['id'])
+            if pid is not None:
+                process_control.resume(pid)
+            self._update_download(item['id'], status='downloading', suspended=None, message='Downloading...')
+            return True
+        # Queued again by the caller (or by its worker, if it has not stopped yet)
+        self._update_download(item['id'], status='queued', message='Queued for download')
+        return True
+
+    def _cancel_item(self, item):
+        """Cancel one download. Returns True if it was cancelled or is being stopped. Must be called with the lock held.
+
+        Queued and stopped downloads are finished by the caller; a running
+        one is finished by its worker once the process has exited.
+        """
+        if item['status'] == 'queued':
+            return self.scheduler.cancel(item['id']) or not self.scheduler.is_running(item['id'])
+        if item['status'] == 'paused' and not item.get('suspended') and not item.get('pause_requested'):
+            return True
+        if item['status'] not in ('downloading', 'paused') or item.get('cancel_requested'):
+            return False
+
+        self._update_download(item['id'], status='downloading', cancel_requested=True, suspended=None,
+                              message='Cancelling...')
+        pid = self._processes.get(item['id'])
+        if pid is not None:
+            threading.Thread(target=process_control.terminate, args=(pid, Config.CANCEL_GRACE_PERIOD),
+                             name=f'cancel-{item["id"]}', daemon=True).start()
+        if item['id'] in self._stop_events:
+            self._stop_events[item['id']].set()
+        return True
+
+    def _register_process(self, download_id, pid):
+        """Record the process group running a download, stopping it right away if a cancel came first"""
+        with self._lock:
+            self._processes[download_id] = pid
+            cancelled = self.downloads.get(download_id, {}).get('cancel_requested')
+        if cancelled:
+            threading.Thread(target=process_control.terminate, args=(pid, Config.CANCEL_GRACE_PERIOD),
+                             daemon=True).start()
+
+    def _unregister_process(self, download_id):
+        with self._lock:
+            self._processes.pop(download_id, None)
+
+    def _stopped(self, download_id):
+        """After a run: finish a download stopped by control_download. Returns True if it was stopped."""
+        download = self.downloads[download_id]
+        if download.get('cancel_requested'):
+            self._finish_download(download_id, 'cancelled', message='Cancelled', suspended=None)
+            return True
+        if download.get('pause_requested'):
+            self._update_download(download_id, pause_requested=None)
+            if download['status'] == 'queued':
+                # Resumed while it was stopping
+                self._enqueue(download_id, follow_up=True)
+            return True
+        return False
+
+    def _serial_season_download(self, download_id, url, options):
+        """Download a season with a single svtplay-dl --all-episodes process"""
+        try:
+            self._update_download(download_id, status='downloading', message='Downloading season...', retry_at=None)
 
             # Get custom download directory if provided
             download_dir = options.get('download_dir', Config.DOWNLOAD_DIR) if options else Config.DOWNLOAD_DIR
@@ -745,11 +1442,11 @@ class SVTPlayDownloader:
             # Ensure download directory exists
             os.makedirs(download_dir, exist_ok=True)
 
-            # Build command
-            cmd = SVTPLAY_DL_CMD.copy()
+            # Build svtplay-dl arguments
+            args = []
 
             # Add all episodes flag
-            cmd.append('--all-episodes')
+            args.append('--all-episodes')
 
             # Add quality option - fix format for TV4 Play compatibility
             quality = options.get('quality', Config.DEFAULT_QUALITY) if options else Config.DEFAULT_QUALITY
@@ -761,49 +1458,42 @@ class SVTPlayDownloader:
 
             # Only add quality parameter if not "best" - let svtplay-dl choose automatically for best
             if quality and quality != 'best':
-                cmd.extend(['-q', quality])
+                args.extend(['-q', quality])
 
             # Add subtitle option
             if options and options.get('subtitle', Config.DEFAULT_SUBTITLE):
-                cmd.append('--subtitle')
+                args.append('--subtitle')
 
             # Add token if provided (for TV4 Play and premium content)
             if options and options.get('token'):
-                cmd.extend(['--token', options.get('token')])
+                args.extend(['--token', options.get('token')])
 
             # Add output directory and custom filename template (just title, no hash or metadata)
             # Use -o for directory and --filename for template
-            cmd.extend(['-o', download_dir])
-            cmd.extend(['--filename', '{title}'])
+            args.extend(['-o', download_dir])
+            args.extend(['--filename', '{title}'])
 
             # Add URL
-            cmd.append(url)
+            args.append(url)
 
             # Debug: Print the command being run
             print("=" * 80)
             print("DEBUG: Running svtplay-dl command (season download):")
-            print(" ".join(cmd))
+            print(" ".join(SVTPLAY_DL_CMD + args))
             print("=" * 80)
 
-            # Run download with local ffmpeg in PATH
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,  # Line buffered for real-time reading
-                env=get_env_with_local_bin()  # Add bin/ to PATH for local ffmpeg
-            )
-
-            # Process output in real-time and update episode status
-            stdout_lines, stderr_lines, full_output = self._process_output_realtime(process, download_id)
+            # Run download with local ffmpeg in PATH and update episode status in real-time
+            returncode, stdout, stderr_lines = self._run_svtplay_dl(args, download_id)
+            if self._stopped(download_id):
+                return
+            full_output = stdout + '\n' + '\n'.join(stderr_lines)
 
             # Debug: Print summary
             print("=" * 80)
             print("DEBUG: svtplay-dl output (season download):")
             stderr_preview = '\n'.join(stderr_lines[:20]) if stderr_lines else "(empty)"
             print("STDERR (first 20 lines):", stderr_preview)
-            print("Return code:", process.returncode)
+            print("Return code:", returncode)
             if 'total_episodes' in self.downloads[download_id]:
                 print(f"Episodes processed: {self.downloads[download_id].get('total_episodes', 0)}")
                 print(f"Completed: {self.downloads[download_id].get('completed_episodes', 0)}")
@@ -811,143 +1501,649 @@ class SVTPlayDownloader:
             print("=" * 80)
 
             # Check for specific error conditions
-            token_required = 'token' in full_output.lower() and ('need' in full_output.lower() or 'require' in full_output.lower())
-            no_videos_found = 'no videos found' in full_output.lower()
-            drm_protected = 'drm' in full_output.lower() and 'protected' in full_output.lower()
+            failure = classify(full_output, returncode)
+            token_required = failure == retry_policy.TOKEN_REQUIRED
+            no_videos_found = failure == retry_policy.NO_VIDEOS_FOUND
+            drm_protected = failure == retry_policy.DRM_PROTECTED
 
             # Determine if download actually succeeded
-            success = process.returncode == 0 and not token_required and not no_videos_found
+            success = returncode == 0 and not token_required and not no_videos_found
 
             if success:
                 # Post-process: merge audio and video if separate files exist
-                self._merge_audio_video_if_needed(download_dir)
-
-                self.downloads[download_id]['status'] = 'completed'
-
-                # Create summary message
-                total = self.downloads[download_id].get('total_episodes', 0)
-                completed = self.downloads[download_id].get('completed_episodes', 0)
-                skipped = self.downloads[download_id].get('skipped_episodes', 0)
-
-                if total > 0:
-                    self.downloads[download_id]['message'] = f'Season download completed: {completed} downloaded, {skipped} skipped (already existed)'
-                else:
-                    self.downloads[download_id]['message'] = 'Season download completed'
-
-                self.downloads[download_id]['progress'] = 100
-                self.downloads[download_id]['finished_at'] = datetime.now().isoformat()
+                self._complete_download(download_id, download_dir)
             else:
-                self.downloads[download_id]['status'] = 'failed'
-
                 # Detect service name for appropriate error messages
                 service_name = self._get_service_name(url)
 
                 # Provide specific error messages
                 if token_required:
-                    self.downloads[download_id]['message'] = 'Token required or expired'
+                    message = 'Token required or expired'
                     if service_name == 'TV4 Play':
-                        self.downloads[download_id]['error'] = 'This content requires a valid TV4 Play token. Please check that you have entered a token and that it has not expired. Click the "?" button next to the Token field for instructions.'
+                        error = 'This content requires a valid TV4 Play token. Please check that you have entered a token and that it has not expired. Click the "?" button next to the Token field for instructions.'
                     else:
-                        self.downloads[download_id]['error'] = f'This content requires authentication. If this is premium content from {service_name}, you may need to provide a token.'
+                        error = f'This content requires authentication. If this is premium content from {service_name}, you may need to provide a token.'
                 elif no_videos_found:
-                    self.downloads[download_id]['message'] = 'No videos found'
+                    message = 'No videos found'
                     if service_name == 'TV4 Play':
-                        self.downloads[download_id]['error'] = 'No videos were found at this URL. Please check the URL or try logging in to TV4 Play and refreshing your token.'
+                        error = 'No videos were found at this URL. Please check the URL or try logging in to TV4 Play and refreshing your token.'
                     else:
-                        self.downloads[download_id]['error'] = f'No videos were found at this URL. The video may have been removed, may be geo-blocked, or the URL may be incorrect.'
+                        error = f'No videos were found at this URL. The video may have been removed, may be geo-blocked, or the URL may be incorrect.'
                 elif drm_protected:
-                    self.downloads[download_id]['message'] = 'DRM protected content'
-                    self.downloads[download_id]['error'] = 'This content is DRM protected and cannot be downloaded.'
+                    message = 'DRM protected content'
+                    error = 'This content is DRM protected and cannot be downloaded.'
                 else:
-                    self.downloads[download_id]['message'] = 'Season download failed'
-                    self.downloads[download_id]['error'] = stderr or stdout or 'Unknown error'
+                    message = 'Season download failed'
+                    error = '\n'.join(stderr_lines) or stdout or 'Unknown error'
+
+                self._fail_attempt(download_id, failure, message, error)
+
+        except Exception as e:
+            if self._stopped(download_id):
+                return
+            self._fail_attempt(download_id, classify(str(e)), 'Season download failed', str(e))
+
+    def _create_download(self, download, options=None, save=True):
+        """Register a new download and write it to the job store (unless the caller saves it, save=False)"""
+        options = dict(options or {})
+        with self._lock:
+            self.downloads[download['id']] = download
+            self._options[download['id']] = options
+            self._touch(download, list(download))
+            self._index_download(download)
+            if save:
+                self.store.save(download, options)
+
+    def _update_download(self, download_id, **fields):
+        """Apply field changes to a download and persist non-volatile changes"""
+        with self._lock:
+            download = self.downloads.get(download_id)
+            if download is None:
+                return
+            download.update(fields)
+            self._touch(download, list(fields))
+            if not self.VOLATILE_FIELDS.issuperset(fields):
+                self._save_download(download)
+            if download.get('parent_id') and not {'status', 'progress', 'output_file', 'skipped'}.isdisjoint(fields):
+                self._rollup_child(download)
+
+    def _update_episode(self, download_id, ep_num, **fields):
+        """Apply field changes to one episode of a season download"""
+        with self._lock:
+            download = self.downloads.get(download_id)
+            if download is None:
+                return
+            episode = download.setdefault('episodes', {}).setdefault(str(ep_num), {'number': ep_num})
+            episode.update(fields)
+            self._touch(download, [('episodes', str(ep_num))])
+            if not self.VOLATILE_FIELDS.issuperset(fields):
+                self._save_download(download)
+
+    def _touch(self, download, keys):
+        """Record that keys of a download changed. Must be called with the lock held."""
+        self.version += 1
+        download['version'] = self.version
+        field_versions = self._field_versions.setdefault(download['id'], {})
+        for key in keys:
+            field_versions[key] = self.version
+        self._change_index[download['id']] = self.version
+        self._change_index.move_to_end(download['id'])
+        self._changed.notify_all()
+
+    def _save_download(self, download):
+        """Write a download to the job store. Must be called with the lock held."""
+        try:
+            self.store.save(download)
+        except Exception as e:
+            print(f"Error saving download {download['id']}: {e}")
+
+    def _finish_download(self, download_id, status, **fields):
+        """Mark a download as completed/failed and trim old history"""
+        parent_id = self.downloads.get(download_id, {}).get('parent_id')
+        self._update_download(download_id, status=status, finished_at=datetime.now().isoformat(), **fields)
+        self._prune_history()
+
+        if parent_id:
+            self._on_child_finished(parent_id)
+
+    def _fail_attempt(self, download_id, failure, message, error):
+        """Record a failed attempt, then retry it later or fail the download
+
+        The retry policy decides from the failure class (see retry_policy)
+        whether another attempt is worth it and after how long. Retries wait
+        in the scheduler, not in a worker thread, and keep their place over
+        a restart through retry_at.
+        """
+        download = self.downloads[download_id]
+        attempts = list(download.get('attempts') or [])
+        attempts.append({
+            'attempt': len(attempts) + 1,
+            'failed_at': datetime.now().isoformat(),
+            'failure': failure,
+            'message': message,
+            'error': (error or '')[:500]
+        })
+
+        delay = self.retry_policy.next_delay(failure, len(attempts))
+        if delay is None:
+            self._finish_download(download_id, 'failed', message=message, error=error, failure=failure,
+                                  attempts=attempts)
+            return
+
+        print(f"Download {download_id} failed ({failure}), retrying in {delay} s")
+        retry_at = (datetime.now() + timedelta(seconds=delay)).isoformat()
+        fields = {}
+        if download.get('type') == 'season' and not download.get('child_ids'):
+            # A serial season is re-run from the start (svtplay-dl skips finished episodes)
+            fields = {'episodes': {}, 'total_episodes': 0, 'completed_episodes': 0, 'skipped_episodes': 0,
+                      'current_episode': None}
+        self._update_download(
+            download_id,
+            status='queued',
+            progress=0,
+            error=error,
+            failure=failure,
+            attempts=attempts,
+            retry_at=retry_at,
+            message=f'{message} - retry {len(attempts) + 1} of {self.retry_policy.max_attempts(failure)} in {delay:.0f} s',
+            **fields
+        )
+        self._enqueue(download_id, follow_up=True)
+        if download.get('parent_id'):
+            # An episode waiting to retry frees its season slot for the next one
+            self._admit_season_children(download['parent_id'])
+
+    def _enqueue(self, download_id, follow_up=False):
+        """Hand a queued download to the scheduler (delayed until retry_at for retries)"""
+        download = self.downloads[download_id]
+        options = self._options.get(download_id, {})
+        worker = self._season_download_worker if download.get('type') == 'season' else self._download_worker
+        delay = 0
+        if download.get('retry_at'):
+            delay = max(0, (datetime.fromisoformat(download['retry_at']) - datetime.now()).total_seconds())
+        self.scheduler.submit(download_id, worker, download_id, download['url'], options,
+                              priority=self._get_priority(options), delay=delay, follow_up=follow_up)
+
+    def _enqueue_many(self, download_ids):
+        """Hand many queued downloads to the scheduler at once (retries still wait for retry_at)"""
+        jobs = []
+        for download_id in download_ids:
+            download = self.downloads[download_id]
+            if download.get('retry_at'):
+                self._enqueue(download_id)
+                continue
+            options = self._options.get(download_id, {})
+            worker = self._season_download_worker if download.get('type') == 'season' else self._download_worker
+            jobs.append((download_id, worker, (download_id, download['url'], options), self._get_priority(options)))
+        self.scheduler.submit_many(jobs)
+
+    def _restore_downloads(self):
+        """Load saved downloads and re-enqueue the ones that never finished"""
+        try:
+            saved = self.store.load_all()
+        except Exception as e:
+            print(f"Error loading saved downloads: {e}")
+            return
+
+        resumed = []
+        seasons = []
+        batches = []
+        merging = []
+        cancelled = []
+        with self._lock:
+            for download, options in saved:
+                self.downloads[download['id']] = download
+                self._options[download['id']] = options
+                self._touch(download, list(download))
+                self._index_download(download)
+                # Processes do not survive a restart: stopped downloads are queued again on resume
+                if download.get('suspended') or download.get('pause_requested'):
+                    download.pop('suspended', None)
+                    download.pop('pause_requested', None)
+                if download.get('cancel_requested') and not download.get('child_ids') \
+                        and download.get('status') not in self.FINISHED_STATUSES:
+                    cancelled.append(download['id'])
+                    continue
+                if download.get('status') == 'merging':
+                    # Downloaded, only the merge is left
+                    merging.append(download['id'])
+                    continue
+                if download.get('status') not in ('queued', 'downloading'):
+                    continue
+                if download.get('type') == 'batch':
+                    # Its unfinished items are resumed like other downloads
+                    batches.append(download['id'])
+                    continue
+                if download.get('child_ids'):
+                    # Parallel season - its unfinished episodes are resumed below
+                    seasons.append(download['id'])
+                    continue
+                # Episode progress from the interrupted run is rebuilt by the new run
+                for key in ('episodes', 'total_episodes', 'completed_episodes', 'skipped_episodes', 'current_episode'):
+                    download.pop(key, None)
+                resumed.append(download['id'])
+
+        for download_id in resumed:
+            self._update_download(
+                download_id,
+                status='queued',
+                progress=0,
+                message='Resumed after restart',
+                error=None,
+                finished_at=None
+            )
+        for download_id in cancelled:
+            self._finish_download(download_id, 'cancelled', message='Cancelled')
+
+        # Episodes of a parallel season are admitted by their season
+        self._enqueue_many([download_id for download_id in resumed
+                            if self.downloads[download_id].get('parent_id') not in seasons])
+
+        for season_id in seasons:
+            self._admit_season_children(season_id)
+
+        for batch_id in batches:
+            self._on_batch_child_finished(batch_id)
 
-                self.downloads[download_id]['finished_at'] = datetime.now().isoformat()
+        for download_id in merging:
+            download_dir = self._options[download_id].get('download_dir', Config.DOWNLOAD_DIR)
+            self._update_download(download_id, merge_progress=0, message='Waiting to merge audio and video')
+            self.merge_scheduler.submit(download_id, self._merge_worker, download_id, download_dir)
 
+        if resumed:
+            print(f"Resumed {len(resumed)} interrupted download(s)")
+
+        self._prune_history()
+
+    def _prune_history(self):
+        """Keep at most Config.JOB_HISTORY_LIMIT finished downloads"""
+        try:
+            removed = self.store.prune(Config.JOB_HISTORY_LIMIT)
         except Exception as e:
-            self.downloads[download_id]['status'] = 'failed'
-            self.downloads[download_id]['message'] = 'Season download failed'
-            self.downloads[download_id]['error'] = str(e)
-            self.downloads[download_id]['finished_at'] = datetime.now().isoformat()
+            print(f"Error pruning download history: {e}")
+            return
+
+        with self._lock:
+            for download_id in removed:
+                download = self.downloads.pop(download_id, None)
+                if download is None:
+                    continue
+                self._unindex_download(download)
+                self._options.pop(download_id, None)
+                self._field_versions.pop(download_id, None)
+                self._change_index.pop(download_id, None)
+                self.version += 1
+                if len(self._removed) == self._removed.maxlen:
+                    self._removed_floor = self._removed[0][0]
+                self._removed.append((self.version, download_id))
+            if removed:
+                self._changed.notify_all()
 
     def get_status(self, download_id):
         """Get status of a specific download"""
         if download_id in self.downloads:
-            return {'success': True, 'download': self.downloads[download_id]}
+            download = dict(self.downloads[download_id])
+            download['queue_position'] = self.scheduler.position(download_id)
+            return {'success': True, 'download': download}
         else:
             return {'success': False, 'error': 'Download not found'}
 
-    def get_all_downloads(self):
-        """Get all downloads"""
+    def get_all_downloads(self, since=None, status=None, limit=None, offset=0):
+        """Get downloads, newest first, one page at a time
+
+        Args:
+            since: Only return downloads changed after this version cursor.
+                   Results are then ordered by change, and the returned
+                   `version` is the cursor for the next call.
+            status: Optional list of statuses to include
+            limit: Page size (defaults to Config.DOWNLOADS_PAGE_SIZE)
+            offset: Number of matching downloads to skip (ignored with since)
+        """
+        statuses = set(status) if status else None
+        if limit is None:
+            limit = Config.DOWNLOADS_PAGE_SIZE
+        limit = max(1, min(int(limit), Config.DOWNLOADS_PAGE_MAX))
+        positions = self.scheduler.positions()
+
+        with self._lock:
+            if since is not None:
+                result = self._get_changed_downloads(since, statuses, limit)
+            else:
+                matching = [
+                    download for download in reversed(self.downloads.values())
+                    if statuses is None or download.get('status') in statuses
+                ]
+                page = matching[offset:offset + limit]
+                result = {
+                    'downloads': [dict(download) for download in page],
+                    'total': len(matching),
+                    'next_offset': offset + limit if offset + limit < len(matching) else None,
+                    'version': self.version
+                }
+
+        for download in result['downloads']:
+            download['queue_position'] = positions.get(download['id'])
+
+        result.update({
+            'success': True,
+            'queue': self.scheduler.stats(),
+            'queue_positions': positions
+        })
+        return result
+
+    def _get_changed_downloads(self, since, statuses, limit):
+        """Full download dicts changed after `since`. Must be called with the lock held."""
+        reset = self._is_stale_cursor(since)
+        if reset:
+            since = 0
+
+        changed = []
+        for download_id, version in reversed(self._change_index.items()):
+            if version <= since:
+                break
+            changed.append((download_id, version))
+        changed.reverse()
+
+        downloads = []
+        cursor = since
+        has_more = False
+        for download_id, version in changed:
+            download = self.downloads[download_id]
+            if statuses is None or download.get('status') in statuses:
+                if len(downloads) == limit:
+                    has_more = True
+                    break
+                downloads.append(dict(download))
+            cursor = version
+        if not has_more:
+            cursor = self.version
+
+        return {
+            'downloads': downloads,
+            'version': cursor,
+            'reset': reset,
+            'has_more': has_more,
+            'removed': [] if reset else [download_id for version, download_id in self._removed if version > since]
+        }
+
+    def _is_stale_cursor(self, since):
+        """True when a version cursor is too old (or unknown) to build a delta from"""
+        return since <= 0 or since > self.version or since < self._removed_floor
+
+    def get_changes(self, since=0):
+        """Get the fields of every download that changed after version `since`
+
+        Each entry holds the download's id and version plus only the fields
+        that changed; `episodes` holds only the changed episodes. `reset` is
+        True when the client must drop its state and use this as a full snapshot.
+        """
+        with self._lock:
+            reset = self._is_stale_cursor(since)
+            if reset:
+                since = 0
+
+            changes = []
+            for download_id, version in reversed(self._change_index.items()):
+                if version <= since:
+                    break
+                changes.append(self._build_delta(download_id, since))
+            changes.reverse()
+
+            removed = [download_id for version, download_id in self._removed if version > since]
+            current_version = self.version
+
         return {
             'success': True,
-            'downloads': list(self.downloads.values())
+            'version': current_version,
+            'reset': reset,
+            'downloads': changes,
+            'removed': [] if reset else removed
         }
 
+    def wait_for_changes(self, since, timeout=None):
+        """Block until something changed after version `since` (or timeout), then get_changes"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != since, timeout=timeout)
+        return self.get_changes(since)
+
+    def _build_delta(self, download_id, since):
+        """Build the changed-fields dict for one download. Must be called with the lock held."""
+        download = self.downloads[download_id]
+        delta = {'id': download_id, 'version': download['version']}
+        episode_keys = []
+        for key, version in self._field_versions[download_id].items():
+            if version <= since:
+                continue
+            if isinstance(key, tuple):
+                episode_keys.append(key[1])
+            elif key not in download:
+                continue
+            elif key == 'episodes':
+                # The whole map was replaced (a serial season retry) - clients drop their copy
+                delta['episodes'] = {number: dict(episode) for number, episode in download['episodes'].items()}
+                delta['episodes_reset'] = True
+            else:
+                delta[key] = download[key]
+
+        if episode_keys and 'episodes' not in delta:
+            episodes = download.get('episodes', {})
+            delta['episodes'] = {number: dict(episodes[number]) for number in episode_keys if number in episodes}
+        return delta
+
+    def get_queue_positions(self):
+        """Get {download_id: position} for every queued download"""
+        return self.scheduler.positions()
+
+    def get_queue_status(self):
+        """Get queue depth and worker usage of the download and merge schedulers"""
+        return {'success': True, 'queue': self.scheduler.stats(), 'merge_queue': self.merge_scheduler.stats()}
+
+    def _get_priority(self, options):
+        """Scheduler priority from download options (lower runs first)"""
+        try:
+            return int(options.get('priority', 0)) if options else 0
+        except (TypeError, ValueError):
+            return 0
+
+    def _get_bandwidth_weight(self, options):
+        """Share of the bandwidth budget a download gets relative to others (default 1)"""
+        try:
+            weight = float(options.get('bandwidth_weight', 1)) if options else 1
+        except (TypeError, ValueError):
+            return 1
+        return weight if weight > 0 else 1
+
+    def get_bandwidth(self):
+        """Get the bandwidth limit, schedule and each running download's share"""
+        return {'success': True, **self.bandwidth.status()}
+
+    def set_bandwidth(self, limit_kbps=None, schedule=None, weights=None):
+        """Change the bandwidth limit, schedule ('HH:MM-HH:MM=kbps,...') and/or download weights at runtime"""
+        try:
+            if limit_kbps is not None and int(limit_kbps) < 0:
+                raise ValueError('limit_kbps must be 0 (unlimited) or more')
+            parsed = parse_schedule(schedule) if schedule is not None else None
+            weights = {download_id: float(weight) for download_id, weight in (weights or {}).items()}
+            if any(weight <= 0 for weight in weights.values()):
+                raise ValueError('Weights must be greater than 0')
+        except (TypeError, ValueError) as e:
+            return {'success': False, 'error': str(e)}
+
+        self.bandwidth.configure(limit_kbps=limit_kbps, schedule=parsed)
+        for download_id, weight in weights.items():
+            if download_id in self._options:
+                # Also used if the download is started again (retry, restart)
+                self._options[download_id]['bandwidth_weight'] = weight
+            self.bandwidth.set_weight(download_id, weight)
+        return self.get_bandwidth()
+
     def _generate_id(self):
         """Generate a unique download ID"""
         import uuid
         return str(uuid.uuid4())
 
-    def _merge_audio_video_if_needed(self, download_dir):
+    def _complete_download(self, download_id, download_dir):
+        """Finish a successful download, handing its audio/video pairs to the merge workers first
+
+        The download slot is free as soon as this returns; the download stays
+        'merging' until its files are merged.
+        """
+        download = self.downloads[download_id]
+        if not self._find_merge_pairs(download_dir, download.get('output_files')):
+            self._finish_download(download_id, 'completed', message=self._completed_message(download_id), progress=100)
+            return
+
+        self._update_download(download_id, status='merging', progress=100, merge_progress=0,
+                              message='Waiting to merge audio and video')
+        self.merge_scheduler.submit(download_id, self._merge_worker, download_id, download_dir)
+
+    def _merge_worker(self, download_id, download_dir):
+        """Merge worker: merge a finished download's files and mark it completed"""
+        try:
+            self._update_download(download_id, message='Merging audio and video...')
+            self._merge_outputs(download_id, download_dir)
+        except Exception as e:
+            print(f"Error merging download {download_id}: {e}")
+        self._finish_download(download_id, 'completed', message=self._completed_message(download_id),
+                              progress=100, merge_progress=None)
+
+    def _completed_message(self, download_id):
+        download = self.downloads[download_id]
+        if download.get('type') != 'season':
+            return 'Download completed'
+        if download.get('total_episodes', 0) > 0:
+            completed = download.get('completed_episodes', 0)
+            skipped = download.get('skipped_episodes', 0)
+            return f'Season download completed: {completed} downloaded, {skipped} skipped (already existed)'
+        return 'Season download completed'
+
+    def _merge_outputs(self, download_id, download_dir):
+        """Merge the audio/video pairs this download wrote and point it at the merged files"""
+        download = self.downloads[download_id]
+
+        def on_progress(index, count, percent):
+            overall = round((index + percent / 100) / count * 100, 1)
+            files = f' ({index + 1} of {count})' if count > 1 else ''
+            self._update_download(download_id, merge_progress=overall,
+                                  message=f'Merging audio and video{files}: {percent:.0f}%')
+
+        merged = self._merge_audio_video_if_needed(download_dir, download.get('output_files'), on_progress)
+        if not merged:
+            return
+
+        def merged_name(filename):
+            return merged.get(self._output_path(download_dir, filename)) if filename else None
+
+        if merged_name(download.get('output_file')):
+            self._update_download(download_id, output_file=merged_name(download['output_file']))
+        for number, episode in list(download.get('episodes', {}).items()):
+            if merged_name(episode.get('filename')):
+                self._update_episode(download_id, number, filename=merged_name(episode['filename']))
+
+    def _find_merge_pairs(self, download_dir, output_files=None):
+        """(video_path, audio_path, mkv_path) for each video file with a separate audio file
+
+        Only output_files (the files a job reported writing) are considered,
+        so files other jobs are still writing are left alone. Without them
+        (svtplay-dl reported none) the directory is scanned once.
+        """
+        if output_files:
+            paths = [self._output_path(download_dir, filename) for filename in output_files]
+            exists = os.path.exists
+        else:
+            with os.scandir(download_dir) as entries:
+                paths = [os.path.abspath(entry.path) for entry in entries if entry.is_file()]
+            exists = set(paths).__contains__
+
+        pairs = []
+        for video_path in paths:
+            for video_ext, audio_ext in self.MERGE_PAIRS:
+                if video_path.endswith(video_ext) and not video_path.endswith(self.AUDIO_SUFFIXES):
+                    audio_path = video_path[:-len(video_ext)] + audio_ext
+                    if exists(audio_path):
+                        pairs.append((video_path, audio_path, video_path[:-len(video_ext)] + '.mkv'))
+                    break
+        return pairs
+
+    def _output_path(self, download_dir, filename):
+        """Absolute path of a file svtplay-dl reported writing
+
+        Outfile paths are relative to the working directory (or absolute);
+        only a bare filename is taken to be in download_dir.
+        """
+        if os.path.dirname(filename):
+            return os.path.abspath(filename)
+        return os.path.abspath(os.path.join(download_dir, filename))
+
+    def _merge_audio_video_if_needed(self, download_dir, output_files=None, on_progress=None):
         """Merge separate audio and video files into one .mkv file using FFmpeg
-        Handles both .ts + .audio.ts and .mp4 + .m4a file pairs"""
+        Handles both .ts + .audio.ts and .mp4 + .m4a file pairs.
+
+        See _find_merge_pairs for which files are merged. on_progress(index,
+        count, percent) reports the progress of each pair.
+        Returns {video_path: final_path} for the merged files.
+        """
+        merged = {}
         try:
-            # Pattern 1: Find .ts files (not .audio.ts)
-            video_files = []
-            for filename in os.listdir(download_dir):
-                if filename.endswith('.ts') and not filename.endswith('.audio.ts'):
-                    video_files.append((filename, '.ts', '.audio.ts'))
-                elif filename.endswith('.mp4'):
-                    # Check if there's a corresponding .m4a file
-                    base_name = filename[:-4]  # Remove .mp4
-                    m4a_file = base_name + '.m4a'
-                    if os.path.exists(os.path.join(download_dir, m4a_file)):
-                        video_files.append((filename, '.mp4', '.m4a'))
-
-            # For each video file, merge with corresponding audio file
-            for video_file, video_ext, audio_ext in video_files:
-                video_path = os.path.join(download_dir, video_file)
-                base_name = video_file[:-len(video_ext)]  # Remove video extension
-                audio_file = base_name + audio_ext
-                audio_path = os.path.join(download_dir, audio_file)
-
-                # If both video and audio files exist, merge them
-                if os.path.exists(audio_path):
-                    output_file = base_name + '.mkv'
-                    output_path = os.path.join(download_dir, output_file)
-
-                    print(f"Merging {video_file} + {audio_file} -> {output_file}")
-
-                    # Use FFmpeg to merge
-                    if Config.FFMPEG_PATH:
-                        cmd = [
-                            Config.FFMPEG_PATH,
-                            '-i', video_path,
-                            '-i', audio_path,
-                            '-map', '0:v',  # Explicitly map video from first input
-                            '-map', '1:a',  # Explicitly map audio from second input
-                            '-c', 'copy',  # Copy streams without re-encoding
-                            '-y',  # Overwrite output file
-                            output_path
-                        ]
-
-                        result = subprocess.run(
-                            cmd,
-                            capture_output=True,
-                            text=True,
-                            timeout=300  # 5 minute timeout
-                        )
-
-                        if result.returncode == 0:
-                            # Merge successful, delete original files
-                            print(f"Merge successful, deleting {video_file} and {audio_file}")
-                            os.remove(video_path)
-                            os.remove(audio_path)
-                        else:
-                            print(f"FFmpeg merge failed: {result.stderr}")
-                    else:
-                        print("FFmpeg not available, skipping merge")
+            pairs = self._find_merge_pairs(download_dir, output_files)
+            for index, (video_path, audio_path, output_path) in enumerate(pairs):
+                report = (lambda percent, index=index: on_progress(index, len(pairs), percent)) if on_progress else None
+                final_path = self._merge_pair(video_path, audio_path, output_path, report)
+                if final_path:
+                    merged[video_path] = final_path
 
         except Exception as e:
             print(f"Error during merge: {e}")
+        return merged
+
+    def _merge_lock(self, path):
+        """Lock serializing merges of one output file"""
+        key = os.path.normcase(os.path.abspath(path))
+        with self._merge_locks_guard:
+            return self._merge_locks.setdefault(key, threading.Lock())
+
+    def _merge_pair(self, video_path, audio_path, output_path, on_progress=None):
+        """Merge one video file with its audio file
+
+        Returns the final file: output_path, or video_path when the video
+        already carries the audio. None if it was not merged.
+        """
+        with self._merge_lock(video_path):
+            # Another job may have merged this pair while we waited
+            if not (os.path.exists(video_path) and os.path.exists(audio_path)):
+                if os.path.exists(output_path):
+                    return output_path
+                return video_path if os.path.exists(video_path) else None
+
+            video_file, audio_file = os.path.basename(video_path), os.path.basename(audio_path)
+
+            # Use FFmpeg to merge
+            if not Config.FFMPEG_PATH:
+                print("FFmpeg not available, skipping merge")
+                return None
+
+            # Fast path: nothing to remux when the video file already carries the audio
+            video_info = media_merge.probe(video_path)
+            audio_info = media_merge.probe(audio_path) if video_info else None
+            if not media_merge.needs_merge(video_info, audio_info):
+                print(f"{video_file} needs no merge with {audio_file} (streams: {video_info['streams']}), "
+                      f"deleting the redundant {audio_file}")
+                os.remove(audio_path)
+                return video_path
+
+            print(f"Merging {video_file} + {audio_file} -> {os.path.basename(output_path)}")
+            try:
+                media_merge.merge(video_path, audio_path, output_path,
+                                  duration=video_info['duration'] if video_info else None, on_progress=on_progress)
+            except (OSError, media_merge.MergeError) as e:
+                print(f"FFmpeg merge failed: {e}")
+                # A partial .mkv would make the next attempt think the video is done
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                return None
+
+            # Merge successful, delete original files
+            print(f"Merge successful, deleting {video_file} and {audio_file}")
+            os.remove(video_path)
+            os.remove(audio_path)
+            return output_path
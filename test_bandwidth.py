@@ -0,0 +1,87 @@
+"""Tests for the token bucket, bandwidth schedules and the /api/bandwidth endpoint"""
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+from bandwidth import BandwidthLimiter, TokenBucket, format_schedule, parse_schedule
+from job_store import JobStore
+from svtplay_handler import SVTPlayDownloader
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_sleeps_off_debt():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1000, clock=clock, sleep=clock.sleep)
+
+    assert bucket.consume(500) == 0.5  # Starts empty
+    clock.now += 1.0  # Refills up to the burst (one second of rate)
+    assert bucket.consume(1000) == 0
+    assert bucket.consume(3000) == 3.0  # Larger than the burst - paid for afterwards
+    assert bucket.consumed == 4500
+    assert TokenBucket(rate=0, clock=clock, sleep=clock.sleep).consume(10 ** 9) == 0
+
+
+def test_schedule_windows_and_weights():
+    schedule = parse_schedule('08:00-17:00=4000, 22:00-07:00=0')
+    assert format_schedule(schedule) == '08:00-17:00=4000,22:00-07:00=0'
+    with pytest.raises(ValueError):
+        parse_schedule('8-17=4000')
+
+    now = [datetime(2026, 3, 2, 12, 0)]
+    limiter = BandwidthLimiter(limit_kbps=8000, schedule=schedule, now=lambda: now[0])
+    assert limiter.current_limit() == 4000
+    now[0] = datetime(2026, 3, 2, 3, 0)
+    assert limiter.current_limit() == 0  # Night window wraps midnight
+    now[0] = datetime(2026, 3, 2, 19, 0)
+    assert limiter.current_limit() == 8000
+
+    a = limiter.register('a', weight=1)
+    b = limiter.register('b', weight=3)
+    assert limiter.status()['jobs']['a']['rate_kbps'] == 2000
+    assert limiter.status()['jobs']['b']['rate_kbps'] == 6000
+
+    # The office hours window starts: shares follow with the next read
+    now[0] = datetime(2026, 3, 3, 9, 0)
+    b.consume(0)
+    assert b.bucket.rate == 3000 * 1000 / 8
+    a.close()
+    assert limiter.status()['jobs'] == {'b': {'weight': 3.0, 'rate_kbps': 4000, 'bytes': 0}}
+
+
+@pytest.fixture
+def downloader(monkeypatch):
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'))
+    monkeypatch.setattr(app_module, 'downloader', downloader)
+    yield downloader
+    downloader.scheduler.shutdown()
+    downloader.merge_scheduler.shutdown()
+
+
+def test_bandwidth_endpoint_changes_limits_at_runtime(downloader):
+    downloader.bandwidth.register('d', weight=1)
+    downloader._options['d'] = {}
+    client = app_module.app.test_client()
+
+    response = client.post('/api/bandwidth', json={'limit_kbps': 2000, 'schedule': '', 'weights': {'d': 2}})
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data['current_limit_kbps'] == 2000
+    assert data['jobs']['d']['weight'] == 2.0
+    assert downloader._options['d']['bandwidth_weight'] == 2.0
+
+    response = client.post('/api/bandwidth', json={'schedule': '25:00-26:00=1'})
+    assert response.status_code == 400
+    assert client.get('/api/bandwidth').get_json()['limit_kbps'] == 2000
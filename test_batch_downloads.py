@@ -0,0 +1,127 @@
+"""Tests for batch jobs: bulk creation, aggregate progress and pause/resume/cancel"""
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from config import Config
+from job_store import JobStore
+from profile_manager import ProfileManager
+from svtplay_handler import SVTPlayDownloader
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class CountingStore(JobStore):
+    def __init__(self):
+        super().__init__(':memory:')
+        self.transactions = 0
+
+    def save_many(self, jobs):
+        self.transactions += 1
+        super().save_many(jobs)
+
+
+@pytest.fixture
+def release(monkeypatch):
+    """Downloads block until the event is set"""
+    release = threading.Event()
+
+    def run(self, args, download_id):
+        release.wait(5)
+        return 0, '', []
+
+    monkeypatch.setattr(SVTPlayDownloader, '_run_svtplay_dl', run)
+    return release
+
+
+@pytest.fixture
+def downloader(monkeypatch, tmp_path):
+    downloader = SVTPlayDownloader(store=CountingStore())
+    monkeypatch.setattr(app_module, 'downloader', downloader)
+    monkeypatch.setattr(app_module, 'profile_manager', ProfileManager(str(tmp_path / 'profiles.json')))
+    yield downloader
+    downloader.scheduler.shutdown()
+    downloader.merge_scheduler.shutdown()
+
+
+def urls(count):
+    return [f'https://www.svtplay.se/video/{i}/avsnitt' for i in range(count)]
+
+
+def test_batch_is_created_in_one_transaction_and_rolls_up(downloader, release, tmp_path):
+    before = downloader.store.transactions
+    result = app_module.app.test_client().post('/api/download/batch', json={
+        'urls': urls(200) + urls(1), 'options': {'download_dir': str(tmp_path)}}).get_json()
+    assert downloader.store.transactions == before + 1
+
+    batch = downloader.downloads[result['batch_id']]
+    assert batch['type'] == 'batch' and batch['total_items'] == 200
+    assert result['count'] == 201 and result['duplicate_ids'] == [batch['child_ids'][0]]
+    assert len(downloader.store.load_all()) == 201
+
+    release.set()
+    assert wait_until(lambda: batch['status'] == 'completed')
+    assert batch['progress'] == 100 and batch['completed_items'] == 200
+
+
+def test_pause_resume_and_cancel(downloader, release, tmp_path):
+    batch_id = downloader.start_batch(urls(10), {'download_dir': str(tmp_path)})['batch_id']
+    batch = downloader.downloads[batch_id]
+    children = [downloader.downloads[child_id] for child_id in batch['child_ids']]
+    assert wait_until(lambda: sum(child['status'] == 'downloading' for child in children) == 3)
+
+    paused = downloader.control_download(batch_id, 'pause')
+    assert paused == {'success': True, 'download_id': batch_id, 'status': 'paused', 'affected': 7}
+    assert downloader.scheduler.stats()['queued'] == 0
+
+    # The running items finish; the paused batch waits
+    release.set()
+    assert wait_until(lambda: batch['completed_items'] == 3)
+    time.sleep(0.05)
+    assert batch['status'] == 'paused' and batch['message'].startswith('Paused')
+
+    release.clear()
+    assert downloader.control_download(batch_id, 'resume')['affected'] == 7
+    assert wait_until(lambda: sum(child['status'] == 'downloading' for child in children) == 3)
+
+    # Queued items are cancelled at once, running ones when their run returns
+    response = app_module.app.test_client().post(f'/api/downloads/{batch_id}', json={'action': 'cancel'})
+    assert response.get_json()['affected'] == 7
+    assert batch['status'] == 'downloading' and batch['cancel_requested']
+    assert wait_until(lambda: batch['cancelled_items'] == 4)
+
+    release.set()
+    assert wait_until(lambda: batch['status'] == 'cancelled')
+    assert (batch['completed_items'], batch['cancelled_items']) == (3, 7)
+    assert batch['progress'] == 100
+
+
+def test_history_pruning_keeps_items_of_a_running_batch(downloader, release, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'JOB_HISTORY_LIMIT', 5)
+    batch_id = downloader.start_batch(urls(10), {'download_dir': str(tmp_path)})['batch_id']
+    batch = downloader.downloads[batch_id]
+
+    release.set()
+    assert wait_until(lambda: batch['status'] == 'completed')
+    assert batch['completed_items'] == 10
+    assert batch['message'] == 'Batch finished: 10 downloaded, 0 failed, 0 cancelled'
+
+
+def test_control_errors(downloader, monkeypatch):
+    monkeypatch.setattr(SVTPlayDownloader, '_enqueue', lambda self, download_id, follow_up=False: None)
+    client = app_module.app.test_client()
+    assert client.post('/api/downloads/missing', json={'action': 'pause'}).status_code == 404
+    download_id = downloader.start_download('https://www.svtplay.se/video/1/x', {})['download_id']
+    assert client.post(f'/api/downloads/{download_id}', json={'action': 'explode'}).status_code == 400
+    assert client.post(f'/api/downloads/{download_id}', json={'action': 'resume'}).status_code == 400
+    downloader._finish_download(download_id, 'completed')
+    assert client.delete(f'/api/downloads/{download_id}').status_code == 400
@@ -0,0 +1,169 @@
+"""Tests for download change tracking and the /api/downloads/stream endpoint"""
+import json
+
+import pytest
+
+import app as app_module
+from job_store import JobStore
+from svtplay_handler import SVTPlayDownloader
+
+
+@pytest.fixture
+def downloader():
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'))
+    yield downloader
+    downloader.scheduler.shutdown()
+
+
+def add_download(downloader, download_id, **fields):
+    download = {
+        'id': download_id,
+        'url': f'https://www.svtplay.se/video/{download_id}/test',
+        'status': 'queued',
+        'progress': 0,
+        'message': 'Queued for download',
+        'started_at': '2025-01-01T00:00:00',
+        'finished_at': None,
+        'error': None,
+        'download_dir': '/tmp'
+    }
+    download.update(fields)
+    downloader._create_download(download)
+
+
+def test_first_call_returns_full_snapshot(downloader):
+    add_download(downloader, 'a')
+    add_download(downloader, 'b')
+
+    changes = downloader.get_changes(0)
+
+    assert changes['reset'] is True
+    assert [d['id'] for d in changes['downloads']] == ['a', 'b']
+    assert changes['downloads'][0]['url'].endswith('/a/test')
+
+
+def test_since_cursor_returns_only_changed_fields(downloader):
+    add_download(downloader, 'a')
+    add_download(downloader, 'b')
+    cursor = downloader.get_changes(0)['version']
+
+    downloader._update_download('b', progress=42.0, message='Laddar ner... 42.0%')
+
+    changes = downloader.get_changes(cursor)
+    assert changes['reset'] is False
+    [delta] = changes['downloads']
+    assert delta == {
+        'id': 'b',
+        'version': changes['version'],
+        'progress': 42.0,
+        'message': 'Laddar ner... 42.0%'
+    }
+    assert downloader.get_changes(changes['version'])['downloads'] == []
+
+
+def test_episode_changes_only_include_changed_episodes(downloader):
+    add_download(downloader, 's', type='season')
+    downloader._update_episode('s', 1, status='completed')
+    downloader._update_episode('s', 2, status='processing')
+    cursor = downloader.get_changes(0)['version']
+
+    downloader._update_episode('s', 2, status='downloading', progress=10.0)
+
+    [delta] = downloader.get_changes(cursor)['downloads']
+    assert delta['episodes'] == {'2': {'number': 2, 'status': 'downloading', 'progress': 10.0}}
+    assert 'episodes_reset' not in delta
+
+
+def test_replaced_episode_map_is_marked_as_reset(downloader):
+    add_download(downloader, 's', type='season')
+    downloader._update_episode('s', 1, status='failed')
+    downloader._update_episode('s', 2, status='completed')
+    cursor = downloader.get_changes(0)['version']
+
+    # A serial season retry starts over with an empty map
+    downloader._update_download('s', episodes={})
+    downloader._update_episode('s', 1, status='downloading')
+
+    [delta] = downloader.get_changes(cursor)['downloads']
+    assert delta['episodes'] == {'1': {'number': 1, 'status': 'downloading'}}
+    assert delta['episodes_reset'] is True
+
+
+def test_pruned_downloads_are_reported_as_removed(downloader, monkeypatch):
+    monkeypatch.setattr(app_module.Config, 'JOB_HISTORY_LIMIT', 1)
+    add_download(downloader, 'old', started_at='2025-01-01T00:00:00')
+    add_download(downloader, 'new', started_at='2025-01-02T00:00:00')
+    cursor = downloader.get_changes(0)['version']
+
+    downloader._finish_download('old', 'completed')
+    downloader._finish_download('new', 'completed')
+
+    changes = downloader.get_changes(cursor)
+    assert changes['removed'] == ['old']
+    assert 'old' not in downloader.downloads
+
+
+def test_stream_endpoint_sends_snapshot_event(downloader, monkeypatch):
+    monkeypatch.setattr(app_module, 'downloader', downloader)
+    add_download(downloader, 'a')
+
+    client = app_module.app.test_client()
+    response = client.get('/api/downloads/stream')
+    assert response.mimetype == 'text/event-stream'
+
+    chunks = response.response
+    assert next(chunks).decode().startswith('retry:')
+    event = next(chunks).decode()
+    response.close()
+
+    assert 'event: downloads' in event
+    data = json.loads(event.split('data: ', 1)[1])
+    assert data['reset'] is True
+    assert [d['id'] for d in data['downloads']] == ['a']
+    assert data['queue_positions'] == {}
+
+
+def test_listing_pages_newest_first_with_status_filter(downloader):
+    for i in range(5):
+        add_download(downloader, f'd{i}', status='completed' if i % 2 else 'queued')
+
+    page = downloader.get_all_downloads(limit=2)
+    assert [d['id'] for d in page['downloads']] == ['d4', 'd3']
+    assert page['total'] == 5
+    assert page['next_offset'] == 2
+
+    queued = downloader.get_all_downloads(status=['queued'], limit=2, offset=2)
+    assert [d['id'] for d in queued['downloads']] == ['d0']
+    assert queued['next_offset'] is None
+
+
+def test_listing_since_cursor_pages_through_changed_downloads(downloader):
+    for i in range(4):
+        add_download(downloader, f'd{i}')
+    cursor = downloader.get_changes(0)['version']
+
+    downloader._update_download('d2', status='downloading')
+    downloader._update_download('d0', status='downloading')
+    downloader._update_download('d3', status='failed')
+
+    first = downloader.get_all_downloads(since=cursor, limit=2)
+    assert [d['id'] for d in first['downloads']] == ['d2', 'd0']
+    assert first['downloads'][0]['url'].endswith('/d2/test')
+    assert first['has_more'] is True
+
+    second = downloader.get_all_downloads(since=first['version'], limit=2)
+    assert [d['id'] for d in second['downloads']] == ['d3']
+    assert second['has_more'] is False
+    assert second['version'] == downloader.version
+
+
+def test_downloads_endpoint_passes_filters(downloader, monkeypatch):
+    monkeypatch.setattr(app_module, 'downloader', downloader)
+    add_download(downloader, 'a', status='downloading')
+    add_download(downloader, 'b', status='completed')
+
+    client = app_module.app.test_client()
+    body = client.get('/api/downloads?status=downloading,queued&limit=10').get_json()
+
+    assert body['success'] is True
+    assert [d['id'] for d in body['downloads']] == ['a']
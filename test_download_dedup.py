@@ -0,0 +1,89 @@
+"""Tests for attaching duplicate and repeated download submissions to existing jobs"""
+import pytest
+
+import app as app_module
+from job_store import JobStore
+from profile_manager import ProfileManager
+from svtplay_handler import SVTPlayDownloader
+
+
+@pytest.fixture
+def downloader(monkeypatch, tmp_path):
+    # Nothing runs - submitted downloads stay queued
+    monkeypatch.setattr(SVTPlayDownloader, '_enqueue', lambda self, download_id, follow_up=False: None)
+    monkeypatch.setattr(SVTPlayDownloader, '_enqueue_many', lambda self, download_ids: None)
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'))
+    monkeypatch.setattr(app_module, 'downloader', downloader)
+    monkeypatch.setattr(app_module, 'profile_manager', ProfileManager(str(tmp_path / 'profiles.json')))
+    yield downloader
+    downloader.scheduler.shutdown()
+    downloader.merge_scheduler.shutdown()
+
+
+def test_same_video_quality_and_folder_attach_to_the_queued_job(downloader, tmp_path):
+    options = {'download_dir': str(tmp_path), 'quality': '720p'}
+    first = downloader.start_download('https://www.svtplay.se/video/abc/agenda', options)
+    again = downloader.start_download('http://WWW.svtplay.se/video/abc/agenda/', {'download_dir': str(tmp_path) + '/',
+                                                                                 'quality': '720'})
+    assert again == {'success': True, 'download_id': first['download_id'], 'duplicate': True}
+
+    other_quality = downloader.start_download('https://www.svtplay.se/video/abc/agenda', {'download_dir': str(tmp_path)})
+    other_folder = downloader.start_download('https://www.svtplay.se/video/abc/agenda',
+                                             {'download_dir': str(tmp_path / 'other'), 'quality': '720'})
+    season = downloader.download_season('https://www.svtplay.se/video/abc/agenda', options)
+    assert len({first['download_id'], other_quality['download_id'], other_folder['download_id'],
+                season['download_id']}) == 4
+    assert not any(r.get('duplicate') for r in (other_quality, other_folder, season))
+
+
+def test_finished_jobs_attach_only_while_the_file_is_on_disk(downloader, tmp_path):
+    url = 'https://www.svtplay.se/video/abc/agenda'
+    output = tmp_path / 'Agenda.mkv'
+    output.write_bytes(b'mkv')
+    first = downloader.start_download(url, {'download_dir': str(tmp_path)})['download_id']
+    downloader._finish_download(first, 'completed', output_file=str(output), progress=100)
+
+    assert downloader.start_download(url, {'download_dir': str(tmp_path)})['download_id'] == first
+
+    output.unlink()
+    second = downloader.start_download(url, {'download_dir': str(tmp_path)})
+    assert second['download_id'] != first and 'duplicate' not in second
+
+    downloader._finish_download(second['download_id'], 'failed', error='boom')
+    third = downloader.start_download(url, {'download_dir': str(tmp_path)})
+    assert third['download_id'] != second['download_id']
+
+    downloader._finish_download(third['download_id'], 'cancelled', message='Cancelled')
+    fourth = downloader.start_download(url, {'download_dir': str(tmp_path)})
+    assert fourth['download_id'] != third['download_id'] and 'duplicate' not in fourth
+
+
+def test_batch_with_idempotency_key_is_submitted_once(downloader, tmp_path):
+    client = app_module.app.test_client()
+    body = {'urls': ['https://www.svtplay.se/video/a/x', 'https://www.svtplay.se/video/b/y'],
+            'options': {'download_dir': str(tmp_path)}}
+
+    first = client.post('/api/download/batch', json=body, headers={'Idempotency-Key': 'k1'}).get_json()
+    assert first['duplicate_ids'] == []
+    # The first job failed, so only the idempotency key ties the retry to it
+    downloader._finish_download(first['download_ids'][0], 'failed', error='boom')
+    retried = client.post('/api/download/batch', json=body, headers={'Idempotency-Key': 'k1'}).get_json()
+
+    assert retried['batch_id'] == first['batch_id']
+    assert retried['download_ids'] == first['download_ids']
+    assert retried['duplicate_ids'] == first['download_ids']
+    assert len(downloader.downloads) == 3  # The batch and its two videos
+
+
+def test_indexes_are_rebuilt_after_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(SVTPlayDownloader, '_enqueue', lambda self, download_id, follow_up=False: None)
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    downloader = SVTPlayDownloader(store=store)
+    first = downloader.start_download('https://www.svtplay.se/video/a/x', {'download_dir': str(tmp_path)},
+                                      idempotency_key='k2')['download_id']
+    downloader.scheduler.shutdown()
+
+    restarted = SVTPlayDownloader(store=store)
+    assert restarted.start_download('https://www.svtplay.se/video/a/x', {'download_dir': str(tmp_path)})['download_id'] == first
+    assert restarted.start_download('https://www.svtplay.se/video/c/z', {}, idempotency_key='k2')['download_id'] == first
+    restarted.scheduler.shutdown()
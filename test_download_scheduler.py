@@ -0,0 +1,83 @@
+"""Tests for the bounded download worker pool"""
+import threading
+import time
+
+from download_scheduler import DownloadScheduler
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_scheduler_never_exceeds_max_workers():
+    scheduler = DownloadScheduler(2)
+    release = threading.Event()
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+    finished = []
+
+    def job(job_id):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        release.wait(timeout=2)
+        with lock:
+            running[0] -= 1
+            finished.append(job_id)
+
+    for i in range(6):
+        scheduler.submit(f'job-{i}', job, f'job-{i}')
+
+    assert wait_until(lambda: scheduler.stats()['running'] == 2)
+    assert scheduler.stats() == {'queued': 4, 'running': 2, 'max_concurrent': 2}
+
+    release.set()
+    assert wait_until(lambda: len(finished) == 6)
+    assert peak[0] == 2
+    scheduler.shutdown()
+
+
+def test_scheduler_runs_lower_priority_value_first_and_reports_positions():
+    scheduler = DownloadScheduler(1)
+    release = threading.Event()
+    order = []
+
+    scheduler.submit('blocker', release.wait, 2)
+    assert wait_until(lambda: scheduler.is_running('blocker'))
+
+    scheduler.submit('normal-1', order.append, 'normal-1')
+    scheduler.submit('normal-2', order.append, 'normal-2')
+    scheduler.submit('urgent', order.append, 'urgent', priority=-1)
+
+    assert scheduler.positions() == {'urgent': 1, 'normal-1': 2, 'normal-2': 3}
+    assert scheduler.position('blocker') is None
+
+    release.set()
+    assert wait_until(lambda: len(order) == 3)
+    assert order == ['urgent', 'normal-1', 'normal-2']
+    scheduler.shutdown()
+
+
+def test_scheduler_cancel_removes_queued_job():
+    scheduler = DownloadScheduler(1)
+    release = threading.Event()
+    ran = []
+
+    scheduler.submit('blocker', release.wait, 2)
+    assert wait_until(lambda: scheduler.is_running('blocker'))
+    scheduler.submit('victim', ran.append, 'victim')
+    scheduler.submit('survivor', ran.append, 'survivor')
+
+    assert scheduler.cancel('victim') is True
+    assert scheduler.cancel('victim') is False
+    assert scheduler.positions() == {'survivor': 1}
+
+    release.set()
+    assert wait_until(lambda: ran == ['survivor'])
+    scheduler.shutdown()
@@ -0,0 +1,70 @@
+"""Tests for the warm svtplay-dl worker process pool"""
+import os
+
+import pytest
+
+import download_workers
+from config import Config
+from download_workers import EXIT, LOG, PROGRESS, STARTED, DownloadWorkerPool
+from job_store import JobStore
+from svtplay_handler import SVTPlayDownloader
+
+
+def fake_svtplay_dl(args, send):
+    """Stands in for svtplay_dl.main() in the workers: reports like svtplay-dl would"""
+    if args[0] == 'crash':
+        os._exit(3)
+    send(LOG, {'message': f'INFO: Url: {args[-1]}'})
+    send(LOG, {'message': f"INFO: Outfile: /dl/{args[-1].rsplit('/', 1)[1]}.ts"})
+    for pos in (1, 5, 10):
+        send(PROGRESS, {'pos': pos, 'total': 10})
+    print(f"stdout of {os.environ.get('WORKER_TEST', '')}")
+    return 0, 'done'
+
+
+@pytest.fixture
+def pool():
+    pool = DownloadWorkerPool(1, runner=fake_svtplay_dl)
+    yield pool
+    pool.close()
+
+
+def test_job_reports_structured_events_and_worker_stays_warm(pool):
+    events = list(pool.run('a', ['https://www.svtplay.se/video/x/avsnitt-1'], env=dict(os.environ, WORKER_TEST='a')))
+    assert [kind for kind, data in events] == [STARTED, LOG, LOG, PROGRESS, PROGRESS, PROGRESS, EXIT]
+    assert events[-1][1] == {'returncode': 0, 'stdout': 'done'}
+    assert events[3][1] == {'pos': 1, 'total': 10}
+
+    # The next job runs on the same already started process
+    second = list(pool.run('b', ['https://www.svtplay.se/video/x/avsnitt-2']))
+    assert second[0][1]['pid'] == events[0][1]['pid']
+
+
+def test_crashed_worker_fails_its_job_and_is_replaced(pool):
+    events = list(pool.run('a', ['crash']))
+    assert events[-2] == (LOG, {'message': 'ERROR: Download worker exited unexpectedly (3)'})
+    assert events[-1] == (EXIT, {'returncode': -1, 'stdout': ''})
+
+    assert list(pool.run('b', ['https://www.svtplay.se/video/x/y']))[-1][1]['returncode'] == 0
+
+
+def test_download_runs_on_worker_pool(pool, monkeypatch):
+    monkeypatch.setattr(Config, 'PROGRESS_UPDATE_INTERVAL', 0)
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'), worker_pool=pool)
+    downloader._create_download({'id': 'd', 'url': 'https://www.svtplay.se/video/x/avsnitt-1',
+                                 'status': 'downloading', 'progress': 0, 'message': ''})
+
+    returncode, stdout, log_lines = downloader._run_svtplay_dl(['https://www.svtplay.se/video/x/avsnitt-1'], 'd')
+    assert (returncode, stdout) == (0, 'done')
+    assert downloader.downloads['d']['output_file'] == '/dl/avsnitt-1.ts'
+    assert downloader.downloads['d']['progress'] == 99
+    assert 'INFO: Url: https://www.svtplay.se/video/x/avsnitt-1' in log_lines
+    downloader.scheduler.shutdown()
+
+
+def test_subprocess_backend_or_missing_svtplay_dl_means_no_pool(monkeypatch):
+    assert download_workers.create_worker_pool('subprocess', 2) is None
+    monkeypatch.setattr(download_workers, 'svtplay_dl_available', lambda: False)
+    assert download_workers.create_worker_pool('workers', 2) is None
+    monkeypatch.setattr(download_workers, 'svtplay_dl_available', lambda: True)
+    assert download_workers.create_worker_pool('workers', 2).size == 2
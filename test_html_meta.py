@@ -0,0 +1,45 @@
+"""Tests for the streaming og:image scanner"""
+from html_meta import parse_full_page, scan_head
+
+HEAD = (b'<!DOCTYPE html><html lang="sv"><head><meta charset="utf-8">'
+        b'<title>N\xc3\xa4r lammen tystnar | SVT Play</title>'
+        b'<script>window.x = 1 < 2;</script>'
+        b'<meta name="twitter:image" content="https://www.svtstatic.se/image/twitter.jpg">'
+        b'<meta data-rh="true" property="og:image" '
+        b'content="https://www.svtstatic.se/image/wide/992/12345.jpg?format=auto&amp;quality=70"/>'
+        b'</head>')
+BODY = b'<body>' + b'<div class="card"><img src="https://www.svtstatic.se/image/x.jpg"></div>' * 5000 + b'</body></html>'
+
+
+def chunked(data, size, consumed):
+    for start in range(0, len(data), size):
+        consumed.append(size)
+        yield data[start:start + size]
+
+
+def test_finds_og_image_split_across_chunks_without_reading_the_body():
+    page = HEAD + BODY
+    for size in (7, 64, 16384):
+        consumed = []
+        image, data = scan_head(chunked(page, size, consumed))
+        assert image == 'https://www.svtstatic.se/image/wide/992/12345.jpg?format=auto&quality=70'
+        assert sum(consumed) < len(HEAD) + size
+
+
+def test_prefers_og_image_and_falls_back_to_twitter_image():
+    page = (b"<head><meta content='https://img/tw.jpg' name='twitter:image'>"
+            b"<meta property=og:image content=https://img/og.jpg></head>")
+    assert scan_head(iter([page]))[0] == 'https://img/og.jpg'
+
+    page = b"<head><meta name='twitter:image' content='https://img/tw.jpg'></head><body>"
+    assert scan_head(iter([page]))[0] == 'https://img/tw.jpg'
+
+
+def test_unclosed_head_is_scanned_to_the_end():
+    assert scan_head(iter([b'<meta property="og:image"', b' content="https://img/og.jpg">']))[0] == 'https://img/og.jpg'
+
+
+def test_returns_data_read_for_the_full_parse_fallback():
+    image, data = scan_head(iter([b'<html><head></head>', BODY]), max_bytes=1024)
+    assert image is None
+    assert parse_full_page((data + BODY).decode()) == 'https://www.svtstatic.se/image/x.jpg'
@@ -0,0 +1,119 @@
+"""Tests for the pooled scraping HTTP client against a local stub server"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+from http_client import HttpClient
+from job_store import JobStore
+from svtplay_handler import SVTPlayDownloader
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.peers.add(self.client_address)
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            fail = server.failures.get(self.path, 0)
+            if fail:
+                server.failures[self.path] = fail - 1
+
+        time.sleep(server.delay)
+        if fail:
+            body, status, content_type = b'busy', 503, 'text/plain'
+        elif self.path.startswith('/img/'):
+            body, status, content_type = self.path.encode(), 200, 'image/jpeg'
+        else:
+            slug = self.path.rstrip('/').rsplit('/', 1)[1]
+            body = f'<html><head><meta property="og:image" content="https://images.svt.se/img/{slug}.jpg"></head></html>'.encode()
+            status, content_type = 200, 'text/html'
+
+        with server.lock:
+            server.active -= 1
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = []
+    server.peers = set()
+    server.active = 0
+    server.peak = 0
+    server.delay = 0
+    server.failures = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(server, **kwargs):
+    overrides = {'www.svtplay.se': server.base_url, 'images.svt.se': server.base_url}
+    return HttpClient(host_overrides=overrides, backoff=0, **kwargs)
+
+
+def test_sequential_requests_reuse_one_connection(stub_server):
+    client = make_client(stub_server)
+    for i in range(5):
+        assert client.get(f'https://www.svtplay.se/video/id{i}/avsnitt').status_code == 200
+
+    assert len(stub_server.requests) == 5
+    assert len(stub_server.peers) == 1
+    client.close()
+
+
+def test_retries_server_errors(stub_server):
+    stub_server.failures['/video/flaky/avsnitt'] = 2
+    client = make_client(stub_server, retries=2)
+
+    response = client.get('https://www.svtplay.se/video/flaky/avsnitt')
+    assert response.status_code == 200
+    assert stub_server.requests.count('/video/flaky/avsnitt') == 3
+    client.close()
+
+
+def test_limits_concurrent_requests_per_host(stub_server):
+    stub_server.delay = 0.05
+    client = make_client(stub_server, pool_size=8, per_host_limit=2)
+
+    threads = [threading.Thread(target=client.get, args=(f'https://www.svtplay.se/video/id{i}/avsnitt',))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert stub_server.peak == 2
+    client.close()
+
+
+def test_scrape_thumbnails_through_stub_server(stub_server, tmp_path, monkeypatch):
+    from thumbnail_store import ThumbnailStore
+
+    monkeypatch.setattr(http_client, '_client', make_client(stub_server))
+    urls = [f'https://www.svtplay.se/video/id{i}/avsnitt-{i}' for i in range(20)]
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'), thumbnails=ThumbnailStore(str(tmp_path), 1024 * 1024))
+
+    videos = downloader._collect_video_metadata(urls)
+    assert {url: video['thumbnail'] for url, video in videos.items()} == {url: f'/thumbs/id{i}' for i, url in enumerate(urls)}
+    assert len(stub_server.requests) == 20  # Images are only downloaded when first served
+    assert len(stub_server.peers) <= 10
+    downloader.scheduler.shutdown()
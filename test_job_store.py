@@ -0,0 +1,81 @@
+"""Tests for the SQLite download job store and crash recovery"""
+import threading
+
+import pytest
+
+from job_store import JobStore
+from svtplay_handler import SVTPlayDownloader
+
+
+def make_job(job_id, status='queued', started_at='2025-01-01T00:00:00'):
+    return {
+        'id': job_id,
+        'url': f'https://www.svtplay.se/video/{job_id}/test',
+        'status': status,
+        'progress': 0,
+        'message': '',
+        'started_at': started_at,
+        'finished_at': None,
+        'error': None,
+        'download_dir': '/tmp'
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    yield store
+    store.close()
+
+
+def test_store_round_trips_jobs_and_keeps_options_on_update(store):
+    store.save(make_job('a'), {'quality': '720', 'token': 'secret'})
+    job = make_job('a', status='downloading')
+    store.save(job)
+
+    [(loaded, options)] = store.load_all()
+    assert loaded['status'] == 'downloading'
+    assert options == {'quality': '720', 'token': 'secret'}
+
+
+def test_store_prune_keeps_newest_finished_and_all_unfinished(store):
+    store.save(make_job('old', 'completed', '2025-01-01T00:00:00'))
+    store.save(make_job('mid', 'failed', '2025-01-02T00:00:00'))
+    store.save(make_job('new', 'completed', '2025-01-03T00:00:00'))
+    store.save(make_job('pending', 'queued', '2024-12-31T00:00:00'))
+
+    assert sorted(store.prune(1)) == ['mid', 'old']
+    assert [job['id'] for job, _ in store.load_all()] == ['pending', 'new']
+
+
+def test_store_prune_keeps_items_of_unfinished_parents(store):
+    store.save(make_job('batch', 'downloading'))
+    store.save(make_job('done-batch', 'completed'))
+    for job_id, parent_id in (('item', 'batch'), ('done-item', 'done-batch')):
+        store.save(dict(make_job(job_id, 'completed', '2025-01-02T00:00:00'), parent_id=parent_id))
+
+    assert sorted(store.prune(0)) == ['done-batch', 'done-item']
+    assert sorted(job['id'] for job, _ in store.load_all()) == ['batch', 'item']
+
+
+def test_downloader_requeues_interrupted_jobs_on_startup(store, monkeypatch):
+    store.save(make_job('done', 'completed'), {})
+    store.save(make_job('running', 'downloading'), {'quality': '720'})
+    store.save(make_job('waiting', 'queued'), {})
+
+    started = {}
+    finished = threading.Event()
+
+    def fake_worker(self, download_id, url, options):
+        started[download_id] = options
+        if len(started) == 2:
+            finished.set()
+
+    monkeypatch.setattr(SVTPlayDownloader, '_download_worker', fake_worker)
+    downloader = SVTPlayDownloader(store=store)
+
+    assert finished.wait(timeout=2)
+    assert started == {'running': {'quality': '720'}, 'waiting': {}}
+    assert downloader.downloads['done']['status'] == 'completed'
+    assert downloader.downloads['running']['message'] == 'Resumed after restart'
+    downloader.scheduler.shutdown()
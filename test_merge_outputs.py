@@ -0,0 +1,185 @@
+"""Tests for merging only the audio/video files a download reported writing"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+import media_merge
+from config import Config
+from job_store import JobStore
+from output_parser import OUTFILE, OutputEvent
+from svtplay_handler import SVTPlayDownloader
+
+
+class FakeFfmpeg:
+    """Stands in for media_merge.merge: writes the output file"""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.merged = []
+
+    def __call__(self, video_path, audio_path, output_path, duration=None, on_progress=None):
+        time.sleep(self.delay)
+        self.merged.append(os.path.basename(video_path))
+        with open(output_path, 'wb') as f:
+            f.write(b'mkv')
+
+
+@pytest.fixture
+def downloader(monkeypatch):
+    monkeypatch.setattr(Config, 'FFMPEG_PATH', 'ffmpeg')
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'))
+    yield downloader
+    downloader.scheduler.shutdown()
+    downloader.merge_scheduler.shutdown()
+
+
+def touch(directory, *names):
+    for name in names:
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(b'data')
+
+
+def test_only_this_jobs_outputs_are_merged(downloader, tmp_path, monkeypatch):
+    ffmpeg = FakeFfmpeg()
+    monkeypatch.setattr(media_merge, 'merge', ffmpeg)
+    # Another job's pair, still being written, and plenty of unrelated files
+    touch(tmp_path, 'Other.ts', 'Other.audio.ts', *[f'Old {i}.mkv' for i in range(50)])
+    touch(tmp_path, 'Agenda.ts', 'Agenda.audio.ts')
+
+    downloader._create_download({'id': 'd', 'url': 'https://www.svtplay.se/video/x/agenda', 'status': 'downloading',
+                                 'progress': 0, 'message': ''})
+    throttle = {'last_update': 0.0}
+    for name in ('Agenda.ts', 'Agenda.audio.ts'):
+        downloader._handle_output_event('d', OutputEvent(OUTFILE, None, {'filename': str(tmp_path / name)}), throttle)
+    assert downloader.downloads['d']['output_file'] == str(tmp_path / 'Agenda.ts')  # Not the audio track
+
+    downloader._merge_outputs('d', str(tmp_path))
+
+    assert ffmpeg.merged == ['Agenda.ts']
+    assert downloader.downloads['d']['output_file'] == str(tmp_path / 'Agenda.mkv')
+    assert os.path.exists(tmp_path / 'Other.ts') and os.path.exists(tmp_path / 'Other.audio.ts')
+    assert not os.path.exists(tmp_path / 'Agenda.audio.ts')
+
+
+def test_reported_paths_are_relative_to_the_working_directory(downloader, tmp_path, monkeypatch):
+    monkeypatch.setattr(media_merge, 'merge', FakeFfmpeg())
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('downloads')
+    touch('downloads', 'A.ts', 'A.audio.ts')
+
+    # svtplay-dl -o downloads reports downloads/A.ts, not A.ts
+    downloader._create_download({'id': 'd', 'url': 'https://www.svtplay.se/video/x/a', 'status': 'downloading',
+                                 'progress': 0, 'message': '', 'output_file': 'downloads/A.ts',
+                                 'output_files': ['downloads/A.ts', 'downloads/A.audio.ts']})
+    downloader._merge_outputs('d', 'downloads')
+
+    assert downloader.downloads['d']['output_file'] == str(tmp_path / 'downloads' / 'A.mkv')
+    assert sorted(os.listdir('downloads')) == ['A.mkv']
+
+
+def test_directory_is_scanned_when_no_outputs_were_reported(downloader, tmp_path, monkeypatch):
+    ffmpeg = FakeFfmpeg()
+    monkeypatch.setattr(media_merge, 'merge', ffmpeg)
+    touch(tmp_path, 'A.ts', 'A.audio.ts', 'B.mp4', 'B.m4a', 'C.ts')
+
+    merged = downloader._merge_audio_video_if_needed(str(tmp_path))
+    assert sorted(ffmpeg.merged) == ['A.ts', 'B.mp4']
+    assert merged == {str(tmp_path / 'A.ts'): str(tmp_path / 'A.mkv'), str(tmp_path / 'B.mp4'): str(tmp_path / 'B.mkv')}
+
+
+def test_concurrent_merges_of_one_file_run_once(downloader, tmp_path, monkeypatch):
+    ffmpeg = FakeFfmpeg(delay=0.1)
+    monkeypatch.setattr(media_merge, 'merge', ffmpeg)
+    touch(tmp_path, 'A.ts', 'A.audio.ts')
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        downloader._merge_audio_video_if_needed(str(tmp_path), ['A.ts', 'A.audio.ts']))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert ffmpeg.merged == ['A.ts']
+    assert results == [{str(tmp_path / 'A.ts'): str(tmp_path / 'A.mkv')}] * 2
+    assert len(downloader._merge_locks) == 0  # Locks do not outlive their merges
+
+
+def wait_until(predicate, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_merge_runs_after_the_download_slot_is_released(downloader, tmp_path, monkeypatch):
+    release = threading.Event()
+    ffmpeg = FakeFfmpeg()
+    monkeypatch.setattr(media_merge, 'merge', lambda *args, **kwargs: release.wait(3) and ffmpeg(*args, **kwargs))
+
+    def run(self, args, download_id):
+        touch(tmp_path, 'Agenda.ts', 'Agenda.audio.ts')
+        for name in ('Agenda.ts', 'Agenda.audio.ts'):
+            self._handle_output_event(download_id, OutputEvent(OUTFILE, None, {'filename': str(tmp_path / name)}),
+                                      {'last_update': 0.0})
+        return 0, '', []
+
+    monkeypatch.setattr(SVTPlayDownloader, '_run_svtplay_dl', run)
+    download_id = downloader.start_download('https://www.svtplay.se/video/x/agenda',
+                                            {'download_dir': str(tmp_path)})['download_id']
+    download = downloader.downloads[download_id]
+
+    assert wait_until(lambda: download['status'] == 'merging' and downloader.merge_scheduler.is_running(download_id))
+    assert wait_until(lambda: not downloader.scheduler.is_running(download_id))
+    release.set()
+    assert wait_until(lambda: download['status'] == 'completed')
+    assert download['output_file'] == str(tmp_path / 'Agenda.mkv')
+    assert download['merge_progress'] is None
+
+
+def test_already_muxed_video_is_not_remuxed(downloader, tmp_path, monkeypatch):
+    ffmpeg = FakeFfmpeg()
+    monkeypatch.setattr(media_merge, 'merge', ffmpeg)
+    monkeypatch.setattr(media_merge, 'probe', lambda path: {
+        'streams': ['audio'] if path.endswith('.audio.ts') else ['video', 'audio'], 'duration': 60.0})
+    touch(tmp_path, 'A.ts', 'A.audio.ts')
+
+    video = str(tmp_path / 'A.ts')
+    assert downloader._merge_audio_video_if_needed(str(tmp_path), ['A.ts', 'A.audio.ts']) == {video: video}
+    assert ffmpeg.merged == []
+    # The redundant audio file is gone, so later scans do not probe the pair again
+    assert os.listdir(tmp_path) == ['A.ts']
+    assert downloader._find_merge_pairs(str(tmp_path)) == []
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """An ffmpeg stand-in reporting -progress output; it hangs when the output name contains 'stall'"""
+    script = tmp_path / 'ffmpeg'
+    script.write_text(f'#!{sys.executable}\n'
+                      'import sys, time\n'
+                      'output = sys.argv[-1]\n'
+                      'print("out_time_us=30000000\\nprogress=continue", flush=True)\n'
+                      'if "stall" in output:\n'
+                      '    time.sleep(30)\n'
+                      'open(output, "wb").write(b"mkv")\n'
+                      'print("out_time_us=60000000\\nprogress=end", flush=True)\n')
+    script.chmod(0o755)
+    monkeypatch.setattr(Config, 'FFMPEG_PATH', str(script))
+
+
+def test_merge_reports_progress_and_stops_a_stalled_ffmpeg(fake_ffmpeg, tmp_path):
+    progress = []
+    media_merge.merge('a.ts', 'a.audio.ts', str(tmp_path / 'a.mkv'), duration=60.0, on_progress=progress.append)
+    assert progress == [50.0, 99.0, 100.0]
+    assert os.path.exists(tmp_path / 'a.mkv')
+
+    started = time.monotonic()
+    with pytest.raises(media_merge.MergeError):
+        media_merge.merge('b.ts', 'b.audio.ts', str(tmp_path / 'stall.mkv'), stall_timeout=0.3)
+    assert time.monotonic() - started < 5
@@ -0,0 +1,105 @@
+"""Tests for the episode list / video info cache"""
+import threading
+import time
+
+from job_store import JobStore
+from metadata_cache import MetadataCache, make_key, normalize_url
+from svtplay_handler import SVTPlayDownloader
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_url_and_token_fingerprint():
+    assert normalize_url('http://WWW.svtplay.se/serie/?b=2&a=1#top') == 'https://www.svtplay.se/serie?a=1&b=2'
+    assert normalize_url('https://www.svtplay.se/serie') == normalize_url('https://www.svtplay.se/serie/')
+
+    key = make_key('episodes', 'https://www.tv4play.se/serie', 'secret-token')
+    assert 'secret-token' not in key
+    assert key != make_key('episodes', 'https://www.tv4play.se/serie')
+    assert key != make_key('info', 'https://www.tv4play.se/serie', 'secret-token')
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = MetadataCache(ttl=60, max_entries=10, clock=clock)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {'success': True, 'n': len(calls)}
+
+    assert cache.get_or_load('k', loader)['n'] == 1
+    clock.now += 59
+    assert cache.get_or_load('k', loader)['n'] == 1
+    clock.now += 2
+    assert cache.get_or_load('k', loader)['n'] == 2
+
+
+def test_lru_eviction_and_uncacheable_results():
+    cache = MetadataCache(ttl=60, max_entries=2, cacheable=lambda r: r.get('success'))
+    cache.put('a', {'success': True})
+    cache.put('b', {'success': True})
+    cache.get('a')
+    cache.put('c', {'success': True})
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+
+    cache.get_or_load('failed', lambda: {'success': False})
+    assert cache.get('failed') is None
+
+
+def test_concurrent_misses_share_one_load():
+    cache = MetadataCache(ttl=60, max_entries=10)
+    calls = []
+    started = threading.Event()
+
+    def slow_loader():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return {'success': True}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('k', slow_loader)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 8 and all(r is results[0] for r in results)
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / 'metadata_cache.json')
+    clock = FakeClock()
+    MetadataCache(ttl=60, max_entries=10, path=path, clock=clock).put('k', {'success': True, 'episodes': ['x']})
+
+    assert MetadataCache(ttl=60, max_entries=10, path=path, clock=clock).get('k') == {'success': True, 'episodes': ['x']}
+    clock.now += 120
+    assert MetadataCache(ttl=60, max_entries=10, path=path, clock=clock).get('k') is None
+
+
+def test_list_episodes_runs_svtplay_dl_once_per_url(monkeypatch):
+    calls = []
+
+    def fake_fetch(self, url, token=None):
+        calls.append(url)
+        return {'success': True, 'episodes': [url + '/avsnitt-1'], 'count': 1}
+
+    monkeypatch.setattr(SVTPlayDownloader, '_fetch_episodes', fake_fetch)
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'))
+
+    downloader.list_episodes('https://www.svtplay.se/serie')
+    downloader.list_episodes('https://www.svtplay.se/serie/')
+    assert len(calls) == 1
+    downloader.list_episodes('https://www.svtplay.se/serie', token='abc')
+    assert len(calls) == 2
+    downloader.scheduler.shutdown()
@@ -0,0 +1,99 @@
+"""Tests for the svtplay-dl output parser"""
+import os
+import threading
+
+import pytest
+
+from config import Config
+from job_store import JobStore
+from output_parser import PROGRESS, OutputParser, iter_output_lines
+from svtplay_handler import SVTPlayDownloader
+
+
+SEASON_TRANSCRIPT = (
+    'INFO: Episode 1 of 2\n'
+    'INFO: Url: https://www.svtplay.se/video/aaa/avsnitt-1\n'
+    'WARNING: File (/dl/Avsnitt 1.ts) already exists. Use --force to overwrite\n'
+    'INFO: Episode 2 of 2\n'
+    'INFO: Url: https://www.svtplay.se/video/bbb/avsnitt-2\n'
+    'INFO: Outfile: /dl/Avsnitt 2.ts\n'
+    '\r[01/10][=.........] ETA: 0:00:09'
+    '\r[10/10][==========] ETA: 0:00:00\n'
+    'ERROR: Something odd happened\n'
+)
+
+
+def pipe_stream(data):
+    """Return a binary stream that yields data, written from another thread"""
+    read_fd, write_fd = os.pipe()
+
+    def writer():
+        with os.fdopen(write_fd, 'wb') as f:
+            f.write(data)
+
+    threading.Thread(target=writer, daemon=True).start()
+    return os.fdopen(read_fd, 'rb')
+
+
+def read_lines(data, chunk_size):
+    with pipe_stream(data) as stream:
+        return list(iter_output_lines(stream, chunk_size=chunk_size))
+
+
+def test_splits_on_carriage_return_and_newline_across_chunks():
+    data = 'INFO: Outfile: När lammen tystnar.ts\n\r[1/3][=..]\r[2/3][==.]\r[3/3][===]\nklar'.encode('utf-8')
+
+    for chunk_size in (1, 3, 7, 65536):
+        assert read_lines(data, chunk_size) == [
+            'INFO: Outfile: När lammen tystnar.ts',
+            '[1/3][=..]',
+            '[2/3][==.]',
+            '[3/3][===]',
+            'klar'
+        ]
+
+
+def test_progress_lines_become_progress_events():
+    [event] = OutputParser().feed('[012/120][=====.....] ETA: 0:01:30')
+    assert event.kind == PROGRESS
+    assert event.data == {'pos': 12, 'total': 120, 'percent': 10.0}
+    assert PROGRESS not in [e.kind for e in OutputParser().feed('INFO: Episode 1 of 5')]
+
+
+def test_parser_emits_typed_events_with_episode_numbers():
+    parser = OutputParser()
+    events = []
+    for line in SEASON_TRANSCRIPT.replace('\r', '\n').split('\n'):
+        events.extend((e.kind, e.episode) for e in parser.feed(line) if e.kind != 'log')
+
+    assert events == [
+        ('episode_start', 1), ('url', 1), ('skipped', 1),
+        ('episode_start', 2), ('url', 2), ('outfile', 2),
+        ('progress', 2), ('progress', 2), ('error', 2)
+    ]
+
+
+@pytest.fixture
+def downloader():
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'))
+    yield downloader
+    downloader.scheduler.shutdown()
+
+
+def test_season_output_updates_episodes_and_overall_progress(downloader, monkeypatch):
+    monkeypatch.setattr(Config, 'PROGRESS_UPDATE_INTERVAL', 0)
+    downloader._create_download({'id': 's', 'url': 'https://www.svtplay.se/serie', 'status': 'downloading',
+                                 'progress': 0, 'message': '', 'type': 'season'})
+
+    with pipe_stream(SEASON_TRANSCRIPT.encode('utf-8')) as stream:
+        log_lines = downloader._consume_output(stream, 's')
+
+    download = downloader.downloads['s']
+    assert download['episodes']['1']['status'] == 'skipped'
+    assert download['episodes']['2']['status'] == 'completed'
+    assert download['episodes']['2']['filename'] == '/dl/Avsnitt 2.ts'
+    assert download['skipped_episodes'] == 1
+    assert download['completed_episodes'] == 1
+    assert download['progress'] == 99
+    assert 'ERROR: Something odd happened' in log_lines
+    assert not any(line.startswith('[') for line in log_lines)
@@ -0,0 +1,213 @@
+"""Tests for per-episode parallel season downloads"""
+import threading
+import time
+
+import pytest
+
+import retry_policy
+from config import Config
+from job_store import JobStore
+from retry_policy import RetryPolicy, RetryRule
+from svtplay_handler import SVTPlayDownloader
+
+EPISODES = [f'https://www.svtplay.se/video/ep{i}/avsnitt-{i}' for i in range(1, 6)]
+
+
+def wait_until(predicate, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def season_config(monkeypatch):
+    monkeypatch.setattr(Config, 'SEASON_DOWNLOAD_MODE', 'parallel')
+    monkeypatch.setattr(Config, 'SEASON_EPISODE_CONCURRENCY', 2)
+    monkeypatch.setattr(Config, 'MAX_CONCURRENT_DOWNLOADS', 4)
+    monkeypatch.setattr(SVTPlayDownloader, 'list_episodes',
+                        lambda self, url, token=None: {'success': True, 'episodes': EPISODES, 'count': len(EPISODES)})
+
+
+def test_season_fans_out_episodes_with_per_season_cap(season_config, monkeypatch):
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def fake_worker(self, download_id, url, options):
+        self._update_download(download_id, status='downloading', progress=50)
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        skipped = url.endswith('avsnitt-3')
+        self._finish_download(download_id, 'completed', progress=100, skipped=skipped,
+                              output_file=f'/dl/{url.rsplit("/", 1)[1]}.ts')
+
+    monkeypatch.setattr(SVTPlayDownloader, '_download_worker', fake_worker)
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'))
+
+    season_id = downloader.download_season('https://www.svtplay.se/serie', {'download_dir': '/tmp'})['download_id']
+    assert wait_until(lambda: downloader.downloads[season_id]['status'] == 'completed')
+
+    season = downloader.downloads[season_id]
+    assert peak[0] == 2
+    assert season['progress'] == 100
+    assert season['completed_episodes'] == 4
+    assert season['skipped_episodes'] == 1
+    assert season['episodes']['3']['status'] == 'skipped'
+    assert season['episodes']['5']['filename'] == '/dl/avsnitt-5.ts'
+    assert all(downloader.downloads[child]['parent_id'] == season_id for child in season['child_ids'])
+    downloader.scheduler.shutdown()
+
+
+def test_failed_episode_fails_the_season(season_config, monkeypatch):
+    def fake_worker(self, download_id, url, options):
+        if url.endswith('avsnitt-2'):
+            self._finish_download(download_id, 'failed', error='boom')
+        else:
+            self._finish_download(download_id, 'completed', progress=100)
+
+    monkeypatch.setattr(SVTPlayDownloader, '_download_worker', fake_worker)
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'))
+
+    season_id = downloader.download_season('https://www.svtplay.se/serie')['download_id']
+    assert wait_until(lambda: downloader.downloads[season_id]['status'] == 'failed')
+    assert downloader.downloads[season_id]['failed_episodes'] == 1
+    assert downloader.downloads[season_id]['completed_episodes'] == 4
+    downloader.scheduler.shutdown()
+
+
+def test_restart_resumes_unfinished_episodes_through_their_season(season_config, monkeypatch, tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    release = threading.Event()
+
+    def blocking_worker(self, download_id, url, options):
+        self._update_download(download_id, status='downloading')
+        if url.endswith('avsnitt-1'):
+            self._finish_download(download_id, 'completed', progress=100)
+        else:
+            release.wait(timeout=3)
+
+    monkeypatch.setattr(SVTPlayDownloader, '_download_worker', blocking_worker)
+    first = SVTPlayDownloader(store=store)
+    season_id = first.download_season('https://www.svtplay.se/serie')['download_id']
+    assert wait_until(lambda: first.downloads[season_id].get('completed_episodes') == 1)
+    first.scheduler.shutdown()
+
+    # "Restart" with the same job store
+    started = []
+
+    def recording_worker(self, download_id, url, options):
+        started.append(url)
+        self._finish_download(download_id, 'completed', progress=100)
+
+    monkeypatch.setattr(SVTPlayDownloader, '_download_worker', recording_worker)
+    second = SVTPlayDownloader(store=store)
+    release.set()
+
+    assert wait_until(lambda: second.downloads[season_id]['status'] == 'completed')
+    assert sorted(started) == sorted(EPISODES[1:])
+    second.scheduler.shutdown()
+
+
+@pytest.fixture
+def blocked_season(season_config, monkeypatch):
+    """A season whose episode downloads block until released, recording the ones that start"""
+    release = threading.Event()
+    started = []
+
+    def blocking_worker(self, download_id, url, options):
+        started.append(url)
+        self._update_download(download_id, status='downloading')
+        release.wait(timeout=3)
+        self._finish_download(download_id, 'completed', progress=100)
+
+    monkeypatch.setattr(SVTPlayDownloader, '_download_worker', blocking_worker)
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'))
+    season_id = downloader.download_season('https://www.svtplay.se/serie')['download_id']
+    assert wait_until(lambda: len(started) == 2)
+    yield downloader, season_id, release, started
+    release.set()
+    downloader.scheduler.shutdown()
+
+
+def test_paused_season_starts_no_more_episodes(blocked_season):
+    downloader, season_id, release, started = blocked_season
+    season = downloader.downloads[season_id]
+
+    assert downloader.control_download(season_id, 'pause')['affected'] == 3
+    release.set()
+    assert wait_until(lambda: season['completed_episodes'] == 2)
+    time.sleep(0.1)
+    assert len(started) == 2
+    assert season['status'] == 'paused'
+
+    downloader.control_download(season_id, 'resume')
+    assert wait_until(lambda: season['status'] == 'completed')
+    assert sorted(started) == sorted(EPISODES)
+
+
+def test_cancelled_season_starts_no_more_episodes(blocked_season):
+    downloader, season_id, release, started = blocked_season
+    season = downloader.downloads[season_id]
+
+    assert downloader.control_download(season_id, 'cancel')['affected'] == 5
+    release.set()
+    assert wait_until(lambda: season['status'] == 'cancelled')
+    time.sleep(0.1)
+    assert len(started) == 2
+    assert season['message'].startswith('Season download cancelled: 2 downloaded')
+    assert [ep['status'] for ep in season['episodes'].values()].count('cancelled') == 3
+
+
+def test_episode_progress_does_not_rewrite_the_season(season_config, monkeypatch):
+    release = threading.Event()
+
+    def progress_worker(self, download_id, url, options):
+        self._update_download(download_id, status='downloading')
+        if url.endswith('avsnitt-1'):
+            release.wait(timeout=3)
+            for percent in range(10, 101, 10):
+                self._update_download(download_id, progress=percent)
+        self._finish_download(download_id, 'completed', progress=100)
+
+    monkeypatch.setattr(SVTPlayDownloader, '_download_worker', progress_worker)
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'))
+    season_id = downloader.download_season('https://www.svtplay.se/serie')['download_id']
+    season = downloader.downloads[season_id]
+    assert wait_until(lambda: season.get('completed_episodes') == 4)
+
+    saved = []
+    monkeypatch.setattr(downloader.store, 'save', lambda job, options=None: saved.append(job['id']))
+    release.set()
+    assert wait_until(lambda: season['status'] == 'completed')
+
+    assert season['episodes']['1']['progress'] == 100
+    assert saved.count(season_id) == 3  # The episode completing, the season counts, the season finishing
+    downloader.scheduler.shutdown()
+
+
+def test_episodes_waiting_to_retry_free_their_season_slots(season_config, monkeypatch):
+    started = []
+
+    def failing_worker(self, download_id, url, options):
+        started.append(url)
+        if url in EPISODES[:2]:
+            self._fail_attempt(download_id, retry_policy.NETWORK, 'Network error', 'reset')
+        else:
+            time.sleep(0.5)
+
+    monkeypatch.setattr(SVTPlayDownloader, '_download_worker', failing_worker)
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'))
+    downloader.retry_policy = RetryPolicy({retry_policy.NETWORK: RetryRule(2, 5, 5)})
+    downloader.download_season('https://www.svtplay.se/serie')
+
+    # The next episodes start while the first two wait out their retry delay
+    assert wait_until(lambda: len(started) == 4, timeout=1.0)
+    assert sorted(started[2:]) == EPISODES[2:4]
+    downloader.scheduler.shutdown()
@@ -0,0 +1,114 @@
+"""Tests for pausing and cancelling running svtplay-dl processes and their children"""
+import os
+import sys
+import time
+
+import pytest
+
+import app as app_module
+import svtplay_handler
+from config import Config
+from job_store import JobStore
+from svtplay_handler import SVTPlayDownloader
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason='process groups and SIGSTOP are POSIX only')
+
+# Stands in for svtplay-dl: starts a child (like its ffmpeg) and works until a "stop" file appears
+FAKE_SVTPLAY_DL = '''
+import os, signal, subprocess, sys, time
+out_dir = sys.argv[sys.argv.index('-o') + 1]
+if os.environ.get('FAKE_IGNORE_TERM'):
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+with open(os.path.join(out_dir, 'pids'), 'w') as f:
+    f.write(f'{os.getpid()} {child.pid}')
+while not os.path.exists(os.path.join(out_dir, 'stop')):
+    print('INFO: working', file=sys.stderr, flush=True)
+    time.sleep(0.05)
+child.kill()
+'''
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def process_state(pid):
+    """State letter from /proc (R, S, T...), or None once the process has exited"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            state = f.read().rsplit(')', 1)[1].split()[0]
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+    return None if state in 'ZX' else state
+
+
+@pytest.fixture
+def downloader(tmp_path, monkeypatch):
+    script = tmp_path / 'svtplay-dl.py'
+    script.write_text(FAKE_SVTPLAY_DL)
+    monkeypatch.setattr(svtplay_handler, 'SVTPLAY_DL_CMD', [sys.executable, str(script)])
+    monkeypatch.setattr(Config, 'DOWNLOAD_BACKEND', 'subprocess')
+    monkeypatch.setattr(Config, 'CANCEL_GRACE_PERIOD', 0.5)
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'))
+    monkeypatch.setattr(app_module, 'downloader', downloader)
+    yield downloader
+    (tmp_path / 'stop').touch()
+    downloader.scheduler.shutdown()
+    downloader.merge_scheduler.shutdown()
+
+
+def start(downloader, tmp_path):
+    download_dir = tmp_path / 'out'
+    download_id = downloader.start_download('https://www.svtplay.se/video/1/x',
+                                            {'download_dir': str(download_dir)})['download_id']
+    assert wait_until(lambda: (download_dir / 'pids').exists() and download_id in downloader._processes)
+    time.sleep(0.05)
+    pids = [int(pid) for pid in (download_dir / 'pids').read_text().split()]
+    return download_id, download_dir, pids
+
+
+@pytest.mark.parametrize('ignore_term', [False, True])
+def test_cancel_stops_the_process_group_and_frees_the_slot(downloader, tmp_path, monkeypatch, ignore_term):
+    if ignore_term:
+        monkeypatch.setenv('FAKE_IGNORE_TERM', '1')
+    download_id, _, pids = start(downloader, tmp_path)
+
+    response = app_module.app.test_client().delete(f'/api/downloads/{download_id}')
+    assert response.get_json()['affected'] == 1
+
+    download = downloader.downloads[download_id]
+    assert wait_until(lambda: download['status'] == 'cancelled')
+    assert all(process_state(pid) is None for pid in pids)
+    assert not downloader.scheduler.is_running(download_id)
+    assert download_id not in downloader._processes
+    assert 'attempts' not in download  # Not counted as a failed attempt
+
+
+def test_pause_suspends_and_resume_continues(downloader, tmp_path):
+    download_id, download_dir, pids = start(downloader, tmp_path)
+    download = downloader.downloads[download_id]
+
+    assert downloader.control_download(download_id, 'pause')['status'] == 'paused'
+    assert wait_until(lambda: all(process_state(pid) == 'T' for pid in pids))
+
+    assert downloader.control_download(download_id, 'resume')['status'] == 'downloading'
+    assert wait_until(lambda: all(process_state(pid) not in ('T', None) for pid in pids))
+
+    (download_dir / 'stop').touch()
+    assert wait_until(lambda: download['status'] == 'completed')
+
+
+def test_paused_download_can_be_cancelled(downloader, tmp_path):
+    download_id, _, pids = start(downloader, tmp_path)
+    downloader.control_download(download_id, 'pause')
+    assert wait_until(lambda: process_state(pids[0]) == 'T')
+
+    downloader.control_download(download_id, 'cancel')
+    assert wait_until(lambda: downloader.downloads[download_id]['status'] == 'cancelled')
+    assert all(process_state(pid) is None for pid in pids)
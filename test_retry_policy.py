@@ -0,0 +1,102 @@
+"""Tests for failure classification, retry backoff and delayed retries"""
+import time
+
+import pytest
+
+import retry_policy
+from download_scheduler import DownloadScheduler
+from job_store import JobStore
+from retry_policy import RetryPolicy, RetryRule, classify
+from svtplay_handler import SVTPlayDownloader
+
+
+def wait_until(predicate, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_classify():
+    assert classify('ERROR: You need a token to see this video') == retry_policy.TOKEN_REQUIRED
+    assert classify('ERROR: This video is DRM protected') == retry_policy.DRM_PROTECTED
+    assert classify('ERROR: No videos found') == retry_policy.NO_VIDEOS_FOUND
+    assert classify("HTTPSConnectionPool: Max retries exceeded (Caused by ConnectionResetError)") == retry_policy.NETWORK
+    assert classify('ERROR: HTTP Error 503 for segment 12') == retry_policy.NETWORK
+    assert classify('HTTP 404 for https://cdn/seg7.ts') == retry_policy.GENERIC
+    assert classify('', returncode=-9) == retry_policy.INTERRUPTED
+
+
+def test_backoff_doubles_with_jitter_and_gives_up():
+    rules = {retry_policy.NETWORK: RetryRule(4, 10, 25), retry_policy.TOKEN_REQUIRED: RetryRule(1, 0, 0)}
+    policy = RetryPolicy(rules, random_fraction=lambda: 1.0)
+    assert [policy.next_delay(retry_policy.NETWORK, n) for n in (1, 2, 3, 4)] == [10, 20, 25, None]
+    assert RetryPolicy(rules, random_fraction=lambda: 0.0).next_delay(retry_policy.NETWORK, 1) == 5
+    assert policy.next_delay(retry_policy.TOKEN_REQUIRED, 1) is None
+
+
+def test_delayed_job_does_not_hold_a_worker():
+    scheduler = DownloadScheduler(1)
+    started = {}
+    scheduler.submit('retry', lambda: started.setdefault('retry', time.monotonic()), delay=0.3)
+    submitted = time.monotonic()
+    scheduler.submit('now', lambda: started.setdefault('now', time.monotonic()))
+
+    assert wait_until(lambda: 'now' in started)
+    assert started['now'] - submitted < 0.2
+    assert scheduler.positions() == {'retry': 1}
+    assert wait_until(lambda: 'retry' in started)
+    assert started['retry'] - submitted >= 0.3
+    scheduler.shutdown()
+
+
+@pytest.fixture
+def downloader():
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'))
+    downloader.retry_policy = RetryPolicy({retry_policy.NETWORK: RetryRule(3, 0.05, 0.05),
+                                           retry_policy.GENERIC: RetryRule(1, 0, 0)})
+    yield downloader
+    downloader.scheduler.shutdown()
+
+
+def test_network_failure_is_retried_with_attempt_history(downloader, monkeypatch, tmp_path):
+    outcomes = [(1, '', ['ERROR: Connection reset by peer']), (0, '', ['INFO: done'])]
+    monkeypatch.setattr(SVTPlayDownloader, '_run_svtplay_dl', lambda self, args, download_id: outcomes.pop(0))
+
+    result = downloader.start_download('https://www.svtplay.se/video/x/y', {'download_dir': str(tmp_path)})
+    download = downloader.downloads[result['download_id']]
+
+    assert wait_until(lambda: download['status'] == 'completed')
+    assert [a['failure'] for a in download['attempts']] == ['network']
+    assert download['attempts'][0]['error'] == 'ERROR: Connection reset by peer'
+    assert download['retry_at'] is None
+
+
+def test_token_failure_is_not_retried(downloader, monkeypatch, tmp_path):
+    calls = []
+
+    def run(self, args, download_id):
+        calls.append(download_id)
+        return 1, '', ['ERROR: This video requires a token']
+
+    monkeypatch.setattr(SVTPlayDownloader, '_run_svtplay_dl', run)
+    result = downloader.start_download('https://www.tv4play.se/video/x/y', {'download_dir': str(tmp_path)})
+    download = downloader.downloads[result['download_id']]
+
+    assert wait_until(lambda: download['status'] == 'failed')
+    assert download['failure'] == 'token_required'
+    assert len(download['attempts']) == 1
+    time.sleep(0.1)
+    assert len(calls) == 1
+
+
+def test_pending_retry_survives_restart(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    store.save({'id': 'r', 'url': 'https://www.svtplay.se/video/x/y', 'status': 'queued', 'progress': 0,
+                'message': '', 'started_at': '2026-01-01T00:00:00', 'retry_at': '2999-01-01T00:00:00'})
+    downloader = SVTPlayDownloader(store=store)
+    assert downloader.scheduler.is_queued('r')
+    assert not downloader.scheduler.is_running('r')
+    downloader.scheduler.shutdown()
@@ -0,0 +1,83 @@
+"""Tests for the streaming scrape pipeline and /api/scrape/stream"""
+import json
+import threading
+
+import pytest
+
+import app as app_module
+from job_store import JobStore
+from svtplay_handler import SVTPlayDownloader
+from thumbnail_store import ThumbnailStore
+
+EPISODES = [f'https://www.svtplay.se/video/id{i}/avsnitt-{i}' for i in range(1, 5)]
+
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+@pytest.fixture
+def scraping(monkeypatch, release):
+    def fake_fetch(self, video_url):
+        release.wait(timeout=3)
+        number = int(video_url[-1])
+        return {'image': f'https://img/{video_url.rsplit("/", 1)[1]}.jpg', 'season': 1, 'episode': 5 - number}
+
+    monkeypatch.setattr(SVTPlayDownloader, 'list_episodes',
+                        lambda self, url, token=None: {'success': True, 'episodes': EPISODES, 'count': len(EPISODES)})
+    monkeypatch.setattr(SVTPlayDownloader, '_fetch_video_page', fake_fetch)
+    monkeypatch.setattr(SVTPlayDownloader, '_fetch_category_page_metadata', lambda self, url, wanted=None: {})
+
+
+def test_video_list_arrives_before_thumbnails(scraping, release, tmp_path):
+    thumbnails = ThumbnailStore(str(tmp_path), 1024 * 1024)
+    thumbnails.put_videos({'id2': {'image': 'https://img/cached.jpg', 'title': 'Cached'}})
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'), thumbnails=thumbnails)
+
+    events = downloader.iter_scrape_events('https://www.svtplay.se/serie')
+    first = next(events)  # Thumbnail fetches are still blocked
+    assert first['type'] == 'videos'
+    assert sorted(v['url'] for v in first['videos']) == EPISODES
+    cached = {v['url']: v for v in first['videos']}[EPISODES[1]]
+    assert cached['thumbnail'] == '/thumbs/id2' and cached['title'] == 'Cached'
+
+    release.set()
+    rest = list(events)
+    updates = {e['url']: e['video'] for e in rest if e['type'] == 'video'}
+    assert sorted(updates) == [EPISODES[0], EPISODES[2], EPISODES[3]]
+    assert updates[EPISODES[0]]['thumbnail'] == '/thumbs/id1'
+    assert updates[EPISODES[0]]['episode'] == 4
+    # Episodes with numbers sort first, by episode
+    assert rest[-1] == {'type': 'done', 'thumbnails': 4,
+                        'order': [EPISODES[3], EPISODES[2], EPISODES[0], EPISODES[1]]}
+    downloader.scheduler.shutdown()
+
+
+def test_list_failure_is_streamed_as_error(monkeypatch, tmp_path):
+    monkeypatch.setattr(SVTPlayDownloader, 'list_episodes',
+                        lambda self, url, token=None: {'success': False, 'error': 'svtplay-dl failed'})
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'), thumbnails=ThumbnailStore(str(tmp_path), 1))
+
+    assert list(downloader.iter_scrape_events('https://www.svtplay.se/serie')) == [
+        {'type': 'error', 'error': 'svtplay-dl failed'}
+    ]
+    downloader.scheduler.shutdown()
+
+
+def test_scrape_stream_endpoint_returns_ndjson(scraping, release, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module.downloader, 'thumbnails', ThumbnailStore(str(tmp_path), 1024 * 1024))
+    release.set()
+    app_module.app.config["TESTING"] = True
+
+    with app_module.app.test_client() as client:
+        response = client.post('/api/scrape/stream', json={'url': 'https://www.svtplay.se/serie'})
+        assert response.mimetype == 'application/x-ndjson'
+        events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        assert client.post('/api/scrape/stream', json={}).status_code == 400
+
+    assert [e['type'] for e in events] == ['videos'] + ['video'] * 4 + ['done']
+    assert events[0]['count'] == 4
@@ -0,0 +1,169 @@
+"""Tests for the parallel HLS segment engine against a local HTTP server"""
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import svtplay_handler
+from config import Config
+from job_store import JobStore
+from segment_fetcher import SegmentError, SegmentFetcher, UnsupportedStream, parse_playlist, select_variant
+from svtplay_handler import SVTPlayDownloader
+
+SEGMENTS = 20
+
+
+def segment_body(index):
+    return f'segment {index:03d};'.encode() * 100
+
+
+class PlaylistHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        if self.path == '/master.m3u8':
+            body = ('#EXTM3U\n'
+                    '#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360\nlow/index.m3u8\n'
+                    '#EXT-X-STREAM-INF:BANDWIDTH=3000000,RESOLUTION=1280x720\nhigh/index.m3u8\n').encode()
+        elif self.path.endswith('/index.m3u8'):
+            lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:4']
+            for i in range(SEGMENTS):
+                lines += ['#EXTINF:4.0,', f'seg{i}.ts']
+            body = '\n'.join(lines + ['#EXT-X-ENDLIST']).encode()
+        elif '/seg' in self.path:
+            index = int(self.path.rsplit('seg', 1)[1].split('.')[0])
+            with server.lock:
+                server.fetched.append(index)
+                server.active += 1
+                server.peak = max(server.peak, server.active)
+            # Earlier segments are slower, so they finish out of order
+            time.sleep(0.002 * (SEGMENTS - index))
+            with server.lock:
+                server.active -= 1
+            if index in server.missing:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = segment_body(index)
+        else:
+            body = b''
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def hls_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PlaylistHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.active = 0
+    server.peak = 0
+    server.missing = set()
+    server.fetched = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_playlist():
+    playlist = parse_playlist('#EXTM3U\n#EXT-X-MAP:URI="init.mp4"\n#EXTINF:4,\na.m4s\n#EXTINF:4,\n/b.m4s\n',
+                              'https://cdn.example/v/index.m3u8')
+    assert playlist.segments == ['https://cdn.example/v/init.mp4', 'https://cdn.example/v/a.m4s', 'https://cdn.example/b.m4s']
+
+    master = parse_playlist('#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=800000,CODECS="a,b"\nlow.m3u8\n'
+                            '#EXT-X-STREAM-INF:BANDWIDTH=3000000\nhigh.m3u8\n', 'https://cdn.example/m.m3u8')
+    assert select_variant(master.variants).url == 'https://cdn.example/high.m3u8'
+    assert select_variant(master.variants, '1000').url == 'https://cdn.example/low.m3u8'
+
+    with pytest.raises(UnsupportedStream):
+        parse_playlist('#EXTM3U\n#EXT-X-KEY:METHOD=AES-128,URI="key"\n#EXTINF:4,\na.ts\n', 'https://cdn.example/')
+
+
+def test_segments_are_fetched_in_parallel_and_written_in_order(hls_server, tmp_path):
+    fetcher = SegmentFetcher(connections=4, window=8)
+    progress = []
+    path = str(tmp_path / 'video.ts')
+
+    total = fetcher.download({path: f'{hls_server.base_url}/master.m3u8'}, lambda pos, total: progress.append((pos, total)))
+    fetcher.close()
+
+    assert total == SEGMENTS
+    assert open(path, 'rb').read() == b''.join(segment_body(i) for i in range(SEGMENTS))
+    assert progress == [(i, SEGMENTS) for i in range(1, SEGMENTS + 1)]
+    assert 1 < hls_server.peak <= 4
+
+
+def test_interrupted_download_resumes_from_manifest(hls_server, tmp_path):
+    hls_server.missing.add(7)
+    fetcher = SegmentFetcher(connections=4, window=8)
+    path = str(tmp_path / 'video.ts')
+    playlist = f'{hls_server.base_url}/high/index.m3u8'
+
+    with pytest.raises(SegmentError):
+        fetcher.download({path: playlist})
+    assert sorted(os.listdir(tmp_path)) == ['video.ts.part', 'video.ts.parts.json']
+    # A half-written segment after the last checkpoint is dropped on resume
+    with open(path + '.part', 'ab') as f:
+        f.write(b'torn')
+
+    hls_server.missing.clear()
+    hls_server.fetched.clear()
+    progress = []
+    fetcher.download({path: playlist}, lambda pos, total: progress.append(pos))
+    fetcher.close()
+
+    assert sorted(hls_server.fetched) == list(range(7, SEGMENTS))
+    assert progress[0] == 7 and progress[-1] == SEGMENTS
+    assert open(path, 'rb').read() == b''.join(segment_body(i) for i in range(SEGMENTS))
+    assert os.listdir(tmp_path) == ['video.ts']
+
+
+def test_changed_playlist_starts_over(hls_server, tmp_path):
+    path = str(tmp_path / 'video.ts')
+    with open(path + '.part', 'wb') as f:
+        f.write(b'x' * 5000)
+    with open(path + '.parts.json', 'w') as f:
+        f.write('{"playlist": "other", "count": 20, "segments": 3, "bytes": 5000}')
+
+    fetcher = SegmentFetcher(connections=4, window=8)
+    fetcher.download({path: f'{hls_server.base_url}/high/index.m3u8'})
+    fetcher.close()
+    assert sorted(hls_server.fetched) == list(range(SEGMENTS))
+    assert open(path, 'rb').read() == b''.join(segment_body(i) for i in range(SEGMENTS))
+
+
+def test_segment_engine_download_updates_status(hls_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DOWNLOAD_ENGINE', 'segments')
+    monkeypatch.setattr(svtplay_handler, 'resolve_stream', lambda url, download_dir, *args: {
+        'title': 'Agenda: 12/5', 'video': f'{hls_server.base_url}/high/index.m3u8', 'audio': None, 'headers': {}})
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'))
+    downloader._create_download({'id': 'd', 'url': 'https://www.svtplay.se/video/x/agenda',
+                                 'status': 'queued', 'progress': 0, 'message': ''})
+
+    downloader._download_worker('d', 'https://www.svtplay.se/video/x/agenda', {'download_dir': str(tmp_path)})
+
+    download = downloader.downloads['d']
+    assert download['status'] == 'completed' and download['progress'] == 100
+    assert download['output_file'] == str(tmp_path / 'Agenda 125.ts')
+    assert os.path.getsize(download['output_file']) == sum(len(segment_body(i)) for i in range(SEGMENTS))
+    downloader.scheduler.shutdown()
+
+
+def test_segment_reads_are_charged_to_the_throttle(hls_server, tmp_path):
+    charged = []
+    throttle = type('Throttle', (), {'consume': lambda self, amount: charged.append(amount)})()
+    fetcher = SegmentFetcher(connections=4, window=8, throttle=throttle)
+    fetcher.download({str(tmp_path / 'video.ts'): f'{hls_server.base_url}/high/index.m3u8'})
+    fetcher.close()
+    assert sum(charged) == sum(len(segment_body(i)) for i in range(SEGMENTS)) + charged[0]  # + the playlist
@@ -0,0 +1,112 @@
+"""Tests for the in-process and subprocess svtplay-dl metadata backends"""
+import sys
+import time
+
+import svtplay_backend
+from svtplay_backend import LibraryBackend, SubprocessBackend, create_metadata_backend, parse_episode_urls
+
+
+def fake_command(script):
+    """A stand-in for the svtplay-dl command that runs a Python snippet"""
+    return [sys.executable, '-c', script]
+
+
+def test_parse_episode_urls():
+    output = ('INFO: Url: https://www.svtplay.se/video/a/1\n'
+              'https://www.svtplay.se/video/b/2\n'
+              'INFO: Url: https://www.svtplay.se/video/a/1\n'
+              'ERROR: nothing here\n')
+    assert parse_episode_urls(output) == ['https://www.svtplay.se/video/a/1', 'https://www.svtplay.se/video/b/2']
+
+
+def test_subprocess_backend_runs_command():
+    backend = SubprocessBackend(fake_command(
+        'import sys; print("INFO: Url: https://www.svtplay.se/video/a/1", file=sys.stderr)'))
+    assert backend.fetch_episodes('https://www.svtplay.se/serie') == {
+        'success': True, 'episodes': ['https://www.svtplay.se/video/a/1'], 'count': 1}
+
+    backend = SubprocessBackend(fake_command('import json, sys; print(json.dumps({"url": sys.argv[-1]}))'))
+    assert backend.fetch_info('https://www.svtplay.se/video/a/1') == {
+        'success': True, 'info': {'url': 'https://www.svtplay.se/video/a/1'}}
+
+
+class FakeService:
+    def __init__(self, episodes=(), error=None):
+        self.episodes = list(episodes)
+        self.error = error
+        self.output = {'title': 'agenda', 'season': 3, 'episode': 1, 'ignored': object()}
+
+    def find_all_episodes(self, config):
+        if self.error:
+            raise self.error
+        return self.episodes
+
+    def get(self):
+        stream = type('HLS', (), {'name': 'hls', 'format': 'h264', 'bitrate': 3500, 'resolution': '1280x720'})()
+        yield stream
+
+
+class RecordingBackend:
+    name = 'recording'
+
+    def __init__(self):
+        self.calls = []
+
+    def fetch_episodes(self, url, token=None):
+        self.calls.append(url)
+        return {'success': True, 'episodes': [], 'count': 0}
+
+
+def library_backend(monkeypatch, service, fallback=None):
+    monkeypatch.setattr(svtplay_backend, 'sites', [])
+    monkeypatch.setattr(svtplay_backend, 'setup_defaults', lambda: type('Options', (), {'set': lambda *a: None})(),
+                        raising=False)
+    monkeypatch.setattr(svtplay_backend, 'find_service', lambda url, config: service)
+    return LibraryBackend(fallback=fallback, max_workers=2)
+
+
+def test_library_backend_lists_episodes_in_process(monkeypatch):
+    service = FakeService(['https://www.svtplay.se/video/a/1', 'https://www.svtplay.se/video/a/1',
+                           'https://www.svtplay.se/video/b/2'])
+    fallback = RecordingBackend()
+    backend = library_backend(monkeypatch, service, fallback)
+
+    assert backend.fetch_episodes('https://www.svtplay.se/serie') == {
+        'success': True, 'episodes': ['https://www.svtplay.se/video/a/1', 'https://www.svtplay.se/video/b/2'], 'count': 2}
+    assert backend.fetch_info('https://www.svtplay.se/video/a/1') == {'success': True, 'info': {
+        'url': 'https://www.svtplay.se/video/a/1', 'service': 'fakeservice', 'title': 'agenda', 'season': 3,
+        'episode': 1, 'streams': [{'name': 'hls', 'format': 'h264', 'bitrate': 3500, 'resolution': '1280x720'}]}}
+    assert fallback.calls == []
+    backend.shutdown()
+
+
+def test_library_backend_falls_back_to_subprocess(monkeypatch):
+    fallback = RecordingBackend()
+    backend = library_backend(monkeypatch, FakeService(error=AttributeError('API changed')), fallback)
+    assert backend.fetch_episodes('https://www.svtplay.se/serie')['success']
+    assert fallback.calls == ['https://www.svtplay.se/serie']
+
+    # Not installed: every call goes to the fallback
+    monkeypatch.setattr(svtplay_backend, 'sites', None)
+    backend.fetch_episodes('https://www.svtplay.se/other')
+    assert fallback.calls == ['https://www.svtplay.se/serie', 'https://www.svtplay.se/other']
+    backend.shutdown()
+
+
+def test_library_backend_times_out(monkeypatch):
+    monkeypatch.setattr(svtplay_backend, 'EPISODES_TIMEOUT', 0.05)
+    backend = library_backend(monkeypatch, FakeService())
+    monkeypatch.setattr(LibraryBackend, '_episodes', lambda self, url, token: time.sleep(0.5))
+    assert backend.fetch_episodes('https://www.svtplay.se/serie') == {
+        'success': False, 'error': 'Request timed out while getting episodes'}
+    backend.shutdown()
+
+
+def test_create_metadata_backend(monkeypatch):
+    assert create_metadata_backend('subprocess', ['svtplay-dl']).name == 'subprocess'
+    monkeypatch.setattr(svtplay_backend, 'sites', None)
+    assert create_metadata_backend('library', ['svtplay-dl']).name == 'subprocess'
+    monkeypatch.setattr(svtplay_backend, 'sites', [])
+    backend = create_metadata_backend('library', ['svtplay-dl'])
+    assert backend.name == 'library' and backend.fallback.name == 'subprocess'
+    backend.shutdown()
@@ -0,0 +1,157 @@
+"""Tests for bulk thumbnail and metadata harvesting from category and video pages"""
+import json
+
+import http_client
+from job_store import JobStore
+from svtplay_handler import SVTPlayDownloader
+from thumbnail_extractors import (
+    extract_article_cards, extract_embedded_json, extract_video_metadata, parse_duration
+)
+from thumbnail_store import ThumbnailStore
+
+BASE_URL = 'https://www.svtplay.se/kategori/film'
+
+
+def next_data_page(count):
+    """A Next.js page whose GraphQL cache holds the listing as a JSON string, like SVT Play"""
+    items = [{'item': {'name': f'Film {i}', 'urls': {'svtplay': f'/video/id{i}/film-{i}'},
+                       'image': {'id': str(1000 + i), 'changed': 1700000000, '__typename': 'Image'},
+                       'duration': 3000 + i, 'positionInSeason': f'Säsong 2 — Avsnitt {count - i}'}}
+             for i in range(count)]
+    urql_state = {'123': {'data': json.dumps({'selectionPage': {'groups': [{'items': items}]}})}}
+    next_data = {'props': {'urqlState': urql_state}, 'page': '/kategori/[...path]'}
+    return (f'<html><head><script id="__NEXT_DATA__" type="application/json">{json.dumps(next_data)}</script>'
+            f'</head><body><div id="__next"></div></body></html>')
+
+
+def test_embedded_next_data_with_nested_graphql_strings():
+    found = extract_embedded_json(next_data_page(3), BASE_URL)
+    assert found['id0'] == {
+        'image': 'https://www.svtstatic.se/image/wide/992/1000/1700000000?format=auto&quality=70',
+        'title': 'Film 0',
+        'duration': 3000,
+        'season': 2,
+        'episode': 3
+    }
+    assert sorted(found) == ['id0', 'id1', 'id2']
+
+
+def test_json_ld_item_list():
+    ld = {'@type': 'ItemList', 'itemListElement': [
+        {'@type': 'ListItem', 'item': {'@type': 'TVEpisode', 'url': 'https://www.tv4play.se/video/abc123/avsnitt-1',
+                                       'name': 'Avsnitt 1', 'description': 'Det b&ouml;rjar.',
+                                       'image': ['https://img.tv4cdn.se/abc.jpg'], 'timeRequired': 'x',
+                                       'duration': 'PT1H2M3S', 'episodeNumber': 1,
+                                       'partOfSeason': {'@type': 'TVSeason', 'seasonNumber': '3'}}}]}
+    page = f'<script type="application/ld+json">{json.dumps(ld)}</script>'
+    assert extract_embedded_json(page, 'https://www.tv4play.se/program/x') == {'abc123': {
+        'image': 'https://img.tv4cdn.se/abc.jpg', 'title': 'Avsnitt 1', 'description': 'Det börjar.',
+        'duration': 3723, 'season': 3, 'episode': 1}}
+
+
+def test_parse_duration():
+    assert parse_duration('PT57M32S') == 3452
+    assert parse_duration('3452') == 3452
+    assert parse_duration({'seconds': 90}) == 90
+    assert parse_duration('P1D') == 86400
+    assert parse_duration('soon') is None
+    assert parse_duration(0) is None
+
+
+def test_article_cards_without_css_class_names():
+    page = '''
+        <article><a href="/video/aaa/ett"><img srcset="/image/a-small.jpg 224w, /image/a.jpg 992w"></a><h3>Ett</h3></article>
+        <li><a href="/video/bbb/tva">Två</a><div style="background-image: url('https://img/b.jpg')"></div></li>
+        <article><a href="/video/ccc/tre">No image</a></article>
+        <img src="data:image/gif;base64,R0lGOD"><a href="/video/ddd/fyra"></a>
+    '''
+    assert extract_article_cards(page, BASE_URL) == {
+        'aaa': {'image': 'https://www.svtplay.se/image/a-small.jpg', 'title': 'Ett'},
+        'bbb': {'image': 'https://img/b.jpg'}
+    }
+
+
+def test_extractors_run_in_configured_order_and_stop_when_complete():
+    page = next_data_page(1) + '<article><a href="/video/id0/x"><img src="/other.jpg"></a></article>'
+    records = extract_video_metadata(page, BASE_URL, names=['article_cards', 'embedded_json'])
+    assert records['id0']['image'] == 'https://www.svtplay.se/other.jpg'
+    records = extract_video_metadata(page, BASE_URL, names=['embedded_json', 'article_cards'])
+    assert records['id0']['image'].startswith('https://www.svtstatic.se/')
+    assert extract_video_metadata(page, BASE_URL, names=['nope', 'article_cards']) == {
+        'id0': {'image': 'https://www.svtplay.se/other.jpg'}}
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.status_code = 200
+        self.text = text
+        self.url = BASE_URL
+
+
+def test_scraping_200_videos_costs_one_request(tmp_path, monkeypatch):
+    urls = [f'https://www.svtplay.se/video/id{i}/film-{i}' for i in range(200)]
+    requested = []
+
+    class FakeClient:
+        def get(self, url, timeout=None, **kwargs):
+            requested.append(url)
+            return FakeResponse(next_data_page(200))
+
+    monkeypatch.setattr(http_client, '_client', FakeClient())
+    monkeypatch.setattr(SVTPlayDownloader, 'list_episodes',
+                        lambda self, url, token=None: {'success': True, 'episodes': urls, 'count': len(urls)})
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'), thumbnails=ThumbnailStore(str(tmp_path), 1024 * 1024))
+
+    result = downloader.scrape_videos_with_metadata(BASE_URL, max_videos=200)
+    assert requested == [BASE_URL]
+    assert all(video['thumbnail'] == f"/thumbs/{video['url'].split('/')[-2]}" for video in result['videos'])
+    assert downloader.thumbnails.get('id7')['source'].startswith('https://www.svtstatic.se/image/wide/992/1007/')
+
+    # Sorted by episode number from the listing, with titles and runtimes
+    assert [video['episode'] for video in result['videos']] == list(range(1, 201))
+    assert result['videos'][0] == {'url': urls[199], 'title': 'Film 199', 'thumbnail': '/thumbs/id199',
+                                   'duration': 3199, 'description': '', 'season': 2, 'episode': 1}
+
+    # Metadata is cached per video ID with the thumbnail
+    requested.clear()
+    assert downloader.scrape_videos_with_metadata(BASE_URL, max_videos=200) == result
+    assert requested == []
+    downloader.scheduler.shutdown()
+
+
+class StreamingResponse:
+    def __init__(self, page):
+        self.status_code = 200
+        self.encoding = 'utf-8'
+        self.page = page.encode('utf-8')
+        self.read = 0
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.page), chunk_size):
+            self.read += chunk_size
+            yield self.page[start:start + chunk_size]
+
+
+def test_video_page_metadata_comes_from_head_in_the_same_fetch(tmp_path, monkeypatch):
+    video_url = 'https://www.svtplay.se/video/eXYz12/agenda/sondag-12-maj'
+    ld = {'@type': 'VideoObject', 'url': video_url, 'duration': 'PT28M', 'description': 'Politik.'}
+    head = (f'<html><head><meta property="og:title" content="Agenda | SVT Play">'
+            f'<meta property="og:image" content="https://www.svtstatic.se/image/agenda.jpg">'
+            f'<script type="application/ld+json">{json.dumps(ld)}</script></head>')
+    response = StreamingResponse(head + '<body>' + 'x' * 200000 + '</body></html>')
+
+    class FakeClient:
+        def get(self, url, timeout=None, **kwargs):
+            return response
+
+        def release(self, response):
+            pass
+
+    monkeypatch.setattr(http_client, '_client', FakeClient())
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'), thumbnails=ThumbnailStore(str(tmp_path), 1024 * 1024))
+
+    assert downloader._fetch_video_page(video_url) == {
+        'image': 'https://www.svtstatic.se/image/agenda.jpg', 'title': 'Agenda',
+        'description': 'Politik.', 'duration': 1680}
+    assert response.read < 20000
+    downloader.scheduler.shutdown()
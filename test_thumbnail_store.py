@@ -0,0 +1,116 @@
+"""Tests for the thumbnail store and the /thumbs endpoint"""
+import os
+
+import pytest
+
+import app as app_module
+import http_client
+from job_store import JobStore
+from svtplay_handler import SVTPlayDownloader
+from thumbnail_store import ThumbnailStore
+
+EPISODES = [f'https://www.svtplay.se/video/id{i}/avsnitt-{i}' for i in range(1, 4)]
+
+
+def test_put_get_and_shared_blobs(tmp_path):
+    store = ThumbnailStore(str(tmp_path), max_bytes=1024)
+    sha = store.put('a', 'https://img/poster.jpg', b'poster', 'image/jpeg')
+    assert store.put('b', 'https://img/poster-copy.jpg', b'poster', 'image/jpeg') == sha
+
+    assert store.get('a')['sha'] == sha
+    assert store.get('b')['source'] == 'https://img/poster-copy.jpg'
+    assert store.total_size() == len(b'poster')
+    assert store.get('missing') is None
+
+
+def test_evicts_least_recently_used_when_over_budget(tmp_path):
+    store = ThumbnailStore(str(tmp_path), max_bytes=250)
+    store.put('a', 'https://img/a.jpg', b'a' * 100)
+    store.put('b', 'https://img/b.jpg', b'b' * 100)
+    store.get('a')
+    store.put('c', 'https://img/c.jpg', b'c' * 100)
+
+    assert store.get('b') is None
+    assert store.get('a') is not None and store.get('c') is not None
+    assert store.total_size() == 200
+    assert len([f for _, _, files in os.walk(store.blob_dir) for f in files]) == 2
+
+
+def test_index_survives_restart(tmp_path):
+    ThumbnailStore(str(tmp_path), max_bytes=1024).put('a', 'https://img/a.jpg', b'image', 'image/png')
+
+    path, content_type, etag = ThumbnailStore(str(tmp_path), max_bytes=1024).open('a')
+    assert content_type == 'image/png'
+    with open(path, 'rb') as f:
+        assert f.read() == b'image'
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module.downloader, 'thumbnails', ThumbnailStore(str(tmp_path), max_bytes=1024))
+    app_module.app.config["TESTING"] = True
+    with app_module.app.test_client() as client:
+        yield client
+
+
+def test_thumbs_endpoint_serves_with_etag_and_cache_headers(client):
+    sha = app_module.downloader.thumbnails.put('abc', 'https://img/abc.jpg', b'jpeg-bytes', 'image/jpeg')
+
+    response = client.get('/thumbs/abc')
+    assert response.status_code == 200
+    assert response.data == b'jpeg-bytes'
+    assert response.mimetype == 'image/jpeg'
+    assert response.headers['ETag'] == f'"{sha}"'
+    assert 'max-age' in response.headers['Cache-Control']
+    assert 'public' in response.headers['Cache-Control']
+
+    assert client.get('/thumbs/abc', headers={'If-None-Match': f'"{sha}"'}).status_code == 304
+    assert client.get('/thumbs/unknown').status_code == 404
+
+
+class FakeResponse:
+    def __init__(self, text='', content=b'', content_type='text/html'):
+        self.status_code = 200
+        self.text = text
+        self.content = content
+        self.headers = {'Content-Type': content_type}
+        self.encoding = 'utf-8'
+        self.url = None
+
+    def iter_content(self, chunk_size):
+        yield self.text.encode()
+
+
+def test_rescrape_makes_no_requests_for_cached_thumbnails(tmp_path, monkeypatch):
+    requested = []
+
+    class FakeClient:
+        def get(self, url, timeout=None, **kwargs):
+            requested.append(url)
+            if url.startswith('https://img/'):
+                return FakeResponse(content=url.encode(), content_type='image/jpeg')
+            return FakeResponse(text=f'<meta property="og:image" content="https://img/{url.rsplit("/", 1)[1]}.jpg">')
+
+        def release(self, response):
+            pass
+
+    monkeypatch.setattr(http_client, '_client', FakeClient())
+    monkeypatch.setattr(SVTPlayDownloader, 'list_episodes',
+                        lambda self, url, token=None: {'success': True, 'episodes': EPISODES, 'count': len(EPISODES)})
+    downloader = SVTPlayDownloader(store=JobStore(':memory:'), thumbnails=ThumbnailStore(str(tmp_path), 1024 * 1024))
+
+    first = downloader.scrape_videos_with_metadata('https://www.svtplay.se/kategori/film')
+    assert len(requested) == 4  # Category page, then each video page
+    assert sorted(v['thumbnail'] for v in first['videos']) == ['/thumbs/id1', '/thumbs/id2', '/thumbs/id3']
+
+    requested.clear()
+    second = downloader.scrape_videos_with_metadata('https://www.svtplay.se/kategori/film')
+    assert requested == []
+    assert second['videos'] == first['videos']
+
+    # The image is downloaded once, when first served
+    path, content_type, etag = downloader.open_thumbnail('id1')
+    assert requested == ['https://img/avsnitt-1.jpg']
+    assert downloader.open_thumbnail('id1')[0] == path
+    assert requested == ['https://img/avsnitt-1.jpg']
+    downloader.scheduler.shutdown()
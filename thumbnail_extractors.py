@@ -0,0 +1,277 @@
+import html
+import json
+import re
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from config import Config
+
+# Links to a video page: /video/<id>/<slug> on SVT Play and TV4 Play
+VIDEO_HREF_PATTERN = re.compile(r'/video/([A-Za-z0-9_-]+)')
+
+SCRIPT_PATTERN = re.compile(r'<script\b([^>]*)>(.*?)</script>', re.IGNORECASE | re.DOTALL)
+JSON_SCRIPT_TYPES = ('application/json', 'application/ld+json')
+BACKGROUND_IMAGE_PATTERN = re.compile(r'background-image:\s*url\(["\']?([^"\')]+)["\']?\)')
+
+# Keys whose value links a JSON object to a video page, and keys holding its image
+LINK_KEYS = {'url', 'urls', 'href', 'link', 'links', 'path', 'svtplay', 'videourl', 'slug', '@id'}
+IMAGE_KEY_PARTS = ('image', 'thumbnail', 'poster', 'picture')
+IMAGE_URL_KEYS = ('url', 'src', 'href', 'contentUrl')
+
+# Keys holding the other metadata of a video object (JSON-LD, SVT/TV4 listing state)
+TITLE_KEYS = ('name', 'title', 'heading')
+DESCRIPTION_KEYS = ('description', 'shortDescription', 'longDescription', 'synopsis')
+DURATION_KEYS = ('duration', 'durationSeconds', 'durationInSeconds', 'length')
+SEASON_KEYS = ('seasonNumber', 'season', 'partOfSeason')
+EPISODE_KEYS = ('episodeNumber', 'episode')
+POSITION_KEYS = ('positionInSeason', 'episodeInfo')  # e.g. "Säsong 2 — Avsnitt 3"
+
+ISO_DURATION_PATTERN = re.compile(r'^P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d+)?)S)?$', re.IGNORECASE)
+SEASON_TEXT_PATTERN = re.compile(r'(?:Säsong|Season)\s+(\d+)', re.IGNORECASE)
+EPISODE_TEXT_PATTERN = re.compile(r'(?:Avsnitt|Episode)\s+(\d+)', re.IGNORECASE)
+
+
+def _video_id(value):
+    match = VIDEO_HREF_PATTERN.search(value) if isinstance(value, str) else None
+    return match.group(1) if match else None
+
+
+def _absolute(url, base_url):
+    if not url or url.startswith('data:'):
+        return None
+    return urljoin(base_url, url.strip())
+
+
+def _image_url(value, base_url):
+    """Image URL from the JSON shapes used for images: a URL string, a list,
+    {'url': ...}, or SVT's image service reference {'id': ..., 'changed': ...}"""
+    if isinstance(value, str):
+        return _absolute(value, base_url) if value.startswith(('http', '//', '/')) else None
+    if isinstance(value, list):
+        for item in value:
+            url = _image_url(item, base_url)
+            if url:
+                return url
+        return None
+    if isinstance(value, dict):
+        for key in IMAGE_URL_KEYS:
+            if isinstance(value.get(key), str):
+                return _image_url(value[key], base_url)
+        if value.get('id') and value.get('changed'):
+            return Config.SVT_IMAGE_URL.format(id=value['id'], changed=value['changed'])
+    return None
+
+
+def parse_duration(value):
+    """Duration in whole seconds from seconds, "3452" or ISO 8601 ("PT57M32S"); None if unknown"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value) if value > 0 else None
+    if isinstance(value, dict):
+        return parse_duration(value.get('seconds', value.get('value')))
+    if isinstance(value, str):
+        value = value.strip()
+        if value.isdigit():
+            return parse_duration(int(value))
+        match = ISO_DURATION_PATTERN.match(value)
+        if match and any(match.groups()):
+            days, hours, minutes, seconds = (float(g) if g else 0 for g in match.groups())
+            return parse_duration(((days * 24 + hours) * 60 + minutes) * 60 + seconds)
+    return None
+
+
+def _number(value, key='seasonNumber'):
+    """Season/episode number from 3, "3" or {'seasonNumber': 3}"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    if isinstance(value, dict):
+        return _number(value.get(key, value.get('number')))
+    return None
+
+
+def _object_metadata(obj, base_url):
+    """The metadata fields found directly on one JSON object"""
+    metadata = {}
+    image = _object_image(obj, base_url)
+    if image:
+        metadata['image'] = image
+
+    for field, keys in (('title', TITLE_KEYS), ('description', DESCRIPTION_KEYS)):
+        for key in keys:
+            value = obj.get(key)
+            if isinstance(value, str) and value.strip():
+                metadata[field] = html.unescape(value.strip())
+                break
+
+    for key in DURATION_KEYS:
+        duration = parse_duration(obj.get(key))
+        if duration:
+            metadata['duration'] = duration
+            break
+
+    for field, keys, pattern in (('season', SEASON_KEYS, SEASON_TEXT_PATTERN),
+                                 ('episode', EPISODE_KEYS, EPISODE_TEXT_PATTERN)):
+        for key in keys:
+            number = _number(obj.get(key), key='seasonNumber' if field == 'season' else 'episodeNumber')
+            if number is not None:
+                metadata[field] = number
+                break
+        else:
+            for key in POSITION_KEYS:
+                match = pattern.search(obj.get(key) or '') if isinstance(obj.get(key), str) else None
+                if match:
+                    metadata[field] = int(match.group(1))
+                    break
+    return metadata
+
+
+def _object_video_id(obj):
+    for key, value in obj.items():
+        if key.lower() not in LINK_KEYS:
+            continue
+        if isinstance(value, dict):
+            value = next((v for v in value.values() if _video_id(v)), None)
+        video_id = _video_id(value)
+        if video_id:
+            return video_id
+    return None
+
+
+def _object_image(obj, base_url, nested=True):
+    for key, value in obj.items():
+        if any(part in key.lower() for part in IMAGE_KEY_PARTS):
+            url = _image_url(value, base_url)
+            if url:
+                return url
+    if nested:
+        # e.g. a JSON-LD ListItem whose image sits on its 'item'
+        for value in obj.values():
+            if isinstance(value, dict):
+                url = _object_image(value, base_url, nested=False)
+                if url:
+                    return url
+    return None
+
+
+def _walk_json(root, base_url, found):
+    """Collect {video_id: metadata} from every object that links to a video page
+
+    Several objects can describe the same video (e.g. a listing card and a
+    JSON-LD entry); fields are merged, the first value found wins.
+
+    JSON strings nested in the data (e.g. the GraphQL cache in __NEXT_DATA__,
+    which stores each response as a string) are decoded and walked too.
+    """
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            video_id = _object_video_id(node)
+            if video_id:
+                record = found.setdefault(video_id, {})
+                for field, value in _object_metadata(node, base_url).items():
+                    record.setdefault(field, value)
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, str) and len(node) > 20 and node[0] in '{[' and '/video/' in node:
+            try:
+                stack.append(json.loads(node))
+            except ValueError:
+                pass
+
+
+def extract_embedded_json(page, base_url):
+    """Video metadata from JSON embedded in <script> tags (__NEXT_DATA__, JSON-LD, GraphQL state)"""
+    found = {}
+    for attributes, body in SCRIPT_PATTERN.findall(page):
+        attributes = attributes.lower()
+        if '__next_data__' not in attributes and not any(t in attributes for t in JSON_SCRIPT_TYPES):
+            continue
+        try:
+            data = json.loads(body)
+        except ValueError:
+            continue
+        _walk_json(data, base_url, found)
+    return {video_id: record for video_id, record in found.items() if record}
+
+
+def _element_image(element, base_url):
+    img = element.find('img')
+    if img:
+        src = img.get('src') or img.get('data-src')
+        if not src and img.get('srcset'):
+            src = img['srcset'].split(',')[0].split()[0]
+        url = _absolute(src, base_url)
+        if url:
+            return url
+
+    source = element.find('source', srcset=True)
+    if source:
+        url = _absolute(source['srcset'].split(',')[0].split()[0], base_url)
+        if url:
+            return url
+
+    for styled in [element] + element.find_all(style=BACKGROUND_IMAGE_PATTERN):
+        match = BACKGROUND_IMAGE_PATTERN.search(styled.get('style', ''))
+        if match:
+            return _absolute(match.group(1), base_url)
+    return None
+
+
+def extract_article_cards(page, base_url):
+    """Thumbnails (and titles) from the rendered cards: an image inside or next to each /video/ link"""
+    soup = BeautifulSoup(page, 'html.parser')
+    found = {}
+    for link in soup.find_all('a', href=VIDEO_HREF_PATTERN):
+        video_id = _video_id(link['href'])
+        if not video_id or video_id in found:
+            continue
+        card = link.find_parent(['article', 'li']) or link
+        image = _element_image(link, base_url) or _element_image(card, base_url)
+        if image:
+            found[video_id] = {'image': image}
+            heading = card.find(['h2', 'h3', 'h4'])
+            title = link.get('aria-label') or (heading.get_text(strip=True) if heading else '')
+            if title:
+                found[video_id]['title'] = title
+    return found
+
+
+# Extractors by name, as listed in Config.THUMBNAIL_EXTRACTORS
+EXTRACTORS = {
+    'embedded_json': extract_embedded_json,
+    'article_cards': extract_article_cards,
+}
+
+
+def extract_video_metadata(page, base_url, names=None, wanted=None):
+    """Run the configured extractors over a page and merge their results
+
+    Returns {video_id: {'image', 'title', 'description', 'duration',
+    'season', 'episode'}} with the fields that were found. Earlier
+    extractors win when several find the same field. With wanted (a set of
+    video IDs), later extractors are skipped once all of them have an image.
+    """
+    found = {}
+    for name in names or Config.THUMBNAIL_EXTRACTORS:
+        if wanted is not None and all('image' in found.get(video_id, {}) for video_id in wanted):
+            break
+        extractor = EXTRACTORS.get(name)
+        if extractor is None:
+            print(f"Unknown thumbnail extractor: {name}")
+            continue
+        try:
+            for video_id, record in extractor(page, base_url).items():
+                merged = found.setdefault(video_id, {})
+                for field, value in record.items():
+                    merged.setdefault(field, value)
+        except Exception as e:
+            print(f"Thumbnail extractor {name} failed: {e}")
+    return found
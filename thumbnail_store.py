@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from io import BytesIO
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None  # Downscaling is optional - originals are served without Pillow
+
+
+class ThumbnailStore:
+    """On-disk thumbnail cache keyed by video ID
+
+    Image bytes are stored content-addressed (blobs/<sha256>), so episodes
+    sharing a series poster share one file. index.json maps each video ID
+    to its source URL and blob, plus the video's scraped metadata (title,
+    duration, season, ...). A video can also be known by its source URL
+    only (put_videos), with the bytes downloaded on first use. When the
+    blobs (and their downscaled variants) grow past max_bytes, the least
+    recently used video IDs are dropped and unreferenced blobs deleted.
+    """
+
+    MIN_WIDTH = 32
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, 'index.json')
+        self.blob_dir = os.path.join(directory, 'blobs')
+        self._videos = {}  # video_id -> {'sha', 'source', 'last_used', 'metadata', 'updated_at'}
+        self._blobs = {}   # sha -> {'size', 'content_type', 'variants': {width: size}}
+        self._lock = threading.Lock()
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._load()
+
+    def get(self, video_id):
+        """Return {'sha', 'source', 'content_type', 'size', 'metadata', 'updated_at'}
+        for a known video, or None. sha is None while only the source URL is known."""
+        with self._lock:
+            video = self._videos.get(video_id)
+            if video is None:
+                return None
+            video['last_used'] = time.time()
+            blob = self._blobs.get(video['sha']) or {'content_type': None, 'size': 0}
+            return {'sha': video['sha'], 'source': video['source'],
+                    'content_type': blob['content_type'], 'size': blob['size'],
+                    'metadata': dict(video.get('metadata') or {}), 'updated_at': video.get('updated_at')}
+
+    def put_videos(self, records, save=True):
+        """Remember scraped videos without downloading their thumbnails
+
+        records is {video_id: {'image': url, ...metadata}}. The index is
+        saved once for the whole batch; with save=False not at all until the
+        next flush(), for callers adding many videos one at a time.
+        """
+        now = time.time()
+        with self._lock:
+            for video_id, record in records.items():
+                image = record.get('image')
+                video = self._videos.get(video_id)
+                if video is None or (image and image != video['source']):
+                    self._forget(video_id)
+                    video = self._videos[video_id] = {'sha': None, 'source': image}
+                video['metadata'] = {field: value for field, value in record.items() if field != 'image'}
+                video['updated_at'] = now
+                video['last_used'] = now
+            if save:
+                self._save()
+
+    def flush(self):
+        """Write the index to disk"""
+        with self._lock:
+            self._save()
+
+    def put(self, video_id, source_url, data, content_type='image/jpeg'):
+        """Store image bytes for a video and evict old entries if over budget"""
+        sha = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(sha)
+        if not os.path.exists(path):
+            self._write_file(path, data)
+
+        with self._lock:
+            self._blobs.setdefault(sha, {'size': len(data), 'content_type': content_type, 'variants': {}})
+            video = self._videos.get(video_id)
+            if video is not None and video['sha'] not in (None, sha):
+                old_sha = video['sha']
+                video['sha'] = None
+                if not any(other['sha'] == old_sha for other in self._videos.values()):
+                    self._drop_blob(old_sha)
+            video = self._videos.setdefault(video_id, {})
+            video.update({'sha': sha, 'source': source_url, 'last_used': time.time()})
+            self._evict(keep=video_id)
+            self._save()
+        return sha
+
+    def open(self, video_id, width=None):
+        """Return (path, content_type, etag) for a cached thumbnail, or None
+
+        With width (and Pillow installed) a downscaled copy is returned,
+        created on first request. Images narrower than width are served as-is.
+        """
+        entry = self.get(video_id)
+        if entry is None or entry['sha'] is None:
+            return None
+
+        sha = entry['sha']
+        path = self._blob_path(sha)
+        if not os.path.exists(path):
+            # Deleted behind our back - keep the source URLs so it can be downloaded again
+            with self._lock:
+                self._drop_blob(sha)
+                self._save()
+            return None
+
+        if width is None or Image is None:
+            return path, entry['content_type'], sha
+
+        width = max(self.MIN_WIDTH, int(width))
+        variant_path = f'{path}.w{width}'
+        if not os.path.exists(variant_path):
+            try:
+                data = self._downscale(path, width)
+            except Exception as e:
+                print(f"Error downscaling thumbnail for {video_id}: {e}")
+                return path, entry['content_type'], sha
+            if data is None:
+                return path, entry['content_type'], sha
+            self._write_file(variant_path, data)
+            with self._lock:
+                blob = self._blobs.get(sha)
+                if blob is not None:
+                    blob['variants'][str(width)] = len(data)
+                    self._evict(keep=video_id)
+                    self._save()
+
+        return variant_path, 'image/jpeg', f'{sha}-w{width}'
+
+    def total_size(self):
+        with self._lock:
+            return self._total_size()
+
+    def _downscale(self, path, width):
+        """JPEG bytes of the image scaled to width, or None if it is already narrower"""
+        with Image.open(path) as image:
+            if image.width <= width:
+                return None
+            height = max(1, round(image.height * width / image.width))
+            scaled = image.convert('RGB').resize((width, height), Image.LANCZOS)
+        out = BytesIO()
+        scaled.save(out, 'JPEG', quality=85, optimize=True)
+        return out.getvalue()
+
+    def _blob_path(self, sha):
+        return os.path.join(self.blob_dir, sha[:2], sha)
+
+    def _write_file(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _total_size(self):
+        """Must be called with the lock held"""
+        return sum(blob['size'] + sum(blob['variants'].values()) for blob in self._blobs.values())
+
+    def _evict(self, keep=None):
+        """Drop least recently used videos until under max_bytes. Must be called with the lock held"""
+        total = self._total_size()
+        if total <= self.max_bytes:
+            return
+
+        for video_id in sorted(self._videos, key=lambda v: self._videos[v]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if video_id == keep or self._videos[video_id]['sha'] is None:
+                continue  # Source-only entries take no disk space
+            total -= self._forget(video_id)
+
+    def _forget(self, video_id):
+        """Remove a video and delete its blob if nothing else uses it.
+        Returns the number of bytes freed. Must be called with the lock held"""
+        video = self._videos.pop(video_id, None)
+        if video is None or video['sha'] is None:
+            return 0
+        sha = video['sha']
+        if any(other['sha'] == sha for other in self._videos.values()):
+            return 0
+        return self._drop_blob(sha)
+
+    def _drop_blob(self, sha):
+        """Delete a blob and its variants; videos using it keep their source URL.
+        Returns the number of bytes freed. Must be called with the lock held"""
+        for video in self._videos.values():
+            if video['sha'] == sha:
+                video['sha'] = None
+
+        blob = self._blobs.pop(sha, None)
+        if blob is None:
+            return 0
+        path = self._blob_path(sha)
+        for file_path in [path] + [f'{path}.w{width}' for width in blob['variants']]:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+        return blob['size'] + sum(blob['variants'].values())
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            self._videos = saved.get('videos', {})
+            self._blobs = saved.get('blobs', {})
+        except Exception as e:
+            print(f"Error loading thumbnail index: {e}")
+            self._videos, self._blobs = {}, {}
+
+    def _save(self):
+        """Write index.json. Must be called with the lock held"""
+        try:
+            data = json.dumps({'videos': self._videos, 'blobs': self._blobs}).encode('utf-8')
+            self._write_file(self.index_path, data)
+        except Exception as e:
+            print(f"Error saving thumbnail index: {e}")